@@ -1,12 +1,22 @@
 import streamlit as st
-import asyncio
+import importlib
 import logging
-from chat import process_message, reset_chat_history
-from multi_agent import run_multi_agent
+import os
+import sys
+import threading
+import uuid
+from async_bridge import get_bridge
+from plugins.image_renditions import find_images, pick_rendition
+
+# chat and multi_agent (Semantic Kernel, the OpenAI connectors, the agents) take
+# seconds to import, so they are imported by the view that needs them, not here
 
 #Configure logging
 logging.basicConfig(level=logging.INFO)
 
+# Generated images are shown at this width, from the smallest rendition that covers it
+IMAGE_DISPLAY_WIDTH = int(os.getenv("IMAGE_DISPLAY_WIDTH", "512"))
+
 def configure_sidebar():
     """Configure the sidebar with navigation options"""
     if "selected_option" not in st.session_state:
@@ -19,6 +29,31 @@ def configure_sidebar():
     return st.session_state.selected_option
 
 
+def get_session_id():
+    """Return this browser session's chat session ID.
+
+    The ID is kept in the URL so a page reload resumes the same conversation.
+    """
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = st.query_params.get("session") or uuid.uuid4().hex
+        st.query_params["session"] = st.session_state.session_id
+    return st.session_state.session_id
+
+
+@st.cache_resource(show_spinner=False)
+def _start_preload(module_name):
+    thread = threading.Thread(target=importlib.import_module, args=(module_name,),
+                              name=f"preload-{module_name}", daemon=True)
+    thread.start()
+    return thread
+
+
+def preload(module_name):
+    """Start importing a view's backend in the background while the user types the first message."""
+    if module_name not in sys.modules:
+        _start_preload(module_name)
+
+
 def render_chat_ui(title, on_submit):
     """Renders the chat UI"""
     col1, col2 = st.columns([3, 1])
@@ -27,8 +62,9 @@ def render_chat_ui(title, on_submit):
     with col2:
         if st.button("➕ New Chat"):
             if title == "Chat":
+                from chat import reset_chat_history
                 st.session_state.chat_history = []
-                reset_chat_history()
+                reset_chat_history(get_session_id())
             elif title == "Multi-Agent":
                 st.session_state.multi_agent_history = []
   
@@ -57,22 +93,27 @@ def chat():
     """Chat functionality."""
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
+    preload("chat")
 
     def on_chat_submit(user_input):
+        if user_input:
+            # Append user message to Chat history
+            st.session_state.chat_history.append({"role": "user", "message": user_input})
+
+        # Display chat history
+        display_chat_history(st.session_state.chat_history)
+
         if user_input:
             try:
-                # Append user message to Chat history
-                st.session_state.chat_history.append({"role": "user", "message": user_input})
-                with st.spinner("Processing your request.."):
-                    # Get assistant's response
-                    assistant_response = asyncio.run(process_message(user_input))
+                from chat import process_message_stream
+
+                # Render the assistant's response token by token as it streams in
+                tokens = get_bridge().iterate(process_message_stream(user_input, get_session_id()))
+                assistant_response = render_stream(tokens, "assistant")
                 st.session_state.chat_history.append({"role": "assistant", "message": assistant_response})
             except Exception as e:
                 logging.error(f"Error processing message: {e}")
                 st.error("An error occurred while processing your message.")
-        
-    # Display chat history
-        display_chat_history(st.session_state.chat_history)
 
     render_chat_ui("Chat", on_chat_submit)
 
@@ -80,26 +121,55 @@ def multi_agent():
     """Handles multi-agent system."""
     if "multi_agent_history" not in st.session_state:
         st.session_state.multi_agent_history = []
+    preload("multi_agent")
 
     def on_multi_agent_submit(user_input):
         if user_input:
             try:
+                from multi_agent import AgentMessage, ConversationCompleted, run_multi_agent
+
                 st.session_state.multi_agent_history.append({"role": "user", "message": user_input})
+                # Show the transcript so far, then each agent message the moment it is produced
+                display_chat_history(st.session_state.multi_agent_history)
                 with st.spinner("Agents are collaborating..."):
-                    result = asyncio.run(run_multi_agent(user_input))
-                for response in result:
-                    st.session_state.multi_agent_history.append({"role": response['role'], "message": response['message']})
+                    for event in get_bridge().iterate(run_multi_agent(user_input)):
+                        if isinstance(event, AgentMessage):
+                            st.session_state.multi_agent_history.append({"role": event.agent, "message": event.content})
+                            st.markdown(f"**{event.agent}**: {event.content}")
+                            display_images(event.content)
+                        elif isinstance(event, ConversationCompleted) and not event.approved:
+                            st.warning(f"The agents stopped after {event.turns} turns without approval.")
 
             except Exception as e:
                 logging.error(f"Error in multi-agent system: {e}")
                 st.error("An error occurred while processing the multi-agent request.")
-        
-    #Display multi-agent chat history
-        display_chat_history(st.session_state.multi_agent_history)
-        
+        else:
+            #Display multi-agent chat history
+            display_chat_history(st.session_state.multi_agent_history)
+
+
     render_chat_ui("Multi-Agent", on_multi_agent_submit)
 
 
+def render_stream(tokens, role):
+    """Render streamed tokens into a single message as they arrive and return the full text."""
+    placeholder = st.empty()
+    placeholder.markdown(f"**{role}**: ▌")
+    text = ""
+    for token in tokens:
+        text += token
+        placeholder.markdown(f"**{role}**: {text}▌")
+    placeholder.markdown(f"**{role}**: {text}")
+    display_images(text)
+    return text
+
+
+def display_images(message):
+    """Show the generated images a message refers to."""
+    for path in find_images(message):
+        st.image(pick_rendition(path, IMAGE_DISPLAY_WIDTH), width=IMAGE_DISPLAY_WIDTH)
+
+
 def display_chat_history(chat_history):
     """Display chat history."""
     with st.container():
@@ -108,6 +178,7 @@ def display_chat_history(chat_history):
                 st.markdown(f"**User**: {chat['message']}")
             else:
                 st.markdown(f"**{chat['role']}**: {chat['message']}")
+                display_images(chat['message'])
 
 def main():
     """Main function to run the app."""
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBridge:
+    """Runs coroutines from synchronous code on one long-lived event loop.
+
+    Calling asyncio.run() per request creates and closes a loop each time, which
+    throws away the connection pools of the async SDK clients (and breaks clients
+    that are cached across requests, since they stay bound to the closed loop).
+    The bridge keeps a single loop running in a daemon thread instead, so kernel
+    services keep their keep-alive connections between requests.
+    """
+
+    def __init__(self, name="async-bridge"):
+        self._name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        """The bridge's event loop, started on first use."""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._thread = threading.Thread(
+                        target=self._run_loop, args=(loop,), name=self._name, daemon=True
+                    )
+                    self._thread.start()
+                    self._loop = loop
+                    logger.info("Background event loop started")
+        return self._loop
+
+    @staticmethod
+    def _run_loop(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop and return a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop and block until it returns its result."""
+        return self.submit(coro).result(timeout)
+
+    def iterate(self, async_iterable, timeout=None):
+        """Consume an async iterable on the loop, yielding its items synchronously."""
+        iterator = async_iterable.__aiter__()
+        try:
+            while True:
+                try:
+                    yield self.run(iterator.__anext__(), timeout)
+                except StopAsyncIteration:
+                    return
+        finally:
+            # Close the generator on the loop if the caller stopped early
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                self.run(aclose())
+
+    def stop(self):
+        """Stop the loop and wait for its thread to exit."""
+        with self._lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+
+_bridge = AsyncBridge()
+
+
+def get_bridge():
+    """Return the process-wide bridge shared by all Streamlit sessions."""
+    return _bridge
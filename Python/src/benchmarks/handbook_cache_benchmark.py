@@ -0,0 +1,90 @@
+"""Measure the semantic result cache of ContosoSearchPlugin on paraphrased questions.
+
+Questions are drawn from a set of topics, each asked in several phrasings. The
+stub embeddings server maps a phrasing to its topic's vector plus a little
+noise (as a real model does for paraphrases), and each search that reaches the
+index is delayed like an Azure AI Search round trip:
+
+    python benchmarks/handbook_cache_benchmark.py --questions 500
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from stubs import StubServer, summarize
+from plugins.vector_index import LocalVectorIndex
+
+DIMENSIONS = 1536
+
+
+def phrase_vector(topics, text):
+    topic, _ = text.split(":", 1)
+    seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+    noise = np.random.default_rng(seed).standard_normal(DIMENSIONS).astype(np.float32)
+    return topics[int(topic)] + 0.25 * noise / np.sqrt(DIMENSIONS) * np.linalg.norm(topics[int(topic)])
+
+
+async def ask_all(plugin, questions):
+    samples = []
+    for question in questions:
+        start = time.perf_counter()
+        await plugin.query_handbook(question)
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", type=int, default=40)
+    parser.add_argument("--phrasings", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--search-latency-ms", type=float, default=150)
+    parser.add_argument("--threshold", type=float, default=0.92)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    topics = rng.standard_normal((args.topics, DIMENSIONS)).astype(np.float32)
+    embed = lambda path, body: (200, {"data": [{"embedding": phrase_vector(topics, body["input"]).tolist()}]})
+    text_rng = random.Random(42)
+    questions = [f"{text_rng.randrange(args.topics)}:phrasing {text_rng.randrange(args.phrasings)}"
+                 for _ in range(args.questions)]
+
+    with tempfile.TemporaryDirectory() as path, StubServer({"POST /openai/deployments/embeddings/embeddings": embed}) as server:
+        index = LocalVectorIndex(DIMENSIONS)
+        index.upsert([{"id": str(i), "content": f"Handbook section {i}", "page_num": i} for i in range(args.topics)], topics)
+        index.save(path)
+        os.environ.update(
+            HANDBOOK_SEARCH_BACKEND="local", HANDBOOK_INDEX_PATH=path, AZURE_OPENAI_ENDPOINT=server.url,
+            AZURE_OPENAI_EMBEDDING_DEPLOYMENT="embeddings", AZURE_OPENAI_API_KEY="stub",
+            HANDBOOK_CACHE_THRESHOLD=str(args.threshold),
+        )
+        from plugins.ContosoSearchPlugin import ContosoSearchPlugin
+
+        results = {}
+        for name, threshold in (("without_cache", 2.0), ("with_cache", args.threshold)):
+            plugin = ContosoSearchPlugin()
+            plugin.results_cache.threshold = threshold
+            searches = 0
+            search = plugin._search
+
+            async def slow_search(*arguments):
+                nonlocal searches
+                searches += 1
+                await asyncio.sleep(args.search_latency_ms / 1000)
+                return await search(*arguments)
+
+            plugin._search = slow_search
+            latency = asyncio.run(ask_all(plugin, questions))
+            results[name] = {"latency": latency, "searches": searches, "cache": plugin.results_cache.stats()}
+    print(json.dumps({"questions": args.questions, "distinct_phrasings": args.topics * args.phrasings, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Compare the tokens query_handbook sends to the model before and after context packing.
+
+Builds result sets like those of a hybrid search over an ingested handbook:
+long chunks, neighbouring chunks that overlap, the same passage indexed twice
+and weak matches in the tail:
+
+    python benchmarks/handbook_context_benchmark.py --top 5
+"""
+import argparse
+import json
+import random
+import time
+
+from stubs import summarize
+from plugins.tokens import estimate_tokens
+from plugins.ContosoSearchPlugin import pack_results
+
+WORDS = ("employees vacation leave benefits insurance dress code expense travel policy overtime holiday "
+         "parental security laptop remote office training review salary bonus retirement manager").split()
+
+
+def make_results(rng, top, chunk_words):
+    page = [rng.choice(WORDS) + ("." if rng.random() < 0.08 else "") for _ in range(chunk_words * 3)]
+    overlap = chunk_words // 10
+    chunks = [" ".join(page[start:start + chunk_words]) for start in range(0, len(page), chunk_words - overlap)]
+    results = []
+    for rank in range(top):
+        if rank == 2:
+            content = results[0]["content"]  # the same passage from a second copy of the document
+        else:
+            content = chunks[rank % len(chunks)]
+        results.append({"content": content, "page_num": rank + 1, "score": 1 / (61 + rank) + (1 / 61 if rank < 2 else 0)})
+    return results
+
+
+def format_before(query, results):
+    response = f"Here's what I found in the Contoso Handbook about '{query}':\n\n"
+    for i, result in enumerate(results, 1):
+        response += f"Result {i} (Page {result['page_num']}):\n{result['content']}\n\n"
+    return response
+
+
+def format_after(query, results, budget):
+    parts = [f"Here's what I found in the Contoso Handbook about '{query}':"]
+    parts.extend(f"Result {i} (Page {result['page_num']}):\n{content}"
+                 for i, (result, content) in enumerate(pack_results(results, budget), 1))
+    return "\n\n".join(parts)
+
+
+def measure(format_response, result_sets):
+    samples, tokens = [], []
+    for results in result_sets:
+        start = time.perf_counter()
+        response = format_response("What is the vacation policy?", results)
+        samples.append((time.perf_counter() - start) * 1000)
+        tokens.append(estimate_tokens(response))
+    return {"tokens_per_call": round(sum(tokens) / len(tokens)), "format": summarize(samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--chunk-words", type=int, default=350)
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    result_sets = [make_results(rng, args.top, args.chunk_words) for _ in range(args.calls)]
+    print(json.dumps({
+        "top": args.top,
+        "before": measure(format_before, result_sets),
+        "after": measure(lambda query, results: format_after(query, results, args.budget), result_sets),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
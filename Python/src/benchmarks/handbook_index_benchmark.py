@@ -0,0 +1,100 @@
+"""Measure query latency and recall of the local handbook index.
+
+Uses random 1536-dimension vectors and synthetic chunk texts, so it needs no
+Azure resources:
+
+    python benchmarks/handbook_index_benchmark.py --chunks 20000
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from stubs import summarize
+from plugins.vector_index import LocalVectorIndex
+
+WORDS = ("vacation leave benefits insurance dress code expense travel policy overtime holiday "
+         "parental security laptop remote office training review salary bonus retirement").split()
+
+
+def make_chunks(count, dimensions, seed=42):
+    rng = np.random.default_rng(seed)
+    text_rng = random.Random(seed)
+    # Clustered vectors, like embeddings of text about a limited set of topics
+    topics = rng.standard_normal((64, dimensions)).astype(np.float32)
+    vectors = topics[rng.integers(0, len(topics), count)] + 0.5 * rng.standard_normal((count, dimensions)).astype(np.float32)
+    records = [
+        {"id": str(i), "content": " ".join(text_rng.choices(WORDS, k=60)), "page_num": i // 5, "chunk_id": i}
+        for i in range(count)
+    ]
+    return records, vectors, rng
+
+
+def time_calls(function, arguments):
+    samples = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--n-probe", type=int, default=8)
+    args = parser.parse_args()
+
+    records, vectors, rng = make_chunks(args.chunks, args.dimensions)
+    index = LocalVectorIndex(args.dimensions)
+    index.upsert(records, vectors)
+    queries = vectors[rng.integers(0, args.chunks, args.queries)] + 0.3 * rng.standard_normal(
+        (args.queries, args.dimensions)).astype(np.float32)
+    texts = [" ".join(random.Random(i).choices(WORDS, k=5)) for i in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as path:
+        index.save(path)
+        start = time.perf_counter()
+        loaded = LocalVectorIndex.load(path)
+        mmap_load_ms = (time.perf_counter() - start) * 1000
+        mmap_first_query = time_calls(lambda query: loaded.vector_search(query, args.top), queries[:1])
+        del loaded
+
+    exact = index.vector_search(queries, args.top)
+    start = time.perf_counter()
+    index.build_ivf()
+    ivf_build_seconds = time.perf_counter() - start
+    approximate = index.vector_search(queries, args.top, n_probe=args.n_probe)
+    recall = np.mean([
+        len({row for row, _ in found} & {row for row, _ in expected}) / len(expected)
+        for found, expected in zip(approximate, exact)
+    ])
+
+    start = time.perf_counter()
+    index.vector_search(queries, args.top)
+    batched_ms = (time.perf_counter() - start) * 1000
+
+    result = {
+        "chunks": args.chunks,
+        "dimensions": args.dimensions,
+        "exact_query": time_calls(lambda query: index.vector_search(query, args.top), queries),
+        "exact_batched_per_query_ms": round(batched_ms / args.queries, 3),
+        "ivf_query": time_calls(lambda query: index.vector_search(query, args.top, n_probe=args.n_probe), queries),
+        "ivf_recall_at_k": round(float(recall), 3),
+        "ivf_build_seconds": round(ivf_build_seconds, 2),
+        "bm25_query": time_calls(index.keyword_scores, texts),
+        "hybrid_query": time_calls(lambda i: index.search(texts[i], queries[i], top=3), range(args.queries)),
+        "mmap_load_ms": round(mmap_load_ms, 2),
+        "mmap_first_query": mmap_first_query,
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
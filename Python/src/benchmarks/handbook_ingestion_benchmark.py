@@ -0,0 +1,87 @@
+"""Measure handbook ingestion throughput against a stub embeddings server.
+
+The stub answers each request after a fixed delay (plus a little per input), so
+the numbers show the effect of batching, concurrency and skipping unchanged
+chunks rather than of the real service:
+
+    python benchmarks/handbook_ingestion_benchmark.py --pages 200 --latency-ms 80
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from stubs import StubServer
+from handbook_ingestion import HandbookIngestion, LocalIndexSink
+
+WORDS = ("employees vacation leave benefits insurance dress code expense travel policy overtime holiday "
+         "parental security laptop remote office training review salary bonus retirement manager").split()
+
+DIMENSIONS = 1536
+
+
+def write_documents(directory, pages, seed=42):
+    rng = random.Random(seed)
+    path = os.path.join(directory, "handbook.txt")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("\f".join(
+            "\n\n".join(" ".join(rng.choices(WORDS, k=rng.randint(40, 120))) for _ in range(8))
+            for _ in range(pages)
+        ))
+    return path
+
+
+def embeddings_route(latency_ms, per_input_ms):
+    vector = [0.01] * DIMENSIONS
+
+    def embed(path, body):
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        time.sleep((latency_ms + per_input_ms * len(inputs)) / 1000)
+        return 200, {"data": [{"index": i, "embedding": vector} for i in range(len(inputs))]}
+
+    return embed
+
+
+async def run(server, index_path, paths, batch_size, concurrency):
+    pipeline = HandbookIngestion(
+        LocalIndexSink(index_path, DIMENSIONS), f"{server.url}/embeddings", "stub",
+        batch_size=batch_size, concurrency=concurrency,
+    )
+    return await pipeline.ingest(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--per-input-ms", type=float, default=2)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    routes = {"POST /embeddings": embeddings_route(args.latency_ms, args.per_input_ms)}
+    with tempfile.TemporaryDirectory() as directory, StubServer(routes) as server:
+        document = write_documents(directory, args.pages)
+        index_path = os.path.join(directory, "index")
+        results = {
+            # Before: one request per chunk, one at a time
+            "one_by_one": asyncio.run(run(server, os.path.join(directory, "serial"), [document], 1, 1)),
+            "batched": asyncio.run(run(server, index_path, [document], args.batch_size, args.concurrency)),
+            "unchanged_rerun": asyncio.run(run(server, index_path, [document], args.batch_size, args.concurrency)),
+        }
+        # Change the text of a few pages and re-ingest
+        with open(document, encoding="utf-8") as file:
+            pages = file.read().split("\f")
+        for page in range(0, len(pages), max(1, len(pages) // 5)):
+            pages[page] += " Updated."
+        with open(document, "w", encoding="utf-8") as file:
+            file.write("\f".join(pages))
+        results["few_pages_changed"] = asyncio.run(run(server, index_path, [document], args.batch_size, args.concurrency))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
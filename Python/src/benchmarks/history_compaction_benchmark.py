@@ -0,0 +1,70 @@
+"""Show that prompt size stays bounded over long sessions with history compaction.
+
+Plays a scripted conversation against a fake chat service and records the size
+of every prompt it receives:
+
+    python benchmarks/history_compaction_benchmark.py --turns 500 --budget 4000
+"""
+import argparse
+import asyncio
+import json
+
+import stubs  # noqa: F401  (puts src/ on the import path)
+from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+
+from history_reducer import TokenBudgetReducer
+from plugins.tokens import estimate_tokens
+
+
+class FakeChatService:
+    """Answers every prompt with a fixed-size reply and records prompt sizes."""
+
+    def __init__(self):
+        self.prompt_tokens = []
+        self.calls = 0
+
+    async def get_chat_message_content(self, chat_history, settings, **kwargs):
+        self.calls += 1
+        self.prompt_tokens.append(sum(estimate_tokens(m.content or "") for m in chat_history.messages))
+        return ChatMessageContent(role=AuthorRole.ASSISTANT, content="Here is a detailed answer. " * 12)
+
+
+async def run_session(turns, reducer):
+    service = FakeChatService()
+    history = ChatHistory()
+    history.add_system_message("You are a helpful assistant for Contoso employees.")
+    chat_prompts = []
+    for turn in range(turns):
+        history.add_user_message(f"Question {turn}: what does the handbook say about topic {turn}? " * 3)
+        if reducer is not None:
+            await reducer.reduce(history, service)
+        reply = await service.get_chat_message_content(chat_history=history, settings=None)
+        # The last recorded prompt is the chat turn itself (summaries are recorded before it)
+        chat_prompts.append(service.prompt_tokens[-1])
+        history.add_message(reply)
+    return {
+        "final_prompt_tokens": chat_prompts[-1],
+        "max_prompt_tokens": max(chat_prompts),
+        "total_prompt_tokens": sum(chat_prompts),
+        "model_calls": service.calls,
+        "history_messages": len(history.messages),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--budget", type=int, default=4000)
+    args = parser.parse_args()
+
+    before = await run_session(args.turns, reducer=None)
+    reducer = TokenBudgetReducer(token_budget=args.budget)
+    after = await run_session(args.turns, reducer=reducer)
+    after["summaries_created"] = reducer.summaries_created
+    print(json.dumps({"turns": args.turns, "token_budget": args.budget, "before": before, "after": after}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""Measure how long image requests hold up a chat turn, before and after image jobs.
+
+A fake image service takes --latency-ms per image and returns base64 image
+bytes. A session sends --requests image requests, --repeat of them repeating an
+earlier (prompt, size). Before, every request awaited a generation in the
+turn; after, generate_image queues a job and returns, the worker pool
+generates the distinct images and repeats are served from the image store:
+
+    python benchmarks/image_jobs_benchmark.py --requests 40 --repeat 0.3
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import random
+import tempfile
+import time
+
+from PIL import Image
+
+from stubs import summarize
+from plugins.ImageGenerationPlugin import ImageGenerationPlugin
+
+
+class FakeImageService:
+    def __init__(self, latency_ms):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    async def generate_image(self, description, width, height):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        # A small real PNG, so the renditions can be made from it
+        color = tuple(hashlib.sha256(f"{description}{width}{height}".encode()).digest()[:3])
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64), color).save(buffer, "PNG")
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+class FakeKernel:
+    def __init__(self, service):
+        self.service = service
+
+    def get_service(self, service_id):
+        return self.service
+
+
+async def run_before(service, prompts):
+    # Every request waited for its own generation inside the chat turn
+    samples = []
+    for prompt in prompts:
+        start = time.perf_counter()
+        await service.generate_image(description=prompt, width=1024, height=1024)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples, sum(samples)
+
+
+async def run_after(service, prompts, path, workers):
+    plugin = ImageGenerationPlugin(store_path=path, workers=workers, mode="job")
+    plugin.set_kernel(FakeKernel(service))
+    samples, jobs = [], []
+    start_all = time.perf_counter()
+    for prompt in prompts:
+        start = time.perf_counter()
+        answer = await plugin.generate_image(prompt)
+        samples.append((time.perf_counter() - start) * 1000)
+        if not answer.startswith("Image ready"):
+            jobs.append(plugin.jobs.get(answer.split()[2]))
+    await asyncio.gather(*(plugin.jobs.wait(job) for job in jobs))
+    plugin.renditions.shutdown()
+    return samples, (time.perf_counter() - start_all) * 1000, plugin.jobs.stats()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--repeat", type=float, default=0.3, help="fraction of requests repeating an earlier prompt")
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    prompts = []
+    for n in range(args.requests):
+        if prompts and rng.random() < args.repeat:
+            prompts.append(rng.choice(prompts))
+        else:
+            prompts.append(f"A watercolor of landmark number {n}")
+
+    before_service = FakeImageService(args.latency_ms)
+    before_samples, before_total = await run_before(before_service, prompts)
+
+    after_service = FakeImageService(args.latency_ms)
+    with tempfile.TemporaryDirectory() as path:
+        after_samples, after_total, stats = await run_after(after_service, prompts, path, args.workers)
+        # A second session asking the same things is served entirely from the store
+        replay_service = FakeImageService(args.latency_ms)
+        replay_samples, replay_total, _ = await run_after(replay_service, prompts, path, args.workers)
+
+    print(json.dumps({
+        "before": {"turn_wait": summarize(before_samples), "service_calls": before_service.calls,
+                   "all_images_ms": round(before_total)},
+        "after": {"turn_wait": summarize(after_samples), "service_calls": after_service.calls,
+                  "all_images_ms": round(after_total), "jobs": stats},
+        "after_repeat_session": {"turn_wait": summarize(replay_samples), "service_calls": replay_service.calls,
+                                 "all_images_ms": round(replay_total)},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
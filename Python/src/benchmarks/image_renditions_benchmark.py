@@ -0,0 +1,105 @@
+"""Measure page weight, decode time and event loop stalls of image renditions.
+
+Synthetic 1024x1024 PNGs (smooth gradients plus noise, which compress about
+like DALL-E images) are put in an image store. The benchmark compares the
+bytes and decode time of the original PNG with the rendition the UI picks for
+--display-width. It also measures the longest event loop stall while the
+renditions are made inline on the loop versus in the process pool:
+
+    python benchmarks/image_renditions_benchmark.py --images 8
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from stubs import summarize
+from plugins.image_renditions import ImageRenditions, make_renditions, pick_rendition, rendition_directory
+from plugins.image_store import ImageStore
+
+
+def synthetic_image(seed, size=1024):
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    smooth = np.asarray(Image.fromarray(coarse).resize((size, size), Image.Resampling.BICUBIC), dtype=np.int16)
+    noisy = np.clip(smooth + rng.normal(0, 12, smooth.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(noisy).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def decode_ms(path):
+    start = time.perf_counter()
+    with Image.open(path) as image:
+        image.load()
+    return (time.perf_counter() - start) * 1000
+
+
+async def max_loop_stall(work):
+    """Run work() while a 5 ms ticker measures how late the event loop wakes it up."""
+    stalls = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append((time.perf_counter() - start) * 1000 - 5)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - start
+    done.set()
+    await task
+    return round(max(stalls), 1), round(elapsed * 1000)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--display-width", type=int, default=512)
+    parser.add_argument("--processes", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ImageStore(root)
+        inline = [store.put(synthetic_image(seed)) for seed in range(args.images)]
+        pooled = [store.put(synthetic_image(seed)) for seed in range(args.images, 2 * args.images)]
+
+        async def render_inline():
+            for path in inline:
+                make_renditions(path, rendition_directory(path))
+
+        renditions = ImageRenditions(processes=args.processes)
+
+        async def render_pooled():
+            await asyncio.gather(*(renditions.render(path) for path in pooled))
+
+        inline_stall, inline_ms = await max_loop_stall(render_inline)
+        await renditions.render(pooled[0])  # start the worker processes outside the measurement
+        pooled_stall, pooled_ms = await max_loop_stall(render_pooled)
+        renditions.shutdown()
+
+        originals = inline + pooled
+        served = [pick_rendition(path, args.display_width) for path in originals]
+        print(json.dumps({
+            "original_png": {"kb_per_image": round(sum(map(os.path.getsize, originals)) / len(originals) / 1024, 1),
+                             "decode": summarize([decode_ms(path) for path in originals])},
+            "served_rendition": {"file": os.path.basename(served[0]),
+                                 "kb_per_image": round(sum(map(os.path.getsize, served)) / len(served) / 1024, 1),
+                                 "decode": summarize([decode_ms(path) for path in served])},
+            "inline_on_loop": {"max_loop_stall_ms": inline_stall, "total_ms": inline_ms},
+            "process_pool": {"max_loop_stall_ms": pooled_stall, "total_ms": pooled_ms},
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""Profile cold import time of the app's entry points and check it against a baseline.
+
+Each entry point is imported in a fresh interpreter with -X importtime (the best
+of --runs runs counts). The report lists the cumulative import time per entry
+point and the modules with the most self time under the Streamlit app.
+The check fails (exit code 1) in two cases. One is an entry point that takes
+longer than its budget in import_time_baseline.json plus the tolerance. The
+other is an entry point that imports a module it must not import eagerly (for
+example app pulling in Semantic Kernel), which catches regressions without
+depending on the machine's speed:
+
+    python benchmarks/import_time_benchmark.py
+    python benchmarks/import_time_benchmark.py --update-baseline   # after an intended change
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from stubs import SRC_DIR, WORKITEMS_DIR
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_time_baseline.json")
+
+# Entry point -> module imported in the fresh interpreter
+ENTRY_POINTS = {
+    "app": "app",
+    "chat": "chat",
+    "multi_agent": "multi_agent",
+    "workitems.api": "api",
+}
+
+
+def profile(module):
+    """Import module in a new interpreter and return {module name: (self us, cumulative us)}."""
+    code = f"import sys; sys.path[:0] = [{SRC_DIR!r}, {WORKITEMS_DIR!r}]; import {module}"
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=SRC_DIR,
+                               capture_output=True, text=True, check=True)
+    timings = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    with open(BASELINE_PATH, encoding="utf-8") as file:
+        baseline = json.load(file)
+
+    report, failures = {}, []
+    top_modules = []
+    for entry, module in ENTRY_POINTS.items():
+        runs = [profile(module) for _ in range(args.runs)]
+        best = min(runs, key=lambda timings: timings[module][1])
+        cumulative_ms = best[module][1] / 1000
+        report[entry] = {"cumulative_ms": round(cumulative_ms, 1), "modules": len(best)}
+        if entry == "app":
+            top_modules = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+
+        budget = baseline["budgets_ms"].get(entry)
+        if budget is not None and cumulative_ms > budget * (1 + baseline["tolerance"]):
+            failures.append(f"{entry}: {cumulative_ms:.0f} ms, budget {budget} ms "
+                            f"(+{baseline['tolerance']:.0%} tolerance)")
+        for forbidden in baseline["must_not_import"].get(entry, []):
+            if forbidden in best:
+                failures.append(f"{entry} imports {forbidden} eagerly")
+
+    report["app_top_self_time"] = {name: round(self_us / 1000, 1) for name, (self_us, _) in top_modules}
+    print(json.dumps(report, indent=2))
+
+    if args.update_baseline:
+        baseline["budgets_ms"] = {entry: round(report[entry]["cumulative_ms"]) for entry in ENTRY_POINTS}
+        with open(BASELINE_PATH, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=2)
+            file.write("\n")
+        print(f"Baseline updated: {BASELINE_PATH}")
+    elif failures:
+        print("Import time regressions:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
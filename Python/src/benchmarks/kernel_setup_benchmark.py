@@ -0,0 +1,98 @@
+"""Measure per-turn kernel setup overhead with and without the kernel factory.
+
+Runs entirely against a local stub server, so no Azure resources are needed:
+
+    python benchmarks/kernel_setup_benchmark.py --turns 50
+"""
+import argparse
+import json
+import os
+import time
+
+from stubs import StubServer, summarize
+
+OPENAPI_DOCUMENT = {
+    "openapi": "3.0.1",
+    "info": {"title": "Work Items API", "version": "1.0.0"},
+    "paths": {
+        "/workitems": {
+            "get": {
+                "operationId": "get_all_work_items",
+                "summary": "Get All Work Items",
+                "responses": {"200": {"description": "Successful Response"}},
+            }
+        },
+        "/workitems/{id}": {
+            "get": {
+                "operationId": "get_work_item_by_id",
+                "summary": "Get Work Item By Id",
+                "parameters": [
+                    {"name": "id", "in": "path", "required": True, "schema": {"type": "integer"}}
+                ],
+                "responses": {"200": {"description": "Successful Response"}},
+            }
+        },
+    },
+}
+
+
+# Azure clients only accept https endpoints and make no request while being built,
+# so they point at a placeholder host; the OpenAPI document is served by the stub.
+STUB_AZURE_ENDPOINT = "https://stub.openai.azure.com"
+
+
+def configure_environment(base_url):
+    os.environ.update({
+        "AZURE_OPENAI_CHAT_DEPLOYMENT_NAME": "stub-chat",
+        "AZURE_OPENAI_API_KEY": "stub-key",
+        "AZURE_OPENAI_ENDPOINT": STUB_AZURE_ENDPOINT,
+        "AZURE_TEXT_TO_IMAGE_DEPLOYMENT_NAME": "stub-image",
+        "AZURE_TEXT_TO_IMAGE_API_KEY": "stub-key",
+        "AZURE_TEXT_TO_IMAGE_ENDPOINT": STUB_AZURE_ENDPOINT,
+        "AI_SEARCH_URL": STUB_AZURE_ENDPOINT,
+        "AI_SEARCH_KEY": "stub-key",
+        "WORKITEMS_OPENAPI_URL": f"{base_url}/openapi.json",
+    })
+
+
+def time_turns(setup, turns):
+    samples = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        setup()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+
+    routes = {"GET /openapi.json": lambda path, body: (200, OPENAPI_DOCUMENT)}
+    with StubServer(routes) as stub:
+        # chat loads .env on import, so the stub settings are applied afterwards
+        import chat
+        from kernel_factory import KernelFactory
+        configure_environment(stub.url)
+
+        # Before: every turn rebuilt services, plugins and the OpenAPI plugin
+        def per_turn_setup():
+            chat.build_kernel()
+            chat.create_execution_settings()
+
+        before = time_turns(per_turn_setup, args.turns)
+
+        # After: the factory builds once and every later turn reuses the kernel
+        factory = KernelFactory(chat.build_kernel, dotenv_path="")
+        after = time_turns(factory.get_kernel, args.turns)
+
+    print(json.dumps({
+        "turns": args.turns,
+        "before": before,
+        "after": {**after, "builds": factory.build_count},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Count model calls per completed multi-agent conversation, before and after.
+
+A fake chat service plays the three agents from a script: the BusinessAnalyst
+writes requirements, the SoftwareEngineer answers with code, and the
+ProductOwner asks for changes --rework times before approving. It also answers
+selection and termination prompts correctly, so both set-ups finish the same
+conversation and differ only in how many calls (and prompt tokens) it took:
+
+    python benchmarks/multi_agent_benchmark.py --conversations 20 --rework 2
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import stubs  # noqa: F401  (puts src/ on the import path)
+from semantic_kernel.agents import AgentGroupChat
+from semantic_kernel.agents.strategies.selection.kernel_function_selection_strategy import KernelFunctionSelectionStrategy
+from semantic_kernel.agents.strategies.termination.kernel_function_termination_strategy import KernelFunctionTerminationStrategy
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+from semantic_kernel.functions.kernel_function import KernelFunction
+from semantic_kernel.kernel import Kernel
+
+import multi_agent
+from plugins.tokens import estimate_tokens
+from kernel_factory import KernelFactory
+
+# The termination prompt run_multi_agent used before the string check
+TERMINATION_PROMPT = """
+Check the conversation history for a message by the ProductOwner containing "%APPR%".
+If found, respond with 'yes' to indicate termination. Otherwise, respond with 'no'.
+
+History:
+{{$history}}
+"""
+
+
+class ScriptedChatService(ChatCompletionClientBase):
+    """Plays the agents and the conversation manager, counting calls and prompt tokens."""
+
+    rework: int = 2
+    calls: dict = {}
+    prompt_tokens: int = 0
+    reviews: int = 0
+
+    def get_prompt_execution_settings_class(self):
+        return PromptExecutionSettings
+
+    async def _inner_get_chat_message_contents(self, chat_history, settings):
+        messages = chat_history.messages
+        self.prompt_tokens += sum(estimate_tokens(message.content or "") for message in messages)
+        prompt = messages[-1].content or ""
+        if "determine which agent should speak next" in prompt:
+            kind = "selection"
+            # The manager model's judgement, made from the full conversation
+            reply = multi_agent.select_by_rule(self._conversation(prompt)) or multi_agent.SOFTWARE_ENGINEER
+        elif "respond with 'yes' to indicate termination" in prompt:
+            kind = "termination"
+            reply = "yes" if multi_agent.APPROVAL_TOKEN in prompt.split("History:", 1)[1] else "no"
+        else:
+            instructions = messages[0].content if messages and messages[0].role == AuthorRole.SYSTEM else ""
+            kind = next(name for name, persona in (
+                (multi_agent.BUSINESS_ANALYST, multi_agent.BUSINESS_ANALYST_PERSONA),
+                (multi_agent.SOFTWARE_ENGINEER, multi_agent.SOFTWARE_ENGINEER_PERSONA),
+                (multi_agent.PRODUCT_OWNER, multi_agent.PRODUCT_OWNER_PERSONA),
+            ) if instructions == persona)
+            reply = self._agent_reply(kind)
+        self.calls[kind] = self.calls.get(kind, 0) + 1
+        return [ChatMessageContent(role=AuthorRole.ASSISTANT, content=reply)]
+
+    def _agent_reply(self, agent):
+        if agent == multi_agent.BUSINESS_ANALYST:
+            return "Requirements: a calculator app with add, subtract, multiply and divide. " * 10
+        if agent == multi_agent.SOFTWARE_ENGINEER:
+            return "Here is the app:\n```html\n<html><body><script>/* calculator */</script></body></html>\n```\n" * 8
+        self.reviews += 1
+        if self.reviews <= self.rework:
+            return "Division by zero is not handled; please fix it and resubmit. " * 4
+        return multi_agent.APPROVAL_TOKEN
+
+    @staticmethod
+    def _conversation(prompt):
+        # Rebuild enough of the rendered history to tell who spoke last
+        history = []
+        for name in multi_agent.AGENT_NAMES:
+            index = prompt.rfind(f"'name': '{name}'")
+            if index >= 0:
+                history.append((index, name))
+        if not history:
+            return [ChatMessageContent(role=AuthorRole.USER, content="request")]
+        _, last = max(history)
+        start = prompt.rfind("'content': '", 0, prompt.rfind(f"'name': '{last}'"))
+        return [ChatMessageContent(role=AuthorRole.ASSISTANT, name=last, content=prompt[start:])]
+
+
+def make_kernel(service):
+    kernel = Kernel()
+    kernel.add_service(service)
+    return kernel
+
+
+async def run_before(service, request):
+    """The previous set-up: new kernel and agents per run, a model call to select and to terminate every turn."""
+    multi_agent._team = None
+    multi_agent.agent_kernel_factory = KernelFactory(lambda: make_kernel(service), dotenv_path="")
+    kernel, agents, selection_function = multi_agent.get_team()
+    termination_function = KernelFunction.from_prompt(
+        plugin_name="ConversationManager", function_name="termination",
+        prompt_template_config=multi_agent.history_prompt_config(TERMINATION_PROMPT),
+    )
+    group_chat = AgentGroupChat(
+        agents=agents,
+        termination_strategy=KernelFunctionTerminationStrategy(
+            agents=[agents[2]], kernel=kernel, function=termination_function,
+            result_parser=lambda result: str(result.value[0]).lower() == "yes",
+            history_variable_name="history", maximum_iterations=multi_agent.MAXIMUM_ITERATIONS,
+        ),
+        selection_strategy=KernelFunctionSelectionStrategy(
+            kernel=kernel, function=selection_function, result_parser=multi_agent.parse_agent_name,
+            history_variable_name="history",
+        ),
+    )
+    await group_chat.add_chat_message(ChatMessageContent(role=AuthorRole.USER, content=request))
+    return [message async for message in group_chat.invoke()]
+
+
+async def run_after(service, request):
+    return [event async for event in multi_agent.run_multi_agent(request)
+            if isinstance(event, multi_agent.AgentMessage)]
+
+
+async def measure(run, conversations, rework, reuse_kernel):
+    service = ScriptedChatService(ai_model_id="scripted", service_id="chat-service", rework=rework)
+    if reuse_kernel:
+        multi_agent._team = None
+        multi_agent.agent_kernel_factory = KernelFactory(lambda: make_kernel(service), dotenv_path="")
+    messages = 0
+    start = time.perf_counter()
+    for _ in range(conversations):
+        service.reviews = 0
+        messages += len(await run(service, "Build a calculator web app"))
+    seconds = time.perf_counter() - start
+    calls = sum(service.calls.values())
+    return {
+        "model_calls_per_conversation": round(calls / conversations, 1),
+        "calls_by_kind": {kind: round(count / conversations, 1) for kind, count in sorted(service.calls.items())},
+        "prompt_tokens_per_conversation": round(service.prompt_tokens / conversations),
+        "messages_per_conversation": round(messages / conversations, 1),
+        "overhead_ms_per_conversation": round(seconds * 1000 / conversations, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--rework", type=int, default=2, help="change requests before approval")
+    args = parser.parse_args()
+
+    print(json.dumps({
+        "before": await measure(run_before, args.conversations, args.rework, reuse_kernel=False),
+        "after": await measure(run_after, args.conversations, args.rework, reuse_kernel=True),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""Local stand-ins for the external services used by the benchmarks."""
+import json
+import os
+import statistics
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Make the application modules in src/ and the Work Items API modules importable
+# when a benchmark is run directly
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKITEMS_DIR = os.path.join(SRC_DIR, "workitems")
+for path in (SRC_DIR, WORKITEMS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+class StubServer:
+    """Threaded HTTP server that answers requests from a route table.
+
+    Routes map "METHOD /path" to a callable taking (path, body) and returning
+    (status, payload). Unknown routes answer 200 with an empty JSON object.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = routes or {}
+        self.request_count = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _dispatch(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"null") if length else None
+                path = self.path.split("?", 1)[0]
+                handler = stub.routes.get(f"{method} {path}")
+                status, payload = handler(self.path, body) if handler else (200, {})
+                data = json.dumps(payload).encode("utf-8")
+                stub.request_count += 1
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def summarize(samples_ms):
+    """Return p50/p95/mean of a list of millisecond timings."""
+    ordered = sorted(samples_ms)
+    p95_index = max(0, int(round(0.95 * len(ordered))) - 1)
+    return {
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[p95_index], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+    }
@@ -0,0 +1,143 @@
+"""Measure a chat turn with several tool calls, with and without the tool executor.
+
+A scripted chat service asks for tools the way the model does for "compare
+the weather at our Seattle and Denver offices". First it asks for two geocodes
+(async, --latency-ms each) and two office lookups. The office lookups are sync
+and block for --latency-ms, like a `requests` call. Then it asks for both
+forecasts, then it answers. A second scenario adds a tool that hangs, to show
+the per-plugin deadline:
+
+    python benchmarks/tool_execution_benchmark.py --turns 5
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Annotated, ClassVar
+
+import stubs  # noqa: F401  (puts src/ on the import path)
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.connectors.ai.function_choice_behavior import FunctionChoiceBehavior
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.function_call_content import FunctionCallContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+from semantic_kernel.functions import kernel_function
+from semantic_kernel.kernel import Kernel
+
+from tool_executor import ToolExecutor
+
+LATENCY = 0.15
+
+
+class TravelPlugin:
+    @kernel_function()
+    async def geocode(self, city: Annotated[str, "City"]) -> str:
+        await asyncio.sleep(LATENCY)
+        return f"{city}: 47.6, -122.3"
+
+    @kernel_function()
+    async def forecast(self, city: Annotated[str, "City"]) -> str:
+        await asyncio.sleep(LATENCY)
+        return f"{city}: sunny, 72F"
+
+    @kernel_function()
+    def office(self, city: Annotated[str, "City"]) -> str:
+        time.sleep(LATENCY)  # a blocking HTTP call
+        return f"Contoso {city} office, 5th floor"
+
+
+class SlowPlugin:
+    @kernel_function()
+    async def traffic(self, city: Annotated[str, "City"]) -> str:
+        await asyncio.sleep(60)
+        return f"{city}: no delays"
+
+
+class ScriptedToolService(ChatCompletionClientBase):
+    """Requests the scripted tool calls round by round, then answers."""
+
+    SUPPORTS_FUNCTION_CALLING: ClassVar[bool] = True
+    rounds: list = []
+
+    def get_prompt_execution_settings_class(self):
+        return PromptExecutionSettings
+
+    async def _inner_get_chat_message_contents(self, chat_history, settings):
+        done = sum(message.role == AuthorRole.ASSISTANT for message in chat_history.messages)
+        if done >= len(self.rounds):
+            return [ChatMessageContent(role=AuthorRole.ASSISTANT, content="Seattle is sunny, so is Denver.")]
+        calls = [FunctionCallContent(id=f"call-{done}-{n}", name=name, arguments=json.dumps({"city": city}))
+                 for n, (name, city) in enumerate(self.rounds[done])]
+        return [ChatMessageContent(role=AuthorRole.ASSISTANT, items=calls)]
+
+
+ROUNDS = [
+    [("Travel-geocode", "Seattle"), ("Travel-geocode", "Denver"),
+     ("Travel-office", "Seattle"), ("Travel-office", "Denver")],
+    [("Travel-forecast", "Seattle"), ("Travel-forecast", "Denver")],
+]
+
+
+async def max_loop_stall(work):
+    stalls = [0.0]
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append((time.perf_counter() - start) * 1000 - 5)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    result = await work()
+    done.set()
+    await task
+    return result, max(stalls)
+
+
+async def run_turns(rounds, turns, executor=None):
+    kernel = Kernel()
+    service = ScriptedToolService(ai_model_id="scripted", service_id="chat-service", rounds=rounds)
+    kernel.add_service(service)
+    kernel.add_plugin(TravelPlugin(), plugin_name="Travel")
+    kernel.add_plugin(SlowPlugin(), plugin_name="Slow")
+    if executor is not None:
+        executor.install(kernel)
+    settings = PromptExecutionSettings(function_choice_behavior=FunctionChoiceBehavior.Auto())
+
+    samples, stalls = [], []
+    for _ in range(turns):
+        history = ChatHistory()
+        history.add_user_message("Compare the weather at our Seattle and Denver offices")
+        start = time.perf_counter()
+        _, stall = await max_loop_stall(
+            lambda: service.get_chat_message_contents(history, settings, kernel=kernel))
+        samples.append((time.perf_counter() - start) * 1000)
+        stalls.append(stall)
+    return {"turn_ms": round(sum(samples) / len(samples)), "max_loop_stall_ms": round(max(stalls), 1)}
+
+
+async def main():
+    global LATENCY
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--timeout", type=float, default=1.0, help="deadline of the hanging tool in seconds")
+    args = parser.parse_args()
+    LATENCY = args.latency_ms / 1000
+
+    executor = ToolExecutor(timeouts={"Slow": args.timeout})
+    hanging = [ROUNDS[0] + [("Slow-traffic", "Seattle")], ROUNDS[1]]
+    print(json.dumps({
+        "before": await run_turns(ROUNDS, args.turns),
+        "after": await run_turns(ROUNDS, args.turns, executor),
+        "after_with_hanging_tool": await run_turns(hanging, 1, executor),
+        "timings": executor.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
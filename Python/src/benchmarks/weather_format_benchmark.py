@@ -0,0 +1,92 @@
+"""Compare WeatherPlugin forecast payloads and output sizes across formats.
+
+Builds Open-Meteo responses shaped like the real API's for the parameters the
+plugin used to send (16 days, every daily field plus current conditions) and
+for what it sends now (only the requested days and fields). Each is formatted
+the way get_forecast_weather returns it. Tokens use the same estimate as the
+chat history budget (plugins.tokens.estimate_tokens):
+
+    python benchmarks/weather_format_benchmark.py
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+
+import stubs  # noqa: F401  (puts src/ on the import path)
+from plugins.tokens import estimate_tokens
+from plugins.weather_plugin import FORECAST_FIELDS, WEATHER_CODES, format_json, format_summary, format_table, parse_fields
+
+CURRENT = ["temperature_2m", "relative_humidity_2m", "apparent_temperature", "precipitation",
+           "weather_code", "wind_speed_10m"]
+
+
+def open_meteo_response(days, fields, current, rng):
+    """A response body with the same keys, units and number formats as Open-Meteo's."""
+    start = date(2026, 10, 17)
+    daily = {"time": [(start + timedelta(days=n)).isoformat() for n in range(days)]}
+    units = {"time": "iso8601"}
+    for field in fields:
+        variable = FORECAST_FIELDS[field][0]
+        if field in ("high", "low"):
+            daily[variable] = [round(rng.uniform(40, 75), 1) for _ in range(days)]
+            units[variable] = "°F"
+        elif field == "precipitation":
+            daily[variable] = [round(max(0.0, rng.gauss(0.05, 0.2)), 2) for _ in range(days)]
+            units[variable] = "inch"
+        elif field == "precipitation_probability":
+            daily[variable] = [rng.randrange(0, 100) for _ in range(days)]
+            units[variable] = "%"
+        else:
+            daily[variable] = [rng.choice(list(WEATHER_CODES)) for _ in range(days)]
+            units[variable] = "wmo code"
+    body = {"latitude": 47.6062, "longitude": -122.33207, "generationtime_ms": 0.1, "utc_offset_seconds": -25200,
+            "timezone": "America/Los_Angeles", "timezone_abbreviation": "GMT-7", "elevation": 54.0}
+    if current:
+        body["current_units"] = {"time": "iso8601", "interval": "seconds", **{name: "" for name in CURRENT}}
+        body["current"] = {"time": "2026-10-17T10:00", "interval": 900, **{name: 1.0 for name in CURRENT}}
+    body["daily_units"] = units
+    body["daily"] = daily
+    return body
+
+
+def format_us(formatter, daily, fields, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        formatter(daily, fields, 47.6062, -122.33207)
+    return round((time.perf_counter() - start) / repeat * 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=7, help="days asked for by the new calls")
+    args = parser.parse_args()
+    rng = random.Random(42)
+    every_field = parse_fields("")
+    narrow = parse_fields("high,low,conditions")
+
+    cases = [
+        # name, days fetched, fields, current conditions fetched, formatter
+        ("before: json, 16 days + current", 16, every_field, True, format_json),
+        ("json, 16 days", 16, every_field, False, format_json),
+        ("compact, 16 days", 16, every_field, False, format_table),
+        (f"compact, {args.days} days", args.days, every_field, False, format_table),
+        (f"summary, {args.days} days", args.days, every_field, False, format_summary),
+        (f"compact, {args.days} days, high/low/conditions", args.days, narrow, False, format_table),
+    ]
+    results = {}
+    for name, days, fields, current, formatter in cases:
+        body = open_meteo_response(days, fields, current, rng)
+        output = formatter(body["daily"], fields, 47.6062, -122.33207)
+        results[name] = {
+            "upstream_bytes": len(json.dumps(body, separators=(",", ":")).encode("utf-8")),
+            "output_bytes": len(output.encode("utf-8")),
+            "output_tokens": estimate_tokens(output),
+            "format_us": format_us(formatter, body["daily"], fields),
+        }
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Measure title/tag search on the work item store against a full scan.
+
+    python benchmarks/workitems_search_benchmark.py --items 100000
+"""
+import argparse
+import json
+import random
+import time
+
+from stubs import summarize
+from schemas import WorkItemsDTO
+from store import WorkItemRepository, parse_tags, tokenize
+
+TYPES = ["Bug", "Epic", "Feature", "Task", "User Story"]
+STATES = ["New", "Active", "Resolved", "Closed"]
+
+
+def make_vocabulary(rng, size):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choices(letters, k=rng.randint(3, 9))) for _ in range(size)]
+
+
+def make_items(count, rng, vocabulary, tags):
+    # Word frequencies follow a rough Zipf distribution, like real titles
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    return [
+        WorkItemsDTO.model_construct(
+            ID=i, WorkItemType=TYPES[i % 5], State=STATES[i % 4], AssignedTo=f"User{i % 50}",
+            Title=" ".join(rng.choices(vocabulary, weights, k=rng.randint(4, 12))),
+            Tags="; ".join(rng.sample(tags, rng.randint(0, 3))), Version=1,
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def scan_search(items, text, limit):
+    # Before: the caller pulls every item and filters it by hand
+    terms = set(tokenize(text))
+    matches = [
+        (len(terms & (set(tokenize(item.Title)) | parse_tags(item.Tags))), item.ID, item)
+        for item in items
+    ]
+    return sorted((match for match in matches if match[0]), key=lambda match: (-match[0], match[1]))[:limit]
+
+
+def time_queries(search, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--scan-queries", type=int, default=10, help="queries for the slow full scan")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng, args.vocabulary)
+    tags = vocabulary[:200]
+    items = make_items(args.items, rng, vocabulary, tags)
+
+    start = time.perf_counter()
+    repository = WorkItemRepository(items)
+    build_seconds = time.perf_counter() - start
+
+    # Queries of one to three terms drawn from across the vocabulary, so they
+    # mix very common words with rare ones
+    queries = [" ".join(rng.sample(vocabulary[:5000], rng.randint(1, 3))) for _ in range(args.queries)]
+    rare_queries = [" ".join(rng.sample(vocabulary[1000:], 2)) for _ in range(args.queries)]
+
+    result = {
+        "items": args.items,
+        "before_scan": time_queries(lambda query: scan_search(items, query, args.limit), queries[:args.scan_queries]),
+        "after": {
+            "search": time_queries(lambda query: repository.search(query, limit=args.limit), queries),
+            "search_rare_terms": time_queries(lambda query: repository.search(query, limit=args.limit), rare_queries),
+            "search_filtered": time_queries(
+                lambda query: repository.search(query, {"State": "Active"}, args.limit), queries
+            ),
+            "update": time_queries(
+                lambda query: repository.update(rng.randint(1, args.items), {"Title": query}), queries
+            ),
+            "index_build_seconds": round(build_seconds, 3),
+        },
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Measure Work Items API startup time and durable write throughput per storage backend.
+
+    python benchmarks/workitems_storage_benchmark.py --items 100000 --writes 2000
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import time
+
+from stubs import WORKITEMS_DIR  # noqa: F401  (puts workitems/ on the import path)
+from schemas import WorkItemsDTO
+from storage import COLUMNS, CSVBackend, SQLiteBackend
+from store import WorkItemStore
+
+
+def make_item(row):
+    return WorkItemsDTO.model_construct(**row)
+
+
+def write_seed_csv(path, count):
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(COLUMNS)
+        for i in range(1, count + 1):
+            writer.writerow([i, "Task", f"Work item {i}", f"User{i % 50}", "New", ""])
+
+
+def timed_start(open_backend):
+    start = time.perf_counter()
+    store = WorkItemStore(open_backend(), make_item)
+    return store, round(time.perf_counter() - start, 3)
+
+
+async def write_throughput(store, writes, concurrency):
+    """Update distinct work items with the given number of concurrent writers."""
+    ids = list(range(1, writes + 1))
+    start = time.perf_counter()
+    for offset in range(0, writes, concurrency):
+        await asyncio.gather(*[
+            store.update(item_id, {"State": "Active"}) for item_id in ids[offset:offset + concurrency]
+        ])
+    return round(writes / (time.perf_counter() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    results = {"items": args.items, "writes": args.writes}
+    with tempfile.TemporaryDirectory() as data_dir:
+        seed_csv = os.path.join(data_dir, "workitems.csv")
+        write_seed_csv(seed_csv, args.items)
+
+        # SQLite: the first start seeds the database from the CSV, later starts read it
+        db_path = os.path.join(data_dir, "workitems.db")
+        store, seed_seconds = timed_start(lambda: SQLiteBackend(db_path, seed_csv))
+        sqlite = {
+            "first_start_seconds": seed_seconds,
+            "serial_writes_per_second": asyncio.run(write_throughput(store, args.writes, 1)),
+            "group_commit_writes_per_second": asyncio.run(write_throughput(store, args.writes, args.concurrency)),
+        }
+        store.close()
+        store, sqlite["restart_seconds"] = timed_start(lambda: SQLiteBackend(db_path, seed_csv))
+        store.close()
+        results["sqlite"] = sqlite
+
+        # CSV seed with an append-only log, then a restart that replays the log and
+        # one that starts from a snapshot
+        paths = {"wal_path": os.path.join(data_dir, "workitems.wal"),
+                 "snapshot_path": os.path.join(data_dir, "workitems.snapshot.json")}
+        store, seed_seconds = timed_start(lambda: CSVBackend(seed_csv, compact_after=10 ** 9, **paths))
+        csv_log = {
+            "first_start_seconds": seed_seconds,
+            "serial_writes_per_second": asyncio.run(write_throughput(store, args.writes, 1)),
+            "group_commit_writes_per_second": asyncio.run(write_throughput(store, args.writes, args.concurrency)),
+        }
+        store.close()
+        store, csv_log["restart_with_log_replay_seconds"] = timed_start(
+            lambda: CSVBackend(seed_csv, compact_after=10 ** 9, **paths))
+        store.backend.compact()
+        store.close()
+        store, csv_log["restart_from_snapshot_seconds"] = timed_start(lambda: CSVBackend(seed_csv, **paths))
+        store.close()
+        results["csv_log"] = csv_log
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compare point operations on the indexed work item store with the old list scans.
+
+    python benchmarks/workitems_store_benchmark.py --items 1000000
+"""
+import argparse
+import json
+import random
+import time
+
+from stubs import summarize
+from schemas import WorkItemsDTO
+from store import SORTABLE_FIELDS, WorkItemRepository
+
+TYPES = ["Bug", "Epic", "Feature", "Task", "User Story"]
+STATES = ["New", "Active", "Resolved", "Closed"]
+
+
+def make_items(count):
+    # model_construct skips validation; the data is known to be well formed
+    return [
+        WorkItemsDTO.model_construct(
+            ID=i, WorkItemType=TYPES[i % 5], Title=f"Work item {i}",
+            AssignedTo=f"User{i % 50}", State=STATES[i % 4], Tags="",
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def time_ops(operation, ids):
+    samples = []
+    for item_id in ids:
+        start = time.perf_counter()
+        operation(item_id)
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--scan-ops", type=int, default=20, help="ops for the slow list scans")
+    args = parser.parse_args()
+
+    items = make_items(args.items)
+    rng = random.Random(42)
+    ids = [rng.randint(1, args.items) for _ in range(args.ops)]
+
+    # Before: list with a linear next(...) scan per lookup, rebuilt on delete
+    workitems = list(items)
+    scan = lambda item_id: next((item for item in workitems if item.ID == item_id), None)
+
+    def list_delete(item_id):
+        nonlocal workitems
+        scan(item_id)
+        workitems = [item for item in workitems if item.ID != item_id]
+
+    before = {
+        "get": time_ops(scan, ids[:args.scan_ops]),
+        "delete": time_ops(list_delete, ids[:args.scan_ops]),
+    }
+
+    # After: repository with hash and secondary indexes
+    start = time.perf_counter()
+    repository = WorkItemRepository(items)
+    build_seconds = time.perf_counter() - start
+    # Sort indexes are built by the first page sorted by their field; build them
+    # all up front so the writes below pay for keeping them in order
+    start = time.perf_counter()
+    for field in SORTABLE_FIELDS:
+        repository.query(sort=field, limit=1)
+    sort_build_seconds = time.perf_counter() - start
+    # The other ops delete ids, so writes followed by a page use items still present
+    live_ids = [item_id for item_id in (rng.randint(1, args.items) for _ in range(20)) if item_id not in ids][:10]
+    after = {
+        "get": time_ops(repository.get, ids),
+        "update": time_ops(lambda item_id: repository.update(item_id, {"State": "Active"}), ids),
+        "delete": time_ops(repository.delete, ids),
+        "filter_by_state": time_ops(lambda _: len(repository.ids_where("State", "New")), ids[:10]),
+        # First page sorted by a non-ID field, read from its sort index
+        "page_by_title": time_ops(lambda _: repository.query(sort="Title", limit=50), ids[:10]),
+        # The same page right after a write that moves an item in that order
+        "update_then_page_by_title": time_ops(
+            lambda item_id: (repository.update(item_id, {"Title": f"Renamed {item_id}"}),
+                             repository.query(sort="Title", limit=50)), live_ids),
+        "page_by_title_state_new": time_ops(
+            lambda _: repository.query({"State": "New"}, sort="Title", limit=50), ids[:10]),
+        "index_build_seconds": round(build_seconds, 3),
+        "sort_index_build_seconds": round(sort_build_seconds, 3),
+    }
+    print(json.dumps({"items": args.items, "before": before, "after": after}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
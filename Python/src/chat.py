@@ -5,28 +5,43 @@ from semantic_kernel import Kernel
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion, OpenAITextToImage, AzureTextEmbedding
 from semantic_kernel.connectors.ai.function_choice_behavior import FunctionChoiceBehavior
 from semantic_kernel.connectors.openapi_plugin import OpenAPIFunctionExecutionParameters
-from semantic_kernel.contents.chat_history import ChatHistory
 from semantic_kernel.functions import KernelArguments
 from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
 from semantic_kernel.connectors.ai.open_ai import OpenAIChatPromptExecutionSettings
 import os
-from plugins.time_plugin import TimePlugin
-from plugins.geo_coding_plugin import GeoPlugin
-from plugins.weather_plugin import WeatherPlugin
-from plugins.ContosoSearchPlugin import ContosoSearchPlugin  # Add this import
-from plugins.ImageGenerationPlugin import ImageGenerationPlugin
 from semantic_kernel.connectors.ai.open_ai import AzureTextToImage
+from semantic_kernel.contents.function_call_content import FunctionCallContent
+from semantic_kernel.contents.text_content import TextContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
 from semantic_kernel.connectors.ai.open_ai.prompt_execution_settings.azure_chat_prompt_execution_settings import (
     AzureChatPromptExecutionSettings,
 )
-from semantic_kernel.connectors.ai.open_ai import OpenAITextToImage  # Add this import and keep the existing OpenAITextToImage
+from kernel_factory import KernelFactory
+from session_store import SessionStore
+from history_reducer import TokenBudgetReducer
+from tool_executor import ToolExecutor
+from plugin_registry import PluginRegistry
 
 # Add Logger
 logger = logging.getLogger(__name__)
 
 load_dotenv(override=True)
 
-chat_history = ChatHistory()
+# Chat histories are kept per session so concurrent users don't share a conversation.
+# Set CHAT_SESSION_DB to a SQLite file path to keep sessions across restarts.
+session_store = SessionStore(
+    max_sessions=int(os.getenv("CHAT_MAX_SESSIONS", "500")),
+    idle_ttl=int(os.getenv("CHAT_SESSION_TTL_SECONDS", "3600")),
+    max_messages=int(os.getenv("CHAT_MAX_MESSAGES", "200")),
+    persist_path=os.getenv("CHAT_SESSION_DB"),
+)
+
+DEFAULT_SESSION_ID = "default"
+
+# Older turns are folded into a summary once the history exceeds this many tokens
+history_reducer = TokenBudgetReducer(
+    token_budget=int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "4000")),
+)
 
 def initialize_kernel():
     # Challenge 02 - Add Kernel
@@ -73,63 +88,88 @@ def initialize_kernel():
     return kernel
 
 
-async def process_message(user_input):
-    kernel = initialize_kernel()
-
-    # Challenge 03 - Create Prompt Execution Settings
-    execution_settings = AzureChatPromptExecutionSettings()
-    execution_settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
-    logger.info("Automatic function calling enabled")
+# Chat plugins are only instantiated (and their heavy dependencies imported) when
+# the model first calls one of their functions
+plugin_registry = PluginRegistry()
+# Challenge 03 - Add Time Plugin
+plugin_registry.register("TimePlugin", "plugins.time_plugin:TimePlugin")
+plugin_registry.register("GeoLocation", "plugins.geo_coding_plugin:GeoPlugin")
+plugin_registry.register("Weather", "plugins.weather_plugin:WeatherPlugin")
+# Add Contoso Handbook Search Plugin
+plugin_registry.register("ContosoSearch", "plugins.ContosoSearchPlugin:ContosoSearchPlugin")
+# Add Image Generation Plugin, with the kernel set directly on the plugin instance
+plugin_registry.register(
+    "ImageGeneration",
+    "plugins.ImageGenerationPlugin:ImageGenerationPlugin",
+    setup=lambda plugin, kernel: plugin.set_kernel(kernel),
+)
 
-    # Challenge 03 - Add Time Plugin
-    time_plugin = TimePlugin()
-    kernel.add_plugin(time_plugin, plugin_name="TimePlugin")
-    logger.info("Time plugin loaded")
 
-    kernel.add_plugin(
-          GeoPlugin(),
-          plugin_name="GeoLocation",
-    )
-    logger.info("GeoLocation plugin loaded")
-
-    kernel.add_plugin(
-        WeatherPlugin(),
-        plugin_name="Weather",
-    )
-    logger.info("Weather plugin loaded")
-    
-    # Add Contoso Handbook Search Plugin
-    kernel.add_plugin(
-        ContosoSearchPlugin(),
-        plugin_name="ContosoSearch",
-    )
-    logger.info("Contoso Handbook Search plugin loaded")
-    
-    # Add Image Generation Plugin
-    image_plugin = ImageGenerationPlugin()
-    # Set the kernel directly on the plugin instance
-    image_plugin.set_kernel(kernel)
-    kernel.add_plugin(
-        image_plugin,
-        plugin_name="ImageGeneration",
-    )
-    logger.info("Image Generation plugin loaded")
+def register_plugins(kernel):
+    """Register the chat plugins on the kernel."""
+    plugin_registry.add_to_kernel(kernel)
+    logger.info(f"Plugins registered: {', '.join(plugin_registry.names())}")
 
     kernel.add_plugin_from_openapi(
         plugin_name="get_tasks",
-        openapi_document_path="http://127.0.0.1:8000/openapi.json",
+        openapi_document_path=os.getenv("WORKITEMS_OPENAPI_URL", "http://127.0.0.1:8000/openapi.json"),
         execution_settings=OpenAPIFunctionExecutionParameters(
             enable_payload_namespacing=True,
         )
     )
+    return kernel
+
+
+# Tool calls run concurrently with per-plugin limits and deadlines; sync plugin
+# functions run in a thread pool instead of on the event loop
+tool_executor = ToolExecutor(
+    default_limit=int(os.getenv("TOOL_MAX_CONCURRENCY", "4")),
+    default_timeout=float(os.getenv("TOOL_TIMEOUT_SECONDS", "30")),
+    # In sync mode generate_image waits for the image itself
+    timeouts={"ImageGeneration": float(os.getenv("IMAGE_GENERATION_WAIT_SECONDS", "120")) + 10},
+    threads=int(os.getenv("TOOL_THREADS", "8")),
+)
+
+
+def build_kernel():
+    """Build the kernel with its services and all chat plugins registered."""
+    return tool_executor.install(register_plugins(initialize_kernel()))
 
 
-    # Add user input to chat history
-    global chat_history
+# The kernel, its services and plugins are built once per process and reused
+# across chat turns and Streamlit reruns
+kernel_factory = KernelFactory(build_kernel)
+
+
+def create_execution_settings():
+    # Challenge 03 - Create Prompt Execution Settings
+    execution_settings = AzureChatPromptExecutionSettings()
+    execution_settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
+    logger.info("Automatic function calling enabled")
+    return execution_settings
+
+
+execution_settings = create_execution_settings()
+
+
+async def _prepare_turn(user_input, session_id):
+    """Add the user's message to the session and return what a turn needs."""
+    kernel = kernel_factory.get_kernel()
+
+    # Add user input to the session's chat history
+    chat_history = session_store.get(session_id)
     chat_history.add_user_message(user_input)
 
     # Get the chat completion service
     chat_completion = kernel.get_service(type=ChatCompletionClientBase)
+
+    # Keep the prompt within the token budget
+    await history_reducer.reduce(chat_history, chat_completion)
+    return kernel, chat_history, chat_completion
+
+
+async def process_message(user_input, session_id=DEFAULT_SESSION_ID):
+    kernel, chat_history, chat_completion = await _prepare_turn(user_input, session_id)
     
     # Make sure to pass the execution_settings with AUTO function calling
     # and pass kernel to allow access to the functions
@@ -141,20 +181,60 @@ async def process_message(user_input):
 
     # Add the AI's response to the chat history
     chat_history.add_assistant_message(str(response))
+    session_store.save(session_id)
     
     logger.info(f"Response: {response}")
     return response
 
-def reset_chat_history():
-    global chat_history
-    chat_history = ChatHistory()
+
+async def process_message_stream(user_input, session_id=DEFAULT_SESSION_ID):
+    """Streaming variant of process_message that yields the response text as it arrives.
+
+    Function calls requested by the model are still invoked automatically. The
+    text of every round is yielded, and all of it is stored as the assistant's
+    answer, so the history holds what the user saw.
+    """
+    kernel, chat_history, chat_completion = await _prepare_turn(user_input, session_id)
+
+    answer_parts = []
+    first_new_message = len(chat_history.messages)
+    async for chunk in chat_completion.get_streaming_chat_message_content(
+        chat_history=chat_history,
+        settings=execution_settings,
+        kernel=kernel
+    ):
+        if chunk is None or chunk.role == AuthorRole.TOOL:
+            continue
+        if chunk.content:
+            answer_parts.append(chunk.content)
+            yield chunk.content
+
+    # Text streamed before a function call is part of the stored answer, so drop it
+    # from the function call messages the auto-invoke loop added to the history
+    for message in chat_history.messages[first_new_message:]:
+        if any(isinstance(item, FunctionCallContent) for item in message.items):
+            message.items[:] = [item for item in message.items if not isinstance(item, TextContent)]
+
+    response = "".join(answer_parts)
+    chat_history.add_assistant_message(response)
+    session_store.save(session_id)
+
+    logger.info(f"Response: {response}")
+
+
+def reset_chat_history(session_id=DEFAULT_SESSION_ID):
+    """Start a new conversation for the session."""
+    session_store.reset(session_id)
+
 
 async def test_image_generation(prompt="A cute cat wearing a hat"):
     """Test function to directly generate an image"""
+    from plugins.ImageGenerationPlugin import ImageGenerationPlugin
+
     kernel = initialize_kernel()
     
-    # Create and register the plugin
-    image_plugin = ImageGenerationPlugin()
+    # Create and register the plugin (waiting for the image instead of returning a job ID)
+    image_plugin = ImageGenerationPlugin(mode="sync")
     image_plugin.set_kernel(kernel)
     kernel.add_plugin(image_plugin, plugin_name="ImageGeneration")
     
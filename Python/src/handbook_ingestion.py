@@ -0,0 +1,318 @@
+"""Build the employee handbook search index from source documents.
+
+    python handbook_ingestion.py employee_handbook.pdf --target local
+    python handbook_ingestion.py docs/*.md --target azure
+
+Documents are split into overlapping chunks, the chunks are embedded in batched
+requests with a bounded number in flight, and the results are upserted into the
+index in bulk. Every chunk carries a hash of its content, so re-running the
+pipeline only embeds chunks that are new or changed, and removes chunks that no
+longer exist in the re-ingested documents.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, Iterable, Iterator, List
+
+from dotenv import load_dotenv
+
+from plugins.http_client import get_http_client
+from plugins.vector_index import LocalVectorIndex
+
+logger = logging.getLogger(__name__)
+
+# Fields the handbook index has (see ContosoSearchPlugin)
+SEARCH_FIELDS = ("id", "content", "page_num", "chunk_id")
+
+# Azure AI Search accepts at most 1000 documents per indexing request
+AZURE_UPLOAD_BATCH = 1000
+
+
+def document_key(path: str) -> str:
+    """Return the key that prefixes the chunk IDs of a document (letters, digits and -)."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"[^A-Za-z0-9]+", "-", name).strip("-").lower() or "document"
+
+
+def read_pages(path: str) -> Iterator[tuple]:
+    """Yield (page_num, text) for each page of a PDF, Markdown or text file."""
+    if path.lower().endswith(".pdf"):
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise ImportError("Reading PDF files needs the pypdf package: pip install pypdf")
+        for page_num, page in enumerate(PdfReader(path).pages, 1):
+            yield page_num, page.extract_text() or ""
+    else:
+        with open(path, encoding="utf-8") as file:
+            # Form feeds separate pages in text exports
+            for page_num, text in enumerate(file.read().split("\f"), 1):
+                yield page_num, text
+
+
+def chunk_text(text: str, max_chars: int = 2000, overlap: int = 200) -> List[str]:
+    """Split text into chunks of up to max_chars, breaking between paragraphs where possible.
+
+    Each chunk after the first starts with the last overlap characters (whole
+    words) of the previous one, so sentences cut at a boundary keep some context.
+    """
+    paragraphs = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        # Paragraphs longer than a chunk are split between words
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            paragraphs.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip()
+        if paragraph:
+            paragraphs.append(paragraph)
+
+    chunks, current = [], ""
+    for paragraph in paragraphs:
+        if current and len(current) + 1 + len(paragraph) > max_chars:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            if len(current) > overlap:
+                # Start the overlap at a word boundary
+                tail = tail[tail.find(" ") + 1:] if " " in tail else ""
+            current = tail if len(tail) + 1 + len(paragraph) <= max_chars else ""
+        current = f"{current}\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def iter_chunks(paths: Iterable[str], max_chars: int = 2000, overlap: int = 200) -> Iterator[Dict[str, Any]]:
+    """Yield the chunk records of the documents, one page at a time."""
+    for path in paths:
+        key = document_key(path)
+        for page_num, text in read_pages(path):
+            for number, content in enumerate(chunk_text(text, max_chars, overlap)):
+                yield {
+                    "id": f"{key}_{page_num}_{number}",
+                    "content": content,
+                    "page_num": page_num,
+                    "chunk_id": f"{page_num}_{number}",
+                    "title": os.path.basename(path),
+                    "content_hash": content_hash(content),
+                }
+
+
+class LocalIndexSink:
+    """Writes chunks to a LocalVectorIndex directory (see HANDBOOK_INDEX_PATH)."""
+
+    def __init__(self, path: str, dimensions: int = 1536):
+        self.path = path
+        if os.path.exists(os.path.join(path, "records.json")):
+            self.index = LocalVectorIndex.load(path, mmap=False)
+        else:
+            self.index = LocalVectorIndex(dimensions)
+
+    def known_hashes(self) -> Dict[str, str]:
+        return {record["id"]: record.get("content_hash") for record in self.index.records}
+
+    def upsert(self, records: List[Dict[str, Any]], vectors: List[List[float]]) -> None:
+        self.index.upsert(records, vectors)
+
+    def delete(self, ids: List[str]) -> None:
+        self.index.delete(ids)
+
+    def flush(self) -> None:
+        self.index.save(self.path)
+
+
+class AzureSearchSink:
+    """Uploads chunks to an Azure AI Search index.
+
+    The index only has the fields the plugin reads, so the content hashes are
+    kept in a JSON manifest file next to the pipeline instead.
+    """
+
+    def __init__(self, search_client, manifest_path: str):
+        self.search_client = search_client
+        self.manifest_path = manifest_path
+        self._hashes = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as file:
+                self._hashes = json.load(file)
+
+    def known_hashes(self) -> Dict[str, str]:
+        return dict(self._hashes)
+
+    def upsert(self, records: List[Dict[str, Any]], vectors: List[List[float]]) -> None:
+        documents = [
+            {**{field: record[field] for field in SEARCH_FIELDS}, "contentVector": vector}
+            for record, vector in zip(records, vectors)
+        ]
+        for start in range(0, len(documents), AZURE_UPLOAD_BATCH):
+            self.search_client.merge_or_upload_documents(documents[start:start + AZURE_UPLOAD_BATCH])
+        self._hashes.update((record["id"], record["content_hash"]) for record in records)
+
+    def delete(self, ids: List[str]) -> None:
+        for start in range(0, len(ids), AZURE_UPLOAD_BATCH):
+            self.search_client.delete_documents([{"id": item_id} for item_id in ids[start:start + AZURE_UPLOAD_BATCH]])
+        for item_id in ids:
+            self._hashes.pop(item_id, None)
+
+    def flush(self) -> None:
+        with open(self.manifest_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(self._hashes, file)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+
+class HandbookIngestion:
+    """Streams chunks from documents through the embeddings API into a sink.
+
+    Chunks whose content hash matches what the sink already has are skipped.
+    The rest are embedded batch_size texts per request with at most concurrency
+    requests in flight, and written to the sink upsert_batch chunks at a time.
+    """
+
+    def __init__(self, sink, embeddings_url: str, api_key: str, batch_size: int = 16,
+                 concurrency: int = 4, upsert_batch: int = 256, max_chars: int = 2000, overlap: int = 200,
+                 dimensions: int = 1536):
+        self.sink = sink
+        self.embeddings_url = embeddings_url
+        self.api_key = api_key
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.upsert_batch = upsert_batch
+        self.max_chars = max_chars
+        self.overlap = overlap
+        self.dimensions = dimensions
+
+    @classmethod
+    def from_env(cls, sink, **options) -> "HandbookIngestion":
+        """Create a pipeline using the Azure OpenAI embedding deployment from the environment."""
+        load_dotenv()
+        url = (f"{os.getenv('AZURE_OPENAI_ENDPOINT')}/openai/deployments/"
+               f"{os.getenv('AZURE_OPENAI_EMBEDDING_DEPLOYMENT', 'text-embedding-ada-002')}/embeddings"
+               f"?api-version={os.getenv('AZURE_OPENAI_API_VERSION', '2023-05-15')}")
+        return cls(sink, url, os.getenv("AZURE_OPENAI_API_KEY"), **options)
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts with one request."""
+        data = await get_http_client().post_json(
+            self.embeddings_url,
+            json={"input": texts, "dimensions": self.dimensions},
+            headers={"Content-Type": "application/json", "api-key": self.api_key},
+        )
+        # Results carry the position of their input
+        return [item["embedding"] for item in sorted(data["data"], key=lambda item: item.get("index", 0))]
+
+    async def _embed(self, chunks):
+        return chunks, await self.embed_batch([chunk["content"] for chunk in chunks])
+
+    async def ingest(self, paths: List[str]) -> Dict[str, Any]:
+        """Index the documents and return statistics about the run."""
+        start = time.perf_counter()
+        stats = {"documents": len(paths), "chunks": 0, "skipped": 0, "embedded": 0, "requests": 0, "deleted": 0}
+        known = await asyncio.to_thread(self.sink.known_hashes)
+        seen = set()
+        pending: List[Dict[str, Any]] = []
+        in_flight = set()
+        records, vectors = [], []
+
+        async def collect(wait_for):
+            done, _ = await asyncio.wait(in_flight, return_when=wait_for)
+            for task in done:
+                in_flight.discard(task)
+                chunks, embeddings = task.result()
+                records.extend(chunks)
+                vectors.extend(embeddings)
+                stats["embedded"] += len(chunks)
+            if len(records) >= self.upsert_batch:
+                await asyncio.to_thread(self.sink.upsert, list(records), list(vectors))
+                records.clear()
+                vectors.clear()
+
+        async def dispatch(batch):
+            if len(in_flight) >= self.concurrency:
+                await collect(asyncio.FIRST_COMPLETED)
+            in_flight.add(asyncio.ensure_future(self._embed(batch)))
+            stats["requests"] += 1
+
+        try:
+            for chunk in iter_chunks(paths, self.max_chars, self.overlap):
+                stats["chunks"] += 1
+                seen.add(chunk["id"])
+                if known.get(chunk["id"]) == chunk["content_hash"]:
+                    stats["skipped"] += 1
+                    continue
+                pending.append(chunk)
+                if len(pending) == self.batch_size:
+                    await dispatch(pending)
+                    pending = []
+            if pending:
+                await dispatch(pending)
+            while in_flight:
+                await collect(asyncio.ALL_COMPLETED)
+        finally:
+            for task in in_flight:
+                task.cancel()
+        if records:
+            await asyncio.to_thread(self.sink.upsert, records, vectors)
+
+        # Chunks of the re-ingested documents that no longer exist
+        keys = {document_key(path) for path in paths}
+        stale = [item_id for item_id in known if item_id.rsplit("_", 2)[0] in keys and item_id not in seen]
+        if stale:
+            await asyncio.to_thread(self.sink.delete, stale)
+        stats["deleted"] = len(stale)
+        # Only write when something changed, so caches of search results (which
+        # watch the index files) stay valid after a no-op re-ingest
+        if stats["embedded"] or stale:
+            await asyncio.to_thread(self.sink.flush)
+
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        stats["chunks_per_second"] = round(stats["chunks"] / stats["seconds"], 1) if stats["seconds"] else None
+        return stats
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Build the employee handbook search index")
+    parser.add_argument("paths", nargs="+", help="PDF, Markdown or text files to index")
+    parser.add_argument("--target", choices=("local", "azure"), default="local")
+    parser.add_argument("--index-path", help="Local index directory (default: HANDBOOK_INDEX_PATH)")
+    parser.add_argument("--manifest", default=os.getenv("HANDBOOK_MANIFEST_PATH", "handbook_manifest.json"),
+                        help="Content hash manifest for the Azure target (default: HANDBOOK_MANIFEST_PATH)")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.target == "local":
+        path = args.index_path or os.getenv("HANDBOOK_INDEX_PATH")
+        if not path:
+            parser.error("--index-path or HANDBOOK_INDEX_PATH is required for the local target")
+        sink = LocalIndexSink(path)
+    else:
+        from azure.core.credentials import AzureKeyCredential
+        from azure.search.documents import SearchClient
+
+        sink = AzureSearchSink(
+            SearchClient(
+                endpoint=os.getenv("AI_SEARCH_URL"),
+                index_name=os.getenv("AZURE_SEARCH_INDEX", "employeehandbook"),
+                credential=AzureKeyCredential(os.getenv("AI_SEARCH_KEY")),
+            ),
+            args.manifest,
+        )
+
+    pipeline = HandbookIngestion.from_env(sink, batch_size=args.batch_size, concurrency=args.concurrency)
+    print(json.dumps(asyncio.run(pipeline.ingest(args.paths)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import logging
+
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+
+from plugins.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+TOKEN_COUNT_KEY = "__token_count__"
+SUMMARY_KEY = "__summary__"
+
+SUMMARY_PROMPT = """Summarize the conversation below so it can replace the original messages.
+Keep names, numbers, decisions, open questions and anything the user asked to remember.
+Be concise and write plain prose.
+
+{previous_summary}
+Conversation:
+{conversation}"""
+
+
+class TokenBudgetReducer:
+    """Keeps the chat history sent to the model within a token budget.
+
+    Token counts are computed once per message and cached in its metadata, so
+    each turn only counts the new messages. When the history exceeds the budget,
+    the oldest turns are replaced by a single summary message; the most recent
+    turns (up to retain_ratio of the budget) and all system messages are kept
+    verbatim. The summary is produced once and extended, not recomputed, the next
+    time older turns are folded into it.
+    """
+
+    def __init__(self, token_budget=4000, retain_ratio=0.5, token_counter=estimate_tokens):
+        self.token_budget = token_budget
+        self.retain_ratio = retain_ratio
+        self.token_counter = token_counter
+        self.summaries_created = 0
+
+    def count(self, message):
+        """Return the cached token count of a message, computing it on first use."""
+        cached = message.metadata.get(TOKEN_COUNT_KEY)
+        if cached is None:
+            cached = self.token_counter(message.content or "")
+            for item in message.items:
+                # Function calls and results are sent to the model too
+                if not hasattr(item, "text"):
+                    cached += self.token_counter(str(item))
+            message.metadata[TOKEN_COUNT_KEY] = cached
+        return cached
+
+    def total_tokens(self, chat_history):
+        return sum(self.count(message) for message in chat_history.messages)
+
+    async def reduce(self, chat_history, chat_service):
+        """Compact chat_history in place if it is over budget. Returns True if it was reduced."""
+        if self.total_tokens(chat_history) <= self.token_budget:
+            return False
+
+        pinned, summary, turns = [], None, []
+        for message in chat_history.messages:
+            if message.metadata.get(SUMMARY_KEY):
+                summary = message
+            elif message.role in (AuthorRole.SYSTEM, AuthorRole.DEVELOPER):
+                pinned.append(message)
+            else:
+                turns.append(message)
+
+        # Keep the newest turns up to the retained share of the budget, cutting only
+        # in front of a user message so function calls stay with their results
+        retained_budget = self.token_budget * self.retain_ratio - sum(self.count(m) for m in pinned)
+        cut = len(turns)
+        used = 0
+        for index in range(len(turns) - 1, -1, -1):
+            used += self.count(turns[index])
+            if used > retained_budget and cut < len(turns):
+                break
+            if turns[index].role == AuthorRole.USER:
+                cut = index
+        evicted, kept = turns[:cut], turns[cut:]
+        if not evicted:
+            return False
+
+        summary_text = await self._summarize(summary.content if summary else None, evicted, chat_service)
+        summary = ChatMessageContent(
+            role=AuthorRole.SYSTEM,
+            content=f"Summary of the earlier conversation: {summary_text}",
+            metadata={SUMMARY_KEY: True},
+        )
+        chat_history.messages[:] = pinned + [summary] + kept
+        self.summaries_created += 1
+        logger.info(f"Compacted {len(evicted)} messages into the conversation summary")
+        return True
+
+    async def _summarize(self, previous_summary, messages, chat_service):
+        conversation = "\n".join(
+            f"{message.role.value}: {message.content}" for message in messages if message.content
+        )
+        prompt = SUMMARY_PROMPT.format(
+            previous_summary=f"Summary so far:\n{previous_summary}\n" if previous_summary else "",
+            conversation=conversation,
+        )
+        summary_history = ChatHistory()
+        summary_history.add_user_message(prompt)
+        response = await chat_service.get_chat_message_content(
+            chat_history=summary_history,
+            settings=PromptExecutionSettings(),
+        )
+        return str(response)
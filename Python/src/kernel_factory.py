@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+
+from dotenv import find_dotenv, load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Environment settings the kernel and its plugins are built from. A change to any
+# of these (e.g. after editing .env) triggers a rebuild on the next request.
+CONFIG_KEYS = (
+    "AZURE_OPENAI_CHAT_DEPLOYMENT_NAME",
+    "AZURE_OPENAI_API_KEY",
+    "AZURE_OPENAI_ENDPOINT",
+    "AZURE_OPENAI_EMBEDDING_DEPLOYMENT",
+    "AZURE_OPENAI_API_VERSION",
+    "AZURE_TEXT_TO_IMAGE_DEPLOYMENT_NAME",
+    "AZURE_TEXT_TO_IMAGE_API_KEY",
+    "AZURE_TEXT_TO_IMAGE_ENDPOINT",
+    "AI_SEARCH_URL",
+    "AI_SEARCH_KEY",
+    "AZURE_SEARCH_INDEX",
+    "GEOCODING_API_KEY",
+    "WORKITEMS_OPENAPI_URL",
+)
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class KernelFactory:
+    """Builds a kernel once per process and hands out the cached instance.
+
+    The factory lives at module level, so it survives Streamlit reruns (modules are
+    only imported once per process). The kernel is rebuilt when the .env file or
+    any of the watched environment variables change, or when reload() is called.
+
+    The async SDK clients on the kernel are bound to the event loop they are first
+    used on, so the kernel is also rebuilt when it is requested from another
+    running loop. Callers that start a new loop per turn (asyncio.run()) get a
+    kernel per turn; callers on one persistent loop share a single kernel.
+    """
+
+    def __init__(self, builder, config_keys=CONFIG_KEYS, dotenv_path=None):
+        """Create a factory around a zero-argument builder that returns a Kernel."""
+        self._builder = builder
+        self._config_keys = tuple(config_keys)
+        self._dotenv_path = dotenv_path if dotenv_path is not None else find_dotenv(usecwd=True)
+        self._dotenv_mtime = None
+        self._lock = threading.Lock()
+        self._kernel = None
+        self._fingerprint = None
+        self._loop = None
+        self.build_count = 0
+
+    def _refresh_environment(self):
+        """Re-read the .env file if it was modified since the last check."""
+        if not self._dotenv_path:
+            return
+        try:
+            mtime = os.path.getmtime(self._dotenv_path)
+        except OSError:
+            return
+        if mtime != self._dotenv_mtime:
+            load_dotenv(self._dotenv_path, override=True)
+            self._dotenv_mtime = mtime
+
+    def _config_fingerprint(self):
+        digest = hashlib.sha256()
+        for key in self._config_keys:
+            digest.update(f"{key}={os.getenv(key, '')}\0".encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_kernel(self):
+        """Return the cached kernel, building or rebuilding it if required."""
+        self._refresh_environment()
+        fingerprint = self._config_fingerprint()
+        loop = _running_loop()
+        kernel = self._kernel
+        if kernel is not None and fingerprint == self._fingerprint and (loop is None or loop is self._loop):
+            return kernel
+
+        with self._lock:
+            if self._kernel is None or fingerprint != self._fingerprint:
+                if self._kernel is not None:
+                    logger.info("Configuration changed, rebuilding kernel")
+                self._build(fingerprint)
+            elif loop is not None and self._loop is not None and loop is not self._loop:
+                logger.info("Kernel requested from another event loop, rebuilding kernel")
+                self._build(fingerprint)
+            if loop is not None and self._loop is None:
+                self._loop = loop
+            return self._kernel
+
+    def _build(self, fingerprint):
+        self._kernel = self._builder()
+        self._fingerprint = fingerprint
+        self._loop = None
+        self.build_count += 1
+        logger.info("Kernel built (build #%d)", self.build_count)
+
+    def reload(self):
+        """Discard the cached kernel and build a fresh one."""
+        self.close()
+        return self.get_kernel()
+
+    def close(self):
+        """Drop the cached kernel so the next get_kernel() call rebuilds it."""
+        with self._lock:
+            self._kernel = None
+            self._fingerprint = None
+            self._loop = None
@@ -1,157 +1,246 @@
+import logging
 import os
-import asyncio
-from dotenv import load_dotenv
+import re
+from dataclasses import dataclass
+from typing import AsyncIterator, Union
 
 from semantic_kernel.agents import AgentGroupChat, ChatCompletionAgent
-from semantic_kernel.agents.strategies.termination.kernel_function_termination_strategy import KernelFunctionTerminationStrategy
+from semantic_kernel.agents.strategies.termination.termination_strategy import TerminationStrategy
 from semantic_kernel.agents.strategies.selection.kernel_function_selection_strategy import KernelFunctionSelectionStrategy
-from semantic_kernel.connectors.ai.open_ai.services.azure_chat_completion import AzureChatCompletion
 from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.history_reducer.chat_history_truncation_reducer import ChatHistoryTruncationReducer
 from semantic_kernel.contents.utils.author_role import AuthorRole
 from semantic_kernel.kernel import Kernel
-from semantic_kernel.functions.kernel_function_metadata import KernelFunctionMetadata
 from semantic_kernel.functions.kernel_function import KernelFunction
+from semantic_kernel.prompt_template.input_variable import InputVariable
+from semantic_kernel.prompt_template.prompt_template_config import PromptTemplateConfig
 
+from kernel_factory import KernelFactory
 
-async def run_multi_agent(input: str):
-    """Implement the multi-agent system."""
-    
-    load_dotenv()
-    kernel = Kernel()
-    
-    chat_completion_service = AzureChatCompletion(
-        deployment_name=os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME"),
-        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-        endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        service_id="chat-service",
-    )
-    kernel.add_service(chat_completion_service)
-    
-    # Define agent personas
-    business_analyst_persona = """You are a Business Analyst which will take the requirements from the user (also known as a 'customer')
+logger = logging.getLogger(__name__)
+
+BUSINESS_ANALYST = "BusinessAnalyst"
+SOFTWARE_ENGINEER = "SoftwareEngineer"
+PRODUCT_OWNER = "ProductOwner"
+AGENT_NAMES = (BUSINESS_ANALYST, SOFTWARE_ENGINEER, PRODUCT_OWNER)
+
+APPROVAL_TOKEN = "%APPR%"
+MAXIMUM_ITERATIONS = 20
+
+# Only the most recent messages are sent to the model when it has to pick the next agent
+SELECTION_HISTORY_MESSAGES = int(os.getenv("MULTI_AGENT_SELECTION_HISTORY", "6"))
+
+# A message that contains code is ready for review
+CODE_PATTERN = re.compile(r"```|<html|<script", re.IGNORECASE)
+
+# Define agent personas
+BUSINESS_ANALYST_PERSONA = """You are a Business Analyst which will take the requirements from the user (also known as a 'customer')
 and create a project plan for creating the requested app. The Business Analyst understands the user
-requirements and creates detailed documents with requirements and costing. The documents should be 
-usable by the SoftwareEngineer as a reference for implementing the required features, and by the 
+requirements and creates detailed documents with requirements and costing. The documents should be
+usable by the SoftwareEngineer as a reference for implementing the required features, and by the
 Product Owner for reference to determine if the application delivered by the Software Engineer meets
 all of the user's requirements."""
-    
-    software_engineer_persona = """You are a Software Engineer, and your goal is create a web app using HTML and JavaScript
+
+SOFTWARE_ENGINEER_PERSONA = """You are a Software Engineer, and your goal is create a web app using HTML and JavaScript
 by taking into consideration all the requirements given by the Business Analyst. The application should
 implement all the requested features. Deliver the code to the Product Owner for review when completed.
 You can also ask questions of the BusinessAnalyst to clarify any requirements that are unclear."""
 
-    product_owner_persona = """You are the Product Owner which will review the software engineer's code to ensure all user 
+PRODUCT_OWNER_PERSONA = """You are the Product Owner which will review the software engineer's code to ensure all user
 requirements are completed. You are the guardian of quality, ensuring the final product meets
 all specifications and receives the green light for release. Once all client requirements are
 completed, you can approve the request by just responding "%APPR%". Do not ask any other agent
 or the user for approval. If there are missing features, you will need to send a request back
 to the SoftwareEngineer or BusinessAnalyst with details of the defect. To approve, respond with
 the token %APPR%."""
-    
-    # Create agents
-    business_analyst = ChatCompletionAgent(
-        name="BusinessAnalyst",
-        kernel=kernel,
-    )
-    software_engineer = ChatCompletionAgent(
-        name="SoftwareEngineer",
-        kernel=kernel,
-    )
-    product_owner = ChatCompletionAgent(
-        name="ProductOwner",
-        kernel=kernel,
+
+SELECTION_PROMPT = """
+Based on the conversation history, determine which agent should speak next.
+Consider the following:
+- If this is the start of the conversation, the BusinessAnalyst should speak first to understand requirements
+- If the BusinessAnalyst has outlined requirements, the SoftwareEngineer should implement them
+- If the SoftwareEngineer has presented code, the ProductOwner should review it
+- If the ProductOwner has requested changes, the SoftwareEngineer should address them
+- If there are requirement questions, the BusinessAnalyst should clarify
+
+Return only the name of the agent who should speak next: BusinessAnalyst, SoftwareEngineer, or ProductOwner.
+
+History:
+{{$history}}
+"""
+
+
+def history_prompt_config(prompt):
+    """Prompt config for a conversation manager prompt that renders {{$history}}."""
+    # The strategies pass the history as a list of message dicts, which the template
+    # only renders when the variable allows it
+    return PromptTemplateConfig(
+        template=prompt,
+        input_variables=[InputVariable(name="history", allow_dangerously_set_content=True)],
     )
-    
-    # Create functions using KernelFunction directly
-    # Create termination function
-    termination_prompt = """
-    Check the conversation history for a message by the ProductOwner containing "%APPR%". 
-    If found, respond with 'yes' to indicate termination. Otherwise, respond with 'no'.
-
-    History:
-    {{$history}}
-    """
-    
-    # Create a termination function
-    termination_function = KernelFunction.from_prompt(
-        plugin_name="ConversationManager",  # Add this required parameter
-        prompt=termination_prompt,
-        function_name="termination",
-        description="Determines if conversation should terminate based on approval"
+
+
+def build_agent_kernel():
+    """Build the kernel shared by the agents and the selection function."""
+    # The OpenAI connector is slow to import and only needed once the agents run
+    from semantic_kernel.connectors.ai.open_ai.services.azure_chat_completion import AzureChatCompletion
+
+    kernel = Kernel()
+    kernel.add_service(AzureChatCompletion(
+        deployment_name=os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME"),
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        service_id="chat-service",
+    ))
+    return kernel
+
+
+# The kernel and agents are built once per process and reused by every run
+agent_kernel_factory = KernelFactory(build_agent_kernel)
+_team = None
+
+
+def get_team():
+    """Return (kernel, agents, selection function), creating the agents once per kernel."""
+    global _team
+    kernel = agent_kernel_factory.get_kernel()
+    if _team is None or _team[0] is not kernel:
+        agents = [
+            ChatCompletionAgent(name=BUSINESS_ANALYST, instructions=BUSINESS_ANALYST_PERSONA, kernel=kernel),
+            ChatCompletionAgent(name=SOFTWARE_ENGINEER, instructions=SOFTWARE_ENGINEER_PERSONA, kernel=kernel),
+            ChatCompletionAgent(name=PRODUCT_OWNER, instructions=PRODUCT_OWNER_PERSONA, kernel=kernel),
+        ]
+        selection_function = KernelFunction.from_prompt(
+            plugin_name="ConversationManager",
+            function_name="selection",
+            description="Determines which agent should speak next in the conversation",
+            prompt_template_config=history_prompt_config(SELECTION_PROMPT),
+        )
+        _team = (kernel, agents, selection_function)
+    return _team
+
+
+def select_by_rule(history):
+    """Return the name of the agent that obviously speaks next, or None if it takes judgement."""
+    last = next(
+        (message for message in reversed(history)
+         if message.role in (AuthorRole.USER, AuthorRole.ASSISTANT) and message.content),
+        None,
     )
-    kernel.add_function(termination_function)
-    
-    # Create selection function
-    selection_prompt = """
-    Based on the conversation history, determine which agent should speak next.
-    Consider the following:
-    - If this is the start of the conversation, the {BusinessAnalyst} should speak first to understand requirements
-    - If the BusinessAnalyst has outlined requirements, the {SoftwareEngineer} should implement them
-    - If the {SoftwareEngineer} has presented code, the {ProductOwner} should review it
-    - If the {ProductOwner} has requested changes, the {SoftwareEngineer} should address them
-    - If there are requirement questions, the {BusinessAnalyst} should clarify
-    
-    Return only the name of the agent who should speak next: BusinessAnalyst, SoftwareEngineer, or ProductOwner.
-    
-    History:
-    {{$history}}
-    
-    Last agent to speak: {{$last_agent}}
+    if last is None or last.role == AuthorRole.USER:
+        return BUSINESS_ANALYST
+    if last.name == BUSINESS_ANALYST:
+        return SOFTWARE_ENGINEER
+    mentioned = [name for name in (BUSINESS_ANALYST, SOFTWARE_ENGINEER) if name in last.content]
+    if last.name == SOFTWARE_ENGINEER:
+        if CODE_PATTERN.search(last.content):
+            return PRODUCT_OWNER
+        return BUSINESS_ANALYST if mentioned == [BUSINESS_ANALYST] else None
+    if last.name == PRODUCT_OWNER:
+        # Changes requested: whoever the ProductOwner addressed, the SoftwareEngineer by default
+        if not mentioned:
+            return SOFTWARE_ENGINEER
+        return mentioned[0] if len(mentioned) == 1 else None
+    return None
+
+
+def parse_agent_name(result):
+    """Return the agent name in the selection function's answer, or None."""
+    answer = str(result.value[0]) if result is not None and result.value else ""
+    return next((name for name in AGENT_NAMES if name in answer), None)
+
+
+class RuleBasedSelectionStrategy(KernelFunctionSelectionStrategy):
+    """Selects the next agent by rule for the obvious hand-offs, asking the model otherwise.
+
+    BusinessAnalyst -> SoftwareEngineer -> ProductOwner (once there is code) and
+    ProductOwner -> the agent it sent changes to need no model call; only
+    ambiguous turns fall back to the selection function, with the history cut
+    down by history_reducer.
     """
-    
-    selection_function = KernelFunction.from_prompt(
-        plugin_name="ConversationManager",  # Add this required parameter
-        prompt=selection_prompt,
-        function_name="selection", 
-        description="Determines which agent should speak next in the conversation"
-    )
-    kernel.add_function(selection_function)
-
-    # Create a helper function for creating a kernel with chat completion
-    def _create_kernel_with_chat_completion(function_name):
-        """Create a kernel with chat completion service for the specified function."""
-        temp_kernel = Kernel()
-        temp_kernel.add_service(AzureChatCompletion(
-            deployment_name=os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME"),
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            service_id="chat-service",
-        ))
-        return temp_kernel
-
-    # Create agent group chat with both termination and selection functions
-    group_chat = AgentGroupChat(
-        agents=[business_analyst, software_engineer, product_owner],
-        termination_strategy=KernelFunctionTerminationStrategy(
+
+    rule_selections: int = 0
+    model_selections: int = 0
+
+    async def select_agent(self, agents, history):
+        name = select_by_rule(history)
+        agent = next((agent for agent in agents if agent.name == name), None)
+        if agent is not None:
+            self.rule_selections += 1
+            return agent
+        self.model_selections += 1
+        return await super().select_agent(agents, history)
+
+
+class ApprovalTerminationStrategy(TerminationStrategy):
+    """Ends the chat as soon as a message from one of the agents contains the approval token."""
+
+    async def should_agent_terminate(self, agent, history):
+        return bool(history) and APPROVAL_TOKEN in (history[-1].content or "")
+
+
+def create_group_chat():
+    """Create a group chat for one conversation with the shared agents."""
+    kernel, agents, selection_function = get_team()
+    product_owner = agents[AGENT_NAMES.index(PRODUCT_OWNER)]
+    return AgentGroupChat(
+        agents=agents,
+        termination_strategy=ApprovalTerminationStrategy(
             agents=[product_owner],  # Only the ProductOwner can approve and terminate
-            kernel=kernel,  # Use the main kernel instead of creating a new one
-            function=termination_function,  # Use the termination function we created
-            result_parser=lambda result: str(result.value[0]).lower() == "yes",
-            history_variable_name="history",
-            maximum_iterations=20
+            maximum_iterations=MAXIMUM_ITERATIONS,
         ),
-        next_agent_selection_strategy=KernelFunctionSelectionStrategy(
+        selection_strategy=RuleBasedSelectionStrategy(
             kernel=kernel,
-            function=selection_function,  # Use the selection function we created
+            function=selection_function,
+            result_parser=parse_agent_name,
             history_variable_name="history",
-        )
+            history_reducer=ChatHistoryTruncationReducer(target_count=SELECTION_HISTORY_MESSAGES),
+        ),
+    )
+
+
+@dataclass
+class AgentMessage:
+    """One message of the transcript, yielded as soon as the agent has produced it."""
+
+    agent: str
+    content: str
+    turn: int
+
+
+@dataclass
+class ConversationCompleted:
+    """The last event of a conversation."""
+
+    approved: bool
+    turns: int
+    rule_selections: int
+    model_selections: int
+
+
+MultiAgentEvent = Union[AgentMessage, ConversationCompleted]
+
+
+async def run_multi_agent(input: str) -> AsyncIterator[MultiAgentEvent]:
+    """Run the multi-agent conversation, yielding an AgentMessage per agent turn and then a ConversationCompleted."""
+    group_chat = create_group_chat()
+    await group_chat.add_chat_message(ChatMessageContent(role=AuthorRole.USER, content=input))
+
+    turns = 0
+    last_content = ""
+    logger.info("Starting multi-agent conversation")
+    async for msg in group_chat.invoke():
+        turns += 1
+        last_content = msg.content or ""
+        logger.info(f"{msg.role} - {msg.name or '*'}: {(msg.content or '')[:80]!r}")
+        yield AgentMessage(agent=msg.name or str(msg.role), content=last_content, turn=turns)
+
+    selection = group_chat.selection_strategy
+    logger.info(f"Multi-agent conversation completed ({selection.rule_selections} turns selected by rule, "
+                f"{selection.model_selections} by the model)")
+    yield ConversationCompleted(
+        approved=APPROVAL_TOKEN in last_content,
+        turns=turns,
+        rule_selections=selection.rule_selections,
+        model_selections=selection.model_selections,
     )
-    
-    # Inject personas as system messages
-    messages = [
-        ChatMessageContent(role=AuthorRole.SYSTEM, content=business_analyst_persona, author="BusinessAnalyst"),
-        ChatMessageContent(role=AuthorRole.SYSTEM, content=software_engineer_persona, author="SoftwareEngineer"),
-        ChatMessageContent(role=AuthorRole.SYSTEM, content=product_owner_persona, author="ProductOwner"),
-        ChatMessageContent(role=AuthorRole.USER, content=input, author="User"),
-    ]
-    
-    responses = []
-    print("Starting multi-agent conversation...")
-    
-    async for msg in group_chat.invoke_async(messages):
-        if isinstance(msg, ChatMessageContent):
-            print(f"# {msg.role} - {msg.name or msg.author or '*'}: '{msg.content}'")
-            responses.append(msg)
-    
-    print("Multi-agent conversation completed.")
-    return responses
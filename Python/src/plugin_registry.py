@@ -0,0 +1,92 @@
+import importlib
+import inspect
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+from semantic_kernel.functions.kernel_plugin import KernelPlugin
+from semantic_kernel.functions.kernel_function_from_method import KernelFunctionFromMethod
+
+logger = logging.getLogger(__name__)
+
+
+class PluginSpec:
+    """Where to find a plugin class and how to set up an instance for a kernel."""
+
+    def __init__(self, name: str, target: str, setup: Optional[Callable] = None):
+        self.name = name
+        self.module, _, self.attribute = target.partition(":")
+        self.setup = setup
+
+    def load_class(self):
+        return getattr(importlib.import_module(self.module), self.attribute)
+
+
+class LazyPlugin:
+    """One kernel's instance of a plugin, created on the first call to one of its functions."""
+
+    def __init__(self, spec: PluginSpec, kernel):
+        self.spec = spec
+        self.kernel = kernel
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def instance(self):
+        if self._instance is None:
+            # Sync functions are called from worker threads (see ToolExecutor), so
+            # two first calls can race
+            with self._lock:
+                if self._instance is None:
+                    instance = self.spec.load_class()()
+                    if self.spec.setup is not None:
+                        self.spec.setup(instance, self.kernel)
+                    self._instance = instance
+                    logger.info(f"Plugin {self.spec.name} loaded")
+        return self._instance
+
+    def function(self, name, method):
+        """A kernel function with the metadata of the class's method that calls it on the instance."""
+        if inspect.iscoroutinefunction(method):
+            async def call(**kwargs):
+                return await getattr(self.instance, name)(**kwargs)
+        else:
+            def call(**kwargs):
+                return getattr(self.instance, name)(**kwargs)
+        # The @kernel_function metadata (name, description, parameters) travels with the function
+        call.__dict__.update({key: value for key, value in vars(method).items() if key.startswith("__kernel_function")})
+        call.__name__ = name
+        return KernelFunctionFromMethod(method=call, plugin_name=self.spec.name)
+
+
+class PluginRegistry:
+    """Registry of the chat plugins, resolved only when the model calls them.
+
+    A plugin is registered by name with a "module:Class" target. add_to_kernel()
+    imports the plugin modules (which keep their heavy dependencies, like the
+    Azure Search SDK, to the code paths that use them) to advertise the
+    functions, but an instance is only created, and set up with setup(instance,
+    kernel), when one of its functions is first called.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, PluginSpec] = {}
+
+    def register(self, name: str, target: str, setup: Optional[Callable] = None) -> None:
+        self._specs[name] = PluginSpec(name, target, setup)
+
+    def names(self):
+        return list(self._specs)
+
+    def add_to_kernel(self, kernel, names=None):
+        """Add the registered plugins (or only those in names) to a kernel."""
+        for name in names or self._specs:
+            spec = self._specs[name]
+            lazy = LazyPlugin(spec, kernel)
+            functions = [
+                lazy.function(attribute, method)
+                for attribute, method in inspect.getmembers(spec.load_class(), inspect.isfunction)
+                if getattr(method, "__kernel_function__", False)
+            ]
+            kernel.add_plugin(KernelPlugin(name=name, functions=functions))
+        return kernel
@@ -1,12 +1,92 @@
+import asyncio
 import json
+import logging
 import os
-from typing import Dict, List, Any, Optional
+from typing import TYPE_CHECKING, Annotated, Dict, List, Any, Optional
 
-import requests
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
-from azure.search.documents.models import VectorizedQuery
 from dotenv import load_dotenv
+from semantic_kernel.functions import kernel_function
+
+from plugins.tokens import estimate_tokens
+from plugins.embedding_cache import EmbeddingCache
+from plugins.http_client import get_http_client
+from plugins.semantic_cache import SemanticCache
+from plugins.vector_index import LocalVectorIndex
+
+if TYPE_CHECKING:
+    from azure.search.documents.models import VectorizedQuery
+
+logger = logging.getLogger(__name__)
+
+# Near-duplicate detection for pack_results: chunks are compared by their word
+# 5-grams, and one mostly contained in another is a duplicate
+SHINGLE_SIZE = 5
+DUPLICATE_CONTAINMENT = 0.8
+# Shortest repeated run of words removed where a chunk overlaps the previous one
+MIN_OVERLAP_WORDS = 8
+# A result is only cut to fit the budget if at least this many tokens are left
+MIN_PARTIAL_TOKENS = 50
+
+
+def _shingles(words):
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+
+
+def _overlap(previous, words):
+    """Return how many leading words repeat the end of previous."""
+    for size in range(min(len(previous), len(words)), MIN_OVERLAP_WORDS - 1, -1):
+        if previous[-size] == words[0] and previous[-size:] == words[:size]:
+            return size
+    return 0
+
+
+def _truncate(text, max_chars):
+    cut = text.rfind(". ", 0, max_chars)
+    if cut > 0:
+        return text[:cut + 1]
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > 0 else max_chars] + " ..."
+
+
+def pack_results(results: List[Dict[str, Any]], token_budget: int = 1500,
+                 min_relative_score: float = 0.35) -> List[tuple]:
+    """Choose and trim search results so they fit a token budget.
+
+    Results are taken best score first. Hits scoring below min_relative_score
+    times the best score are dropped, as are near-duplicates of a result already
+    taken. Where a chunk starts with the end of one already taken (chunks are cut
+    with some overlap), the repeated words are removed. Results are added until
+    the budget is spent; the one that doesn't fit is cut at a sentence boundary
+    if enough of the budget is left. Returns (result, content) pairs.
+    """
+    results = sorted(results, key=lambda result: result.get("score") or 0, reverse=True)
+    best_score = (results[0].get("score") or 0) if results else 0
+    packed, taken = [], []
+    remaining = token_budget
+    for result in results:
+        if best_score > 0 and (result.get("score") or 0) < best_score * min_relative_score:
+            break
+        words = str(result.get("content", "")).split()
+        shingles = _shingles(words)
+        if not words or any(len(shingles & other) >= DUPLICATE_CONTAINMENT * len(shingles) for _, other in taken):
+            continue
+        skip = max((_overlap(previous, words) for previous, _ in taken), default=0)
+        taken.append((words, shingles))
+        content = " ".join(words[skip:])
+        if not content:
+            continue
+
+        header_tokens = estimate_tokens(f"Result {len(packed) + 1} (Page {result.get('page_num')}):")
+        tokens = header_tokens + estimate_tokens(content)
+        if tokens > remaining:
+            room = remaining - header_tokens
+            if room >= MIN_PARTIAL_TOKENS:
+                packed.append((result, _truncate(content, (room - 4) * 4)))
+            break
+        packed.append((result, content))
+        remaining -= tokens
+    return packed
+
 
 class ContosoSearchPlugin:
     """Plugin for semantic search of the Contoso Handbook using text embeddings."""
@@ -26,18 +106,66 @@ class ContosoSearchPlugin:
         self.search_key = os.getenv("AI_SEARCH_KEY")
         self.search_index_name = os.getenv("AZURE_SEARCH_INDEX", "employeehandbook")
         
+        # Optional local copy of the index (see export_local_index). With
+        # HANDBOOK_SEARCH_BACKEND=local every query is answered from it and Azure AI
+        # Search isn't used at all; otherwise it is the fallback when Azure fails.
+        self.search_backend = os.getenv("HANDBOOK_SEARCH_BACKEND", "azure").lower()
+        self.local_index_path = os.getenv("HANDBOOK_INDEX_PATH")
+        self.local_index = None
+        if self.local_index_path and os.path.exists(self.local_index_path):
+            self.local_index = LocalVectorIndex.load(self.local_index_path)
+        elif self.search_backend == "local":
+            raise ValueError("HANDBOOK_SEARCH_BACKEND=local needs HANDBOOK_INDEX_PATH to point to a local index")
+
+        # Limits on what query_handbook hands back to the model (see pack_results)
+        self.context_token_budget = int(os.getenv("HANDBOOK_CONTEXT_TOKENS", "1500"))
+        self.min_relative_score = float(os.getenv("HANDBOOK_MIN_RELATIVE_SCORE", "0.35"))
+
+        # Retrieved chunks are reused for questions whose embedding is within the
+        # similarity threshold of an earlier one. The cache is cleared whenever the
+        # index is re-ingested: the local index files or, for Azure AI Search, the
+        # ingestion manifest (HANDBOOK_MANIFEST_PATH) change.
+        self.results_cache = SemanticCache(
+            threshold=float(os.getenv("HANDBOOK_CACHE_THRESHOLD", "0.92")),
+            ttl=float(os.getenv("HANDBOOK_CACHE_TTL_SECONDS", "3600")),
+            max_entries=int(os.getenv("HANDBOOK_CACHE_SIZE", "512")),
+        )
+        self.manifest_path = os.getenv("HANDBOOK_MANIFEST_PATH")
+        self._index_version = self._current_index_version()
+
         # Create search client
-        self.search_client = SearchClient(
-            endpoint=self.search_endpoint,
-            index_name=self.search_index_name,
-            credential=AzureKeyCredential(self.search_key)
+        self.search_client = None
+        if self.search_backend != "local":
+            # The Azure SDK is only imported when it is used
+            from azure.core.credentials import AzureKeyCredential
+            from azure.search.documents import SearchClient
+
+            self.search_client = SearchClient(
+                endpoint=self.search_endpoint,
+                index_name=self.search_index_name,
+                credential=AzureKeyCredential(self.search_key)
+            )
+
+        # Cache query embeddings so repeated questions skip the embeddings call.
+        # Set EMBEDDING_CACHE_PATH to a SQLite file to keep them across restarts.
+        self.embedding_cache = EmbeddingCache(
+            max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "1024")),
+            persist_path=os.getenv("EMBEDDING_CACHE_PATH"),
+            namespace=self.embedding_deployment,
         )
         
-    def generate_embedding(self, text: str) -> List[float]:
+    async def generate_embedding(self, text: str) -> List[float]:
         """Generate an embedding vector for the input text using Azure OpenAI."""
         if not text:
             raise ValueError("Input text cannot be empty")
-            
+        embedding = self.embedding_cache.get(text)
+        if embedding is None:
+            embedding = await self._request_embedding(text)
+            self.embedding_cache.put(text, embedding)
+        return embedding
+
+    async def _request_embedding(self, text: str) -> List[float]:
+        """Call the Azure OpenAI embeddings endpoint for a single text."""
         url = f"{self.openai_endpoint}/openai/deployments/{self.embedding_deployment}/embeddings?api-version={self.embedding_api_version}"
         headers = {
             "Content-Type": "application/json",
@@ -49,64 +177,154 @@ class ContosoSearchPlugin:
         }
         
         try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            embedding_data = response.json()
+            embedding_data = await get_http_client().post_json(url, json=payload, headers=headers)
             return embedding_data["data"][0]["embedding"]
         except Exception as e:
             raise Exception(f"Failed to generate embedding: {str(e)}")
     
-    def search_documents(self, query: str, top: int = 3) -> List[Dict[str, Any]]:
+    def _current_index_version(self):
+        paths = [self.manifest_path]
+        if self.local_index_path:
+            paths.append(os.path.join(self.local_index_path, "records.json"))
+        return tuple(os.stat(path).st_mtime_ns if path and os.path.exists(path) else None for path in paths)
+
+    def _check_index_version(self):
+        """Reload the local index and clear cached results if the index was re-ingested."""
+        version = self._current_index_version()
+        if version == self._index_version:
+            return
+        self._index_version = version
+        if self.local_index_path and os.path.exists(self.local_index_path):
+            self.local_index = LocalVectorIndex.load(self.local_index_path)
+        self.results_cache.clear()
+        logger.info("Handbook index changed, cleared cached search results")
+
+    async def search_documents(self, query: str, top: int = 3) -> List[Dict[str, Any]]:
         """Search for documents using vector search with the query embedding."""
         try:
             # Generate embedding for the query
-            query_embedding = self.generate_embedding(query)
-            
-            # Create a vectorized query
-            vector_query = VectorizedQuery(
-                vector=query_embedding,
-                k_nearest_neighbors=top,
-                fields="contentVector"
-            )
-            
-            # Execute the search
-            results = self.search_client.search(
-                search_text=query,  # Also include text search for hybrid retrieval
-                vector_queries=[vector_query],
-                select=["id", "content", "page_num", "chunk_id"],
-                top=top
-            )
-            
-            # Format the results
-            search_results = []
-            for result in results:
-                search_results.append({
-                    "id": result["id"],
-                    "content": result["content"],
-                    "page_num": result.get("page_num", "Unknown"),
-                    "chunk_id": result.get("chunk_id", "Unknown"),
-                    "score": result["@search.score"]
-                })
-            
-            return search_results
+            query_embedding = await self.generate_embedding(query)
+
+            self._check_index_version()
+            cached = self.results_cache.get(query_embedding)
+            # Entries remember how many results were asked for, so a larger top is a miss
+            if cached is not None and cached[0] >= top:
+                return cached[1][:top]
+
+            results = await self._search(query, query_embedding, top)
+            if results:
+                self.results_cache.put(query_embedding, (top, results))
+            return results
             
         except Exception as e:
             raise Exception(f"Search failed: {str(e)}")
+
+    async def _search(self, query: str, query_embedding: List[float], top: int) -> List[Dict[str, Any]]:
+        if self.search_client is None:
+            return await asyncio.to_thread(self._search_local, query, query_embedding, top)
+
+        from azure.search.documents.models import VectorizedQuery
+
+        # Create a vectorized query
+        vector_query = VectorizedQuery(
+            vector=query_embedding,
+            k_nearest_neighbors=top,
+            fields="contentVector"
+        )
+        
+        # Execute the search (the search client is synchronous, so it runs in a
+        # worker thread to keep the event loop free)
+        try:
+            return await asyncio.to_thread(self._run_search, query, vector_query, top)
+        except Exception as e:
+            if self.local_index is None:
+                raise
+            logger.warning(f"Azure AI Search failed ({e}), answering from the local index")
+            return await asyncio.to_thread(self._search_local, query, query_embedding, top)
+
+    def _search_local(self, query: str, query_embedding: List[float], top: int) -> List[Dict[str, Any]]:
+        # Same hybrid (vector + keyword) ranking as the Azure query, in process
+        return [
+            {
+                "id": record["id"],
+                "content": record["content"],
+                "page_num": record.get("page_num", "Unknown"),
+                "chunk_id": record.get("chunk_id", "Unknown"),
+                "score": score
+            }
+            for record, score in self.local_index.search(query, query_embedding, top)
+        ]
+
+    async def export_local_index(self, path: Optional[str] = None) -> int:
+        """Copy every chunk and its vector from Azure AI Search into a local index at path.
+
+        Returns the number of chunks exported. The contentVector field must be
+        retrievable in the search index.
+        """
+        path = path or self.local_index_path
+        if not path:
+            raise ValueError("No path given and HANDBOOK_INDEX_PATH is not set")
+
+        def export():
+            records, vectors = [], []
+            for result in self.search_client.search(
+                search_text="*", select=["id", "content", "page_num", "chunk_id", "contentVector"]
+            ):
+                vectors.append(result.pop("contentVector"))
+                records.append({field: result.get(field) for field in ("id", "content", "page_num", "chunk_id")})
+            index = LocalVectorIndex(dimensions=len(vectors[0]) if vectors else 1536)
+            index.upsert(records, vectors)
+            index.save(path)
+            return index
+
+        self.local_index = await asyncio.to_thread(export)
+        return len(self.local_index)
+
+    def _run_search(self, query: str, vector_query: "VectorizedQuery", top: int) -> List[Dict[str, Any]]:
+        results = self.search_client.search(
+            search_text=query,  # Also include text search for hybrid retrieval
+            vector_queries=[vector_query],
+            select=["id", "content", "page_num", "chunk_id"],
+            top=top
+        )
+        
+        # Format the results
+        search_results = []
+        for result in results:
+            search_results.append({
+                "id": result["id"],
+                "content": result["content"],
+                "page_num": result.get("page_num", "Unknown"),
+                "chunk_id": result.get("chunk_id", "Unknown"),
+                "score": result["@search.score"]
+            })
+        
+        return search_results
     
-    def query_handbook(self, query: str, top: int = 3) -> str:
+    @kernel_function(
+        description="Searches the Contoso employee handbook for information relevant to a question",
+        name="query_handbook"
+    )
+    async def query_handbook(
+        self,
+        query: Annotated[str, "The question to look up in the handbook"],
+        top: Annotated[int, "Number of results to return"] = 3
+    ) -> str:
         """Main method to query the Contoso Handbook with a user query."""
         try:
-            results = self.search_documents(query, top)
+            results = await self.search_documents(query, top)
             
-            # Format the results into a nice response
-            if not results:
+            # Keep only relevant, distinct content that fits the context budget
+            packed = pack_results(results, self.context_token_budget, self.min_relative_score)
+            if not packed:
                 return "No relevant information found in the Contoso Handbook."
-            
-            response = f"Here's what I found in the Contoso Handbook about '{query}':\n\n"
-            for i, result in enumerate(results, 1):
-                response += f"Result {i} (Page {result['page_num']}):\n{result['content']}\n\n"
-            
-            return response
+
+            parts = [f"Here's what I found in the Contoso Handbook about '{query}':"]
+            parts.extend(
+                f"Result {i} (Page {result['page_num']}):\n{content}"
+                for i, (result, content) in enumerate(packed, 1)
+            )
+            return "\n\n".join(parts)
             
         except Exception as e:
             return f"Error querying the Contoso Handbook: {str(e)}"
@@ -116,5 +334,5 @@ class ContosoSearchPlugin:
 if __name__ == "__main__":
     search_plugin = ContosoSearchPlugin()
     query = "What is Contoso's vacation policy?"
-    result = search_plugin.query_handbook(query)
+    result = asyncio.run(search_plugin.query_handbook(query))
     print(result)
\ No newline at end of file
@@ -1,99 +1,141 @@
 import os
-import json
+import atexit
+import base64
+import logging
+import threading
 from typing import Annotated
-from semantic_kernel.functions import kernel_function, KernelFunction
-from semantic_kernel.kernel import Kernel
-import httpx
-from PIL import Image
+from semantic_kernel.functions import kernel_function
+
+from plugins.http_client import get_http_client
+from plugins.image_jobs import ImageJobQueue, ImageQueueFull, SUCCEEDED, FAILED
+from plugins.image_renditions import DEFAULT_WIDTHS, ImageRenditions
+from plugins.image_store import ImageStore
+
+logger = logging.getLogger(__name__)
+
+# A plugin instance is created per kernel, so a rebuilt kernel gets a new one. The
+# job queue and renditions are kept per process instead, so job IDs handed to the
+# model stay valid across rebuilds: settings -> (ImageJobQueue, ImageRenditions)
+_job_queues = {}
+_job_queues_lock = threading.Lock()
+
+
+def _shared_job_queue(store_path, workers, max_pending, widths, processes):
+    settings = (os.path.abspath(store_path), workers, max_pending, tuple(widths), processes)
+    with _job_queues_lock:
+        if settings not in _job_queues:
+            renditions = ImageRenditions(widths=widths, processes=processes)
+            atexit.register(renditions.shutdown)
+            # Each submit passes the generate function of its plugin instance
+            jobs = ImageJobQueue(None, ImageStore(store_path), workers=workers, max_pending=max_pending,
+                                 post_process=renditions.render)
+            _job_queues[settings] = jobs, renditions
+        return _job_queues[settings]
 
 class ImageGenerationPlugin:
-    """Plugin for generating images using DALL-E."""
+    """Plugin for generating images using DALL-E.
 
-    def __init__(self):
+    Generations run as background jobs on a small worker pool and the images
+    are downloaded into a content-addressed store under IMAGE_STORE_PATH
+    (default ./images). With IMAGE_GENERATION_MODE=job (the default)
+    generate_image returns a job ID right away and get_image_job reports the
+    result; with IMAGE_GENERATION_MODE=sync it waits for the image. A prompt and
+    size that were generated before are served from the store.
+
+    Each new image also gets WebP and JPEG renditions at IMAGE_RENDITION_WIDTHS
+    (default 256,512,768), encoded in a process pool, so the UI can show the
+    smallest file that fits instead of the full-size PNG.
+
+    The job queue, store and rendition pool are shared by all instances with
+    the same settings, so jobs outlive a kernel rebuild.
+    """
+
+    def __init__(self, store_path=None, workers=None, mode=None):
         """Initialize the ImageGenerationPlugin."""
         self._kernel = None
+        self.mode = mode or os.getenv("IMAGE_GENERATION_MODE", "job")
+        widths = os.getenv("IMAGE_RENDITION_WIDTHS")
+        self.jobs, self.renditions = _shared_job_queue(
+            store_path or os.getenv("IMAGE_STORE_PATH", os.path.join(os.curdir, "images")),
+            workers=workers or int(os.getenv("IMAGE_GENERATION_WORKERS", "2")),
+            max_pending=int(os.getenv("IMAGE_GENERATION_MAX_PENDING", "32")),
+            widths=[int(width) for width in widths.split(",")] if widths else DEFAULT_WIDTHS,
+            processes=int(os.getenv("IMAGE_RENDITION_PROCESSES", "2")),
+        )
+        self.store = self.jobs.store
+        self.wait_seconds = float(os.getenv("IMAGE_GENERATION_WAIT_SECONDS", "120"))
 
     # This method will be called by Semantic Kernel when the plugin is registered
     def set_kernel(self, kernel):
         self._kernel = kernel
 
+    async def _generate(self, prompt, size):
+        """Generate one image and return its bytes."""
+        image_service = self._kernel.get_service(service_id="image-service")
+
+        # Parse size (format like "1024x1024")
+        if "x" in size:
+            width, height = map(int, size.split('x'))
+        else:
+            # Default to square if size format is incorrect
+            width = height = 1024
+
+        logger.info(f"Generating image with prompt: {prompt}")
+        result = await image_service.generate_image(description=prompt, width=width, height=height)
+
+        # The service returns either a short-lived URL or the base64 encoded image
+        if isinstance(result, str) and result.startswith("http"):
+            response = await get_http_client().request("GET", result, timeout=60.0)
+            return response.content
+        if isinstance(result, bytes):
+            return result
+        return base64.b64decode(result)
+
+    @staticmethod
+    def _describe(job):
+        if job.status == SUCCEEDED:
+            return f"Image ready: {job.path}"
+        if job.status == FAILED:
+            return f"Error generating image: {job.error}"
+        return f"Image job {job.id} is {job.status}. Check it later with get_image_job."
+
     @kernel_function(
-        description="Generates an image based on the text prompt",
+        description="Generates an image based on the text prompt. Returns the image, or a job ID to check with get_image_job if it is still being generated",
         name="generate_image"
     )
     async def generate_image(
-        self, 
+        self,
         prompt: Annotated[str, "Text description of the image to generate"],
         size: Annotated[str, "Size of the image (default: 1024x1024)"] = "1024x1024",
         kernel=None  # Allow kernel to be passed as a parameter
     ) -> str:
         """
         Generate an image using DALL-E based on the provided text prompt.
-        Returns the URL of the generated image.
+        Returns the local path of the stored image, or the job ID in job mode.
         """
+        # Use the provided kernel or the stored one
+        self._kernel = kernel or self._kernel
+        if not self._kernel:
+            return "Error: No kernel available to the plugin"
+
         try:
-            # Use the provided kernel or the stored one
-            kernel_to_use = kernel or self._kernel
-            if not kernel_to_use:
-                return "Error: No kernel available to the plugin"
-                
-            # Get the image service - use correct method name
-            try:
-                image_service = kernel_to_use.get_service(service_id="image-service")
-            except Exception as e:
-                return f"Error accessing image service: {str(e)}"
-
-            print(f"Generating image with prompt: {prompt}")
-            
-            # Parse size (format like "1024x1024")
-            if "x" in size:
-                width, height = map(int, size.split('x'))
-            else:
-                # Default to square if size format is incorrect
-                width = height = 1024
-            
-            # Generate the image with correct parameter names
-            result = await image_service.generate_image(
-                description=prompt,  # Using prompt as the description
-                width=width,
-                height=height
-            )
-
-            image_dir = os.path.join(os.curdir, 'images')
-
-            # If the directory doesn't exist, create it
-            if not os.path.isdir(image_dir):
-                os.mkdir(image_dir)
-
-            # Properly handle the result based on its type
-            try:
-                # For newer SDK versions that return a string
-                if isinstance(result, str):
-                    print(f"Result is a string: {result}")
-                    json_response = json.loads(result)
-                # For older SDK versions that return an object with model_dump_json
-                else:
-                    print(f"Result is an object with type: {type(result)}")
-                    json_response = json.loads(result.model_dump_json())
-                
-                print(f"API Response: {json_response}")
-                
-                image_url = json_response["data"][0]["url"]  # extract image URL from response
-                return image_url
-                
-            except Exception as e:
-                # If we can't parse the response properly, log it and return it as-is
-                print(f"Error processing image response: {str(e)}")
-                print(f"Raw response: {result}")
-                
-                # If the result is already the URL, return it directly
-                if isinstance(result, str) and result.startswith("http"):
-                    return result
-                        
-                return f"Image response received but couldn't process it: {result}"
-
-        except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            print(f"Error generating image: {str(e)}\n{error_details}")
-            return f"Error generating image: {str(e)}"
\ No newline at end of file
+            job = await self.jobs.submit(prompt, size, generate=self._generate)
+        except ImageQueueFull as e:
+            return f"Error generating image: {e}. Try again later."
+
+        if self.mode == "sync":
+            job = await self.jobs.wait(job, self.wait_seconds)
+        return self._describe(job)
+
+    @kernel_function(
+        description="Gets the status of an image generation job, and the image once it is ready",
+        name="get_image_job"
+    )
+    async def get_image_job(
+        self,
+        job_id: Annotated[str, "The job ID returned by generate_image"],
+    ) -> str:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return f"No image job with ID {job_id}"
+        return self._describe(job)
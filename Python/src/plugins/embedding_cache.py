@@ -0,0 +1,143 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Two-tier cache of embedding vectors keyed by a hash of the input text.
+
+    The first tier is an in-memory LRU of up to max_entries vectors. When
+    persist_path is set, vectors are also stored as float32 blobs in a SQLite
+    database, which keeps at most max_persisted entries and survives restarts.
+    Rows are counted as they are inserted; once the count passes max_persisted,
+    the least recently used rows are deleted down to 90% of it, so writes don't
+    scan the table.
+
+    The namespace (e.g. the embedding deployment name) is part of the key, so
+    vectors from different models never mix.
+    """
+
+    def __init__(self, max_entries: int = 1024, persist_path: Optional[str] = None,
+                 max_persisted: int = 100_000, namespace: str = ""):
+        self.max_entries = max_entries
+        self.max_persisted = max_persisted
+        self.namespace = namespace
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._persisted = 0
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._db.commit()
+            (self._persisted,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    def key(self, text: str) -> str:
+        """Return the cache key for a text (whitespace differences don't matter)."""
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{self.namespace}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """Return the cached vector for a text, or None on a miss."""
+        key = self.key(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            vector = self._load(key)
+            if vector is not None:
+                self.disk_hits += 1
+                self._remember(key, vector)
+                return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, vector: List[float]) -> None:
+        """Store the vector for a text in both tiers."""
+        key = self.key(text)
+        with self._lock:
+            self._remember(key, vector)
+            self._store(key, vector)
+
+    def get_or_compute(self, text: str, compute: Callable[[str], List[float]]) -> List[float]:
+        """Return the cached vector for a text, calling compute(text) on a miss."""
+        vector = self.get(text)
+        if vector is None:
+            vector = compute(text)
+            self.put(text, vector)
+        return vector
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, key):
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._db.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._db.commit()
+        return array("f", row[0]).tolist()
+
+    def _store(self, key, vector):
+        if self._db is None:
+            return
+        blob, now = array("f", vector).tobytes(), time.time()
+        inserted = self._db.execute(
+            "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+            (key, blob, now),
+        ).rowcount
+        if inserted:
+            self._persisted += 1
+        else:
+            self._db.execute("UPDATE embeddings SET vector = ?, last_used = ? WHERE key = ?", (blob, now, key))
+        if self._persisted > self.max_persisted:
+            self._evict_persisted()
+        self._db.commit()
+
+    def _evict_persisted(self):
+        # Recount first: other processes may share the database
+        (count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - int(self.max_persisted * 0.9)
+        if count > self.max_persisted and excess > 0:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            logger.info(f"Evicted {excess} persisted embeddings")
+            count -= excess
+        self._persisted = count
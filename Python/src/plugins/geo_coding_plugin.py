@@ -1,20 +1,21 @@
 from typing import TypedDict, Annotated, Optional  
-import requests  
 import asyncio  
 from semantic_kernel.functions import kernel_function
 import os
-from dotenv import load_dotenv
 
-load_dotenv(override=True)
+from plugins.http_client import get_http_client
+from plugins.result_cache import ttl_cache
 
 class GeoPlugin:  
 
     @kernel_function(description="Gets the latitude and longitude for a location.")
+    # Geocodes don't change, so they are cached without expiry
+    @ttl_cache(ttl=None, key=lambda location: " ".join(location.lower().split()))
     async def get_latitude_longitude(self, location:Annotated[str, "The name of the location"]):  
-        print(f"lat/long request location: {location}")
-        url = f"https://geocode.maps.co/search?q={location}&api_key={os.getenv('GEOCODING_API_KEY')}"  
-        response = requests.get(url) 
-        data = response.json() 
+        data = await get_http_client().get_json(
+            "https://geocode.maps.co/search",
+            params={"q": location, "api_key": os.getenv('GEOCODING_API_KEY')},
+        )
         position = data[0]
         return f"Latitude: {position['lat']}, Longitude: {position['lon']}"
-    
\ No newline at end of file
+    
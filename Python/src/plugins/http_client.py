@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import random
+import weakref
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# httpx logs every request URL at INFO, and plugins pass API keys as query
+# parameters (e.g. the geocoding api_key), so keep its request log out of the
+# app's INFO output
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class HttpClient:
+    """Shared async HTTP client for plugin calls to external APIs.
+
+    Wraps a single httpx.AsyncClient so connections are pooled and kept alive
+    across calls, limits how many requests run against one host at a time,
+    applies a default timeout, and retries connection errors, timeouts and
+    retryable status codes with jittered exponential backoff.
+    """
+
+    def __init__(self, timeout: float = 10.0, max_connections: int = 100,
+                 max_keepalive_connections: int = 20, per_host_limit: int = 8,
+                 retries: int = 3, backoff_base: float = 0.25, backoff_max: float = 4.0):
+        self.per_host_limit = per_host_limit
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+        )
+
+    def _semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return semaphore
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        # "Full jitter": a random delay up to the exponential cap
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a request, retrying transient failures, and return the successful response."""
+        async with self._semaphore(url):
+            for attempt in range(self.retries + 1):
+                try:
+                    response = await self._client.request(method, url, **kwargs)
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    if attempt == self.retries:
+                        raise
+                    delay = self._backoff(attempt)
+                    logger.warning(f"{method} {url} failed ({e!r}), retrying in {delay:.2f}s")
+                else:
+                    if response.status_code not in RETRY_STATUS_CODES or attempt == self.retries:
+                        response.raise_for_status()
+                        return response
+                    delay = self._backoff(attempt, response)
+                    logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def get_json(self, url: str, **kwargs: Any) -> Any:
+        response = await self.request("GET", url, **kwargs)
+        return response.json()
+
+    async def post_json(self, url: str, json: Any, **kwargs: Any) -> Any:
+        response = await self.request("POST", url, json=json, **kwargs)
+        return response.json()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+# httpx clients and asyncio semaphores belong to the loop they were first used on,
+# so there is one shared client per running event loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, HttpClient]" = weakref.WeakKeyDictionary()
+
+
+def get_http_client() -> HttpClient:
+    """Return the shared client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = HttpClient()
+    return client
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional
+
+from plugins.image_store import ImageStore, request_key
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class ImageQueueFull(Exception):
+    """Raised by submit() when max_pending generations are already waiting."""
+
+
+@dataclass
+class ImageJob:
+    id: str
+    prompt: str
+    size: str
+    status: str = QUEUED
+    path: Optional[str] = None
+    error: Optional[str] = None
+    cached: bool = False
+    created: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def finish(self, status: str, path: Optional[str] = None, error: Optional[str] = None) -> None:
+        self.status, self.path, self.error = status, path, error
+        self.finished = time.time()
+        self.done.set()
+
+
+class ImageJobQueue:
+    """Runs image generations in the background on a bounded pool of workers.
+
+    submit() returns an ImageJob right away; `workers` tasks on the event loop
+    take queued jobs, call generate(prompt, size) for the image bytes and put
+    them in the ImageStore. A submit can pass its own generate function (e.g.
+    one bound to the caller's kernel) to use instead for that job. A (prompt, size) that is already in the store
+    completes immediately without a model call, and a submit for a request that
+    is already queued or running returns that job instead of starting another.
+
+    At most max_pending jobs wait in the queue (submit raises ImageQueueFull
+    beyond that) and the last max_jobs jobs are kept for get(). If given,
+    post_process(path) runs on each new image before its job completes; a
+    failure there is logged and does not fail the job.
+    """
+
+    def __init__(self, generate: Optional[Callable[[str, str], Awaitable[bytes]]], store: ImageStore,
+                 workers: int = 2, max_pending: int = 32, max_jobs: int = 256,
+                 post_process: Optional[Callable[[str], Awaitable[object]]] = None):
+        self.generate = generate
+        self.store = store
+        self.post_process = post_process
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self.generated = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self._jobs: "OrderedDict[str, ImageJob]" = OrderedDict()
+        self._active: Dict[str, ImageJob] = {}  # request key -> queued or running job
+        self._queue = None
+        self._tasks = []
+        self._loop = None
+
+    def _ensure_workers(self) -> None:
+        # The queue and the workers belong to the loop they were started on
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(self.max_pending)
+        self._active.clear()
+        self._tasks = [loop.create_task(self._work(), name=f"image-worker-{n}") for n in range(self.workers)]
+
+    def _track(self, job: ImageJob) -> ImageJob:
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            oldest = next(iter(self._jobs.values()))
+            if not oldest.done.is_set():
+                break
+            self._jobs.popitem(last=False)
+        return job
+
+    async def submit(self, prompt: str, size: str = "1024x1024",
+                     generate: Optional[Callable[[str, str], Awaitable[bytes]]] = None) -> ImageJob:
+        """Queue a generation and return its job (already finished if the image is stored)."""
+        self._ensure_workers()
+        key = request_key(prompt, size)
+        active = self._active.get(key)
+        if active is not None:
+            self.coalesced += 1
+            return active
+
+        job = ImageJob(id=uuid.uuid4().hex, prompt=prompt, size=size)
+        path = await asyncio.to_thread(self.store.lookup, prompt, size)
+        active = self._active.get(key)  # submitted by another caller during the lookup
+        if active is not None:
+            self.coalesced += 1
+            return active
+        if path is not None:
+            self.cache_hits += 1
+            job.cached = True
+            job.finish(SUCCEEDED, path=path)
+            return self._track(job)
+
+        try:
+            self._queue.put_nowait((key, job, generate or self.generate))
+        except asyncio.QueueFull:
+            raise ImageQueueFull(f"{self.max_pending} image generations are already waiting") from None
+        self._active[key] = job
+        return self._track(job)
+
+    def get(self, job_id: str) -> Optional[ImageJob]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: ImageJob, timeout: Optional[float] = None) -> ImageJob:
+        """Wait until the job has finished (or timeout seconds passed) and return it."""
+        try:
+            await asyncio.wait_for(job.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job
+
+    async def _work(self) -> None:
+        while True:
+            key, job, generate = await self._queue.get()
+            job.status = RUNNING
+            try:
+                data = await generate(job.prompt, job.size)
+                path = await asyncio.to_thread(self._save, job, data)
+                self.generated += 1
+                if self.post_process is not None:
+                    try:
+                        await self.post_process(path)
+                    except Exception as e:
+                        logger.warning(f"Post-processing {path} failed: {e!r}")
+                job.finish(SUCCEEDED, path=path)
+                logger.info(f"Image job {job.id} stored {path}")
+            except Exception as e:
+                logger.error(f"Image job {job.id} failed: {e!r}")
+                job.finish(FAILED, error=str(e))
+            finally:
+                self._active.pop(key, None)
+                self._queue.task_done()
+
+    def _save(self, job: ImageJob, data: bytes) -> str:
+        path = self.store.put(data)
+        self.store.remember(job.prompt, job.size, path)
+        return path
+
+    def stats(self) -> dict:
+        return {
+            "generated": self.generated,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "running": len(self._active) - (self._queue.qsize() if self._queue is not None else 0),
+        }
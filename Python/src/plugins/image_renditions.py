@@ -0,0 +1,128 @@
+import asyncio
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from plugins.image_store import write_atomic
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (256, 512, 768)
+# Encoders in order of preference: WebP is about a third smaller, JPEG is the fallback
+FORMATS = {"webp": ("WEBP", ".webp", {"quality": 80, "method": 4}),
+           "jpeg": ("JPEG", ".jpg", {"quality": 85, "optimize": True, "progressive": True})}
+MANIFEST = "renditions.json"
+
+
+def make_renditions(source: str, directory: str, widths: Sequence[int] = DEFAULT_WIDTHS,
+                    formats: Sequence[str] = tuple(FORMATS)) -> List[Dict]:
+    """Encode scaled-down copies of an image and return their descriptions.
+
+    Runs in a worker process (see ImageRenditions): each width gets one file
+    per format in directory, plus a renditions.json listing them. Images are
+    never scaled up, and each size is resized from the next larger one, which
+    is much cheaper than resizing every size from the original.
+    """
+    from PIL import Image  # only the worker processes need PIL
+
+    renditions = []
+    with Image.open(source) as image:
+        image.load()
+        current = image.convert("RGB")
+        for width in sorted({min(width, image.width) for width in widths}, reverse=True):
+            if width != current.width:
+                current = current.resize((width, round(current.height * width / current.width)),
+                                         Image.Resampling.LANCZOS)
+            for name in formats:
+                encoder, extension, options = FORMATS[name]
+                buffer = io.BytesIO()
+                current.save(buffer, encoder, **options)
+                path = os.path.join(directory, f"{width}{extension}")
+                write_atomic(path, buffer.getvalue())
+                renditions.append({"format": name, "width": current.width, "height": current.height,
+                                   "bytes": buffer.tell(), "path": os.path.basename(path)})
+    renditions.sort(key=lambda rendition: (rendition["width"], list(FORMATS).index(rendition["format"])))
+    write_atomic(os.path.join(directory, MANIFEST), json.dumps(renditions).encode("utf-8"))
+    return renditions
+
+
+def rendition_directory(path: str) -> str:
+    """Directory holding the renditions of a stored image (objects/ab/abc.png -> objects/ab/abc/)."""
+    return os.path.splitext(path)[0]
+
+
+def load_renditions(path: str) -> Optional[List[Dict]]:
+    """Return the renditions made for a stored image (with absolute paths), or None."""
+    directory = rendition_directory(path)
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as file:
+            renditions = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return [{**rendition, "path": os.path.join(directory, rendition["path"])} for rendition in renditions]
+
+
+def pick_rendition(path: str, width: int, formats: Sequence[str] = tuple(FORMATS)) -> str:
+    """Return the smallest file that is at least width pixels wide, in the first available format.
+
+    Falls back to the largest rendition, and to the original image when it has
+    none yet.
+    """
+    renditions = [rendition for rendition in load_renditions(path) or [] if rendition["format"] in formats]
+    if not renditions:
+        return path
+    preferred = min(renditions, key=lambda rendition: list(formats).index(rendition["format"]))["format"]
+    candidates = [rendition for rendition in renditions if rendition["format"] == preferred]
+    fitting = [rendition for rendition in candidates if rendition["width"] >= width]
+    chosen = min(fitting, key=lambda rendition: rendition["width"]) if fitting else max(
+        candidates, key=lambda rendition: rendition["width"])
+    return chosen["path"]
+
+
+IMAGE_PATH_PATTERN = re.compile(r"[^\s()\[\]`'\"]+objects[\\/][0-9a-f]{2}[\\/][0-9a-f]{64}\.(?:png|jpg|webp)")
+
+
+def find_images(text: str) -> List[str]:
+    """Return the paths of stored images mentioned in a message, in order and without repeats."""
+    return list(dict.fromkeys(path for path in IMAGE_PATH_PATTERN.findall(text) if os.path.exists(path)))
+
+
+class ImageRenditions:
+    """Makes the renditions of generated images in a pool of worker processes.
+
+    Resizing and encoding are CPU-bound and hold the GIL, so they run in a
+    ProcessPoolExecutor (created on first use) and only the await is on the
+    event loop. The workers are started by a fork server (spawned where there
+    is none), never forked from this process: it runs an event loop, SDK
+    clients and thread pools, and forking a multi-threaded process can
+    deadlock the child on a lock some other thread held.
+    """
+
+    def __init__(self, widths: Sequence[int] = DEFAULT_WIDTHS, processes: Optional[int] = None):
+        self.widths = tuple(widths)
+        self.processes = processes
+        self._pool = None
+
+    async def render(self, path: str) -> List[Dict]:
+        """Make the renditions of a stored image unless they exist, and return them."""
+        renditions = await asyncio.to_thread(load_renditions, path)
+        if renditions is not None:
+            return renditions
+        if self._pool is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context(start_method))
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._pool, make_renditions, path, rendition_directory(path), self.widths)
+        logger.info(f"Made renditions of {path}")
+        return load_renditions(path)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes; the next render() starts new ones."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
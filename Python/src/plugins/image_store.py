@@ -0,0 +1,84 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# File signatures of the formats the image service returns
+IMAGE_SIGNATURES = {
+    b"\x89PNG\r\n\x1a\n": ".png",
+    b"\xff\xd8\xff": ".jpg",
+    b"RIFF": ".webp",
+}
+
+
+def image_extension(data: bytes) -> str:
+    """Guess the file extension from the image's first bytes (.png if unknown)."""
+    return next((extension for signature, extension in IMAGE_SIGNATURES.items()
+                 if data.startswith(signature)), ".png")
+
+
+def request_key(prompt: str, size: str) -> str:
+    """Key of a generation request; prompts that differ only in case and spacing share one."""
+    normalized = " ".join(prompt.lower().split())
+    return hashlib.sha256(f"{normalized}\n{size}".encode("utf-8")).hexdigest()
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Write a file via a temporary file and a rename, so readers never see it half written."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+class ImageStore:
+    """Content-addressed store for generated images on the local disk.
+
+    Each image is saved once under the SHA-256 of its bytes
+    (root/objects/ab/abcdef....png), so identical images share a file. A small
+    JSON file per generation request (root/requests/<request key>.json) maps a
+    (prompt, size) pair to the digest of its image, which makes repeated
+    requests a file lookup instead of a model call.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _object_path(self, digest: str, extension: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest + extension)
+
+    def _request_path(self, key: str) -> str:
+        return os.path.join(self.root, "requests", key + ".json")
+
+    def put(self, data: bytes) -> str:
+        """Store image bytes and return the path of the stored file."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest, image_extension(data))
+        if not os.path.exists(path):
+            write_atomic(path, data)
+        return path
+
+    def lookup(self, prompt: str, size: str) -> Optional[str]:
+        """Return the path of the image stored for (prompt, size), or None."""
+        try:
+            with open(self._request_path(request_key(prompt, size)), encoding="utf-8") as file:
+                path = json.load(file)["path"]
+        except (OSError, ValueError, KeyError):
+            return None
+        path = os.path.join(self.root, path)
+        return path if os.path.exists(path) else None
+
+    def remember(self, prompt: str, size: str, path: str) -> None:
+        """Record that path is the image generated for (prompt, size)."""
+        record = {"prompt": prompt, "size": size, "path": os.path.relpath(path, self.root)}
+        write_atomic(self._request_path(request_key(prompt, size)), json.dumps(record).encode("utf-8"))
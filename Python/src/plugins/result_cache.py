@@ -0,0 +1,84 @@
+import asyncio
+import functools
+import inspect
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+
+def ttl_cache(ttl: Optional[float] = None, key: Optional[Callable[..., Any]] = None,
+              maxsize: int = 1024, cache_if: Optional[Callable[[Any], bool]] = None):
+    """Cache the results of an async plugin method for ttl seconds (None = no expiry).
+
+    Place it under @kernel_function so the kernel still sees the original
+    signature. The cache is shared by all instances of the plugin; key receives the
+    call's arguments (without self, defaults applied) as keyword arguments and
+    returns a hashable key, by default all of them. Results for which cache_if
+    returns False (e.g. error messages) are not stored, and neither are exceptions.
+
+    Concurrent calls with the same key while a fetch is in flight wait for that
+    fetch instead of starting their own. Each entry expires ttl seconds after it
+    was stored; at most maxsize entries are kept (least recently used go first).
+    """
+    def decorator(func):
+        if not inspect.iscoroutinefunction(func):
+            raise TypeError("ttl_cache can only decorate async functions")
+        signature = inspect.signature(func)
+        entries = OrderedDict()
+        in_flight = {}
+        stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+        def make_key(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            arguments.pop("self", None)
+            if key is not None:
+                return key(**arguments)
+            return tuple(sorted(arguments.items()))
+
+        async def fetch(cache_key, args, kwargs):
+            try:
+                result = await func(*args, **kwargs)
+                if cache_if is None or cache_if(result):
+                    expires = time.monotonic() + ttl if ttl is not None else None
+                    entries[cache_key] = (expires, result)
+                    entries.move_to_end(cache_key)
+                    while len(entries) > maxsize:
+                        entries.popitem(last=False)
+                return result
+            finally:
+                in_flight.pop(cache_key, None)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_key = make_key(args, kwargs)
+            entry = entries.get(cache_key)
+            if entry is not None:
+                expires, result = entry
+                if expires is None or expires > time.monotonic():
+                    entries.move_to_end(cache_key)
+                    stats["hits"] += 1
+                    return result
+                del entries[cache_key]
+
+            task = in_flight.get(cache_key)
+            if task is not None and task.get_loop() is asyncio.get_running_loop():
+                stats["coalesced"] += 1
+            else:
+                stats["misses"] += 1
+                task = in_flight[cache_key] = asyncio.ensure_future(fetch(cache_key, args, kwargs))
+            # Shield the shared fetch so one caller being cancelled doesn't cancel it for the others
+            return await asyncio.shield(task)
+
+        def cache_info():
+            return {**stats, "size": len(entries), "in_flight": len(in_flight)}
+
+        def cache_clear():
+            entries.clear()
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
@@ -0,0 +1,86 @@
+import threading
+import time
+from typing import Any, Optional
+
+import numpy as np
+
+from plugins.vector_index import normalize
+
+
+class SemanticCache:
+    """Cache keyed by meaning rather than exact text.
+
+    Values are stored under the embedding of the query that produced them. A
+    lookup hits when a stored embedding has cosine similarity of at least
+    threshold with the new query's embedding, so paraphrases of a question
+    ("vacation policy", "how much PTO do I get") share one entry.
+
+    Embeddings live in a preallocated float32 matrix of max_entries rows, so a
+    lookup is one matrix-vector product. Entries expire ttl seconds after they
+    were stored (None = never); when the cache is full, the least recently used
+    entry is replaced.
+    """
+
+    def __init__(self, threshold: float = 0.92, ttl: Optional[float] = 3600.0, max_entries: int = 512):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._vectors = None  # allocated on the first put, once the dimensions are known
+        self._values = [None] * max_entries
+        self._expires = np.full(max_entries, -np.inf)  # -inf marks a free slot
+        self._last_used = np.zeros(max_entries)
+        self._lock = threading.Lock()
+
+    def _best_match(self, query, now):
+        similarities = self._vectors @ query
+        similarities[self._expires <= now] = -np.inf
+        best = int(np.argmax(similarities))
+        return best, similarities[best]
+
+    def get(self, vector) -> Optional[Any]:
+        """Return the value stored for the most similar query within the threshold, or None."""
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is not None:
+                best, similarity = self._best_match(normalize(vector)[0], now)
+                if similarity >= self.threshold:
+                    self._last_used[best] = now
+                    self.hits += 1
+                    return self._values[best]
+            self.misses += 1
+            return None
+
+    def put(self, vector, value: Any) -> None:
+        """Store a value under a query embedding, replacing the entry of a near-identical query."""
+        query = normalize(vector)[0]
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(query)), dtype=np.float32)
+            best, similarity = self._best_match(query, now)
+            if similarity >= self.threshold:
+                slot = best
+            else:
+                free = np.flatnonzero(self._expires <= now)
+                slot = int(free[0]) if len(free) else int(np.argmin(self._last_used))
+            self._vectors[slot] = query
+            self._values[slot] = value
+            self._expires[slot] = now + self.ttl if self.ttl is not None else np.inf
+            self._last_used[slot] = now
+
+    def clear(self) -> None:
+        """Drop every entry (e.g. after the data the values came from changed)."""
+        with self._lock:
+            self._values = [None] * self.max_entries
+            self._expires[:] = -np.inf
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": int(np.count_nonzero(self._expires > time.monotonic())),
+        }
@@ -0,0 +1,255 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Reciprocal rank fusion constant, as used by Azure AI Search for hybrid queries
+RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lower-case word terms."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def normalize(vectors) -> np.ndarray:
+    """Return the vectors as float32 rows scaled to unit length (zero rows stay zero)."""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (indices, scores) of the k highest scores in each row, best first."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64), np.empty((scores.shape[0], 0), dtype=scores.dtype)
+    # argpartition finds the top k in linear time; only those k are sorted
+    indices = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    selected = np.take_along_axis(scores, indices, axis=1)
+    order = np.argsort(-selected, axis=1, kind="stable")
+    return np.take_along_axis(indices, order, axis=1), np.take_along_axis(selected, order, axis=1)
+
+
+class BM25Index:
+    """Keyword index over the chunk texts, ranked with BM25.
+
+    The per-term weights are computed once when the index is built, so a query
+    only adds up one precomputed array per query term.
+    """
+
+    def __init__(self, texts: Sequence[str], k1: float = 1.2, b: float = 0.75):
+        self.size = len(texts)
+        counts = [Counter(tokenize(text)) for text in texts]
+        lengths = np.array([sum(count.values()) for count in counts], dtype=np.float32)
+        average_length = float(lengths.mean()) if self.size and lengths.sum() else 1.0
+        norms = k1 * (1 - b + b * lengths / average_length)
+
+        rows_by_term: Dict[str, List[int]] = {}
+        tfs_by_term: Dict[str, List[int]] = {}
+        for row, count in enumerate(counts):
+            for term, tf in count.items():
+                rows_by_term.setdefault(term, []).append(row)
+                tfs_by_term.setdefault(term, []).append(tf)
+
+        self._postings = {}
+        for term, rows in rows_by_term.items():
+            rows = np.array(rows, dtype=np.int64)
+            tfs = np.array(tfs_by_term[term], dtype=np.float32)
+            idf = math.log(1 + (self.size - len(rows) + 0.5) / (len(rows) + 0.5))
+            self._postings[term] = (rows, idf * tfs * (k1 + 1) / (tfs + norms[rows]))
+
+    def scores(self, text: str) -> np.ndarray:
+        """Return the BM25 score of every chunk for a query (0 where no term matches)."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(text)):
+            posting = self._postings.get(term)
+            if posting is not None:
+                rows, weights = posting
+                scores[rows] += weights
+        return scores
+
+
+class LocalVectorIndex:
+    """In-process search index over the handbook chunks.
+
+    Vectors are kept as one normalized float32 matrix, so cosine similarity is a
+    single matrix product and queries can be scored in batches. An index saved
+    with save() is memory-mapped by load(), so it opens instantly and only the
+    pages that are used are read. build_ivf() adds an optional inverted file
+    index (spherical k-means clusters): queries then only score the chunks in the
+    n_probe clusters closest to the query, trading a little recall for speed on
+    large indexes. search() combines the vector ranking with BM25 over the chunk
+    texts by reciprocal rank fusion, like a hybrid query in Azure AI Search.
+
+    Records are dicts (e.g. id, content, page_num, chunk_id) identified by
+    key_field; upsert() replaces records with the same key.
+    """
+
+    def __init__(self, dimensions: int = 1536, key_field: str = "id", text_field: str = "content"):
+        self.dimensions = dimensions
+        self.key_field = key_field
+        self.text_field = text_field
+        self.records: List[Dict[str, Any]] = []
+        self._vectors = np.empty((0, dimensions), dtype=np.float32)
+        self._rows: Dict[Any, int] = {}
+        self._bm25: Optional[BM25Index] = None
+        self._ivf_lists: Optional[int] = None
+        self._ivf = None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def upsert(self, records: Iterable[Dict[str, Any]], vectors) -> None:
+        """Add records with their embedding vectors, replacing records with the same key."""
+        records = list(records)
+        vectors = normalize(vectors) if records else np.empty((0, self.dimensions), dtype=np.float32)
+        if vectors.shape != (len(records), self.dimensions):
+            raise ValueError(f"Expected {len(records)} vectors of {self.dimensions} dimensions, got {vectors.shape}")
+
+        updated = np.array(self._vectors)  # a writable copy, even if the index is memory-mapped
+        new_records, new_vectors = [], []
+        for record, vector in zip(records, vectors):
+            row = self._rows.get(record[self.key_field])
+            if row is None:
+                self._rows[record[self.key_field]] = len(self.records) + len(new_records)
+                new_records.append(record)
+                new_vectors.append(vector)
+            elif row >= len(self.records):
+                # Repeated within this upsert
+                new_records[row - len(self.records)] = record
+                new_vectors[row - len(self.records)] = vector
+            else:
+                self.records[row] = record
+                updated[row] = vector
+        if new_vectors:
+            updated = np.vstack([updated, np.stack(new_vectors)])
+        self.records.extend(new_records)
+        self._vectors = updated
+        # Derived indexes are rebuilt on the next search
+        self._bm25 = None
+        self._ivf = None
+
+    def delete(self, keys: Iterable[Any]) -> int:
+        """Remove the records with these keys and return how many were removed."""
+        removed = {self._rows[key] for key in keys if key in self._rows}
+        if not removed:
+            return 0
+        keep = [row for row in range(len(self.records)) if row not in removed]
+        self._vectors = self._vectors[np.array(keep, dtype=np.int64)]
+        self.records = [self.records[row] for row in keep]
+        self._rows = {record[self.key_field]: row for row, record in enumerate(self.records)}
+        self._bm25 = None
+        self._ivf = None
+        return len(removed)
+
+    def build_ivf(self, n_lists: Optional[int] = None, iterations: int = 10, seed: int = 0) -> None:
+        """Cluster the vectors into n_lists lists (default about sqrt of the size) for IVF search.
+
+        The index is rebuilt automatically after later upserts.
+        """
+        self._ivf_lists = n_lists or max(1, int(math.sqrt(len(self))))
+        self._ivf = self._cluster(self._ivf_lists, iterations, seed)
+
+    def _cluster(self, n_lists, iterations=10, seed=0):
+        vectors = self._vectors
+        n_lists = min(n_lists, len(vectors))
+        if n_lists == 0:
+            return None
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, vectors)
+            empty = np.bincount(assignment, minlength=n_lists) == 0
+            # Re-seed empty clusters with random vectors
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+            centroids = normalize(sums)
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        lists = [np.flatnonzero(assignment == cluster) for cluster in range(n_lists)]
+        logger.info(f"Built IVF index with {n_lists} lists over {len(vectors)} vectors")
+        return centroids, lists
+
+    def vector_search(self, query_vectors, k: int = 10, n_probe: Optional[int] = None) -> List[List[Tuple[int, float]]]:
+        """Return the k nearest rows (row, cosine similarity) for each query vector.
+
+        All queries are scored with one matrix product. With n_probe and an IVF
+        index (see build_ivf), only the chunks in the n_probe nearest clusters
+        are scored.
+        """
+        queries = normalize(query_vectors)
+        if n_probe is not None and self._ivf_lists is not None and len(self):
+            if self._ivf is None:
+                self._ivf = self._cluster(self._ivf_lists)
+            return [self._probe(query, k, n_probe) for query in queries]
+        indices, scores = top_k(queries @ self._vectors.T, k)
+        return [list(zip(row_indices.tolist(), row_scores.tolist())) for row_indices, row_scores in zip(indices, scores)]
+
+    def _probe(self, query, k, n_probe):
+        centroids, lists = self._ivf
+        nearest = top_k((centroids @ query)[None, :], n_probe)[0][0]
+        candidates = np.concatenate([lists[cluster] for cluster in nearest])
+        indices, scores = top_k((self._vectors[candidates] @ query)[None, :], k)
+        return list(zip(candidates[indices[0]].tolist(), scores[0].tolist()))
+
+    def keyword_scores(self, text: str) -> np.ndarray:
+        """Return the BM25 score of every row for a text query."""
+        if self._bm25 is None:
+            self._bm25 = BM25Index([record.get(self.text_field, "") for record in self.records])
+        return self._bm25.scores(text)
+
+    def search(self, text: str, vector, top: int = 3, candidates: int = 50,
+               n_probe: Optional[int] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """Hybrid search: fuse the vector and BM25 rankings of the top candidates of each.
+
+        Returns up to top (record, score) pairs, best first. The score is the
+        reciprocal rank fusion score, so it only orders results of one query.
+        """
+        fused: Dict[int, float] = {}
+        for rank, (row, _) in enumerate(self.vector_search(vector, candidates, n_probe)[0]):
+            fused[row] = fused.get(row, 0.0) + 1 / (RRF_K + rank + 1)
+        keyword = self.keyword_scores(text)
+        rows, scores = top_k(keyword[None, :], candidates)
+        for rank, (row, score) in enumerate(zip(rows[0].tolist(), scores[0].tolist())):
+            if score <= 0:
+                break
+            fused[row] = fused.get(row, 0.0) + 1 / (RRF_K + rank + 1)
+        best = sorted(fused.items(), key=lambda entry: entry[1], reverse=True)[:top]
+        return [(self.records[row], score) for row, score in best]
+
+    def save(self, path: str) -> None:
+        """Write the index to a directory (vectors.npy and records.json)."""
+        os.makedirs(path, exist_ok=True)
+        vectors_path = os.path.join(path, "vectors.npy")
+        records_path = os.path.join(path, "records.json")
+        # Write to temporary files first so a crash never leaves a half-written index
+        with open(vectors_path + ".tmp", "wb") as file:
+            np.save(file, self._vectors)
+        with open(records_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump({"dimensions": self.dimensions, "key_field": self.key_field,
+                       "text_field": self.text_field, "records": self.records}, file)
+        os.replace(vectors_path + ".tmp", vectors_path)
+        os.replace(records_path + ".tmp", records_path)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "LocalVectorIndex":
+        """Open an index written by save(), memory-mapping the vectors unless mmap is False."""
+        with open(os.path.join(path, "records.json"), encoding="utf-8") as file:
+            data = json.load(file)
+        index = cls(data["dimensions"], data["key_field"], data["text_field"])
+        index.records = data["records"]
+        index._rows = {record[index.key_field]: row for row, record in enumerate(index.records)}
+        index._vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None)
+        logger.info(f"Loaded local handbook index with {len(index)} chunks from {path}")
+        return index
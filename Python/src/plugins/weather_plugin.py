@@ -1,89 +1,196 @@
+import os
 from typing import Annotated
-import requests
 from semantic_kernel.functions import kernel_function
 import json
-from datetime import datetime, timedelta
+from collections import Counter
+from datetime import date, timedelta
+
+from plugins.http_client import get_http_client
+from plugins.result_cache import ttl_cache
+
+# Forecasts are cached per ~1 km grid cell for this many seconds
+FORECAST_CACHE_TTL_SECONDS = float(os.getenv("WEATHER_CACHE_TTL_SECONDS", "900"))
+
+# Output format when the caller doesn't choose one: "compact" (a table), "summary" or "json"
+DEFAULT_FORECAST_FORMAT = os.getenv("WEATHER_FORECAST_FORMAT", "compact")
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+
+# Forecast fields the caller can ask for: name -> (Open-Meteo daily variable, table column)
+FORECAST_FIELDS = {
+    "high": ("temperature_2m_max", "hi°F"),
+    "low": ("temperature_2m_min", "lo°F"),
+    "precipitation": ("precipitation_sum", "precip in"),
+    "precipitation_probability": ("precipitation_probability_max", "precip %"),
+    "conditions": ("weather_code", "conditions"),
+}
+
+WEATHER_CODES = {
+    0: "Clear sky",
+    1: "Mainly clear", 2: "Partly cloudy", 3: "Overcast",
+    45: "Fog", 48: "Depositing rime fog",
+    51: "Light drizzle", 53: "Moderate drizzle", 55: "Dense drizzle",
+    56: "Light freezing drizzle", 57: "Dense freezing drizzle",
+    61: "Slight rain", 63: "Moderate rain", 65: "Heavy rain",
+    66: "Light freezing rain", 67: "Heavy freezing rain",
+    71: "Slight snow fall", 73: "Moderate snow fall", 75: "Heavy snow fall",
+    77: "Snow grains",
+    80: "Slight rain showers", 81: "Moderate rain showers", 82: "Violent rain showers",
+    85: "Slight snow showers", 86: "Heavy snow showers",
+    95: "Thunderstorm", 96: "Thunderstorm with slight hail", 99: "Thunderstorm with heavy hail"
+}
+
+DAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+MONTH_NAMES = ("January", "February", "March", "April", "May", "June",
+               "July", "August", "September", "October", "November", "December")
+
+
+def grid_cell(latitude, longitude):
+    """Round coordinates to the ~1 km grid cell forecasts are fetched and cached for."""
+    return round(float(latitude), 2), round(float(longitude), 2)
+
+
+def parse_fields(fields):
+    """Return the requested field names in table order (all of them for an empty string)."""
+    requested = {field.strip().lower() for field in fields.split(",") if field.strip()}
+    unknown = requested - FORECAST_FIELDS.keys()
+    if unknown:
+        raise ValueError(f"Unknown forecast fields: {', '.join(sorted(unknown))}. "
+                         f"Choose from: {', '.join(FORECAST_FIELDS)}")
+    return [field for field in FORECAST_FIELDS if not requested or field in requested]
+
+
+def forecast_dates(times):
+    """Dates of the forecast days. Open-Meteo returns consecutive days, so only the first is parsed."""
+    if not times:
+        return []
+    start = date.fromisoformat(times[0])
+    return [start + timedelta(days=offset) for offset in range(len(times))]
+
+
+def _number(value):
+    return "" if value is None else f"{value:g}"
+
+
+def _cell(field, value):
+    if field == "conditions":
+        return WEATHER_CODES.get(value, "Unknown")
+    return _number(value)
+
+
+def format_json(daily, fields, latitude, longitude):
+    """The original verbose output: one JSON object per day with units in every value."""
+    units = {"high": "°F", "low": "°F", "precipitation": " inches", "precipitation_probability": "%"}
+    keys = {"high": "high_temp", "low": "low_temp", "precipitation": "precipitation",
+            "precipitation_probability": "precipitation_probability", "conditions": "conditions"}
+    forecasts = []
+    for row, day in enumerate(forecast_dates(daily.get("time", []))):
+        forecast = {"date": day.isoformat(), "day": f"{DAY_NAMES[day.weekday()]}, {MONTH_NAMES[day.month - 1]} {day.day:02d}"}
+        for field in fields:
+            value = daily.get(FORECAST_FIELDS[field][0], [])[row]
+            forecast[keys[field]] = WEATHER_CODES.get(value, "Unknown") if field == "conditions" else f"{value}{units[field]}"
+        forecasts.append(forecast)
+    result = {
+        "location_coords": f"{latitude}, {longitude}",
+        "forecast_days": len(forecasts),
+        "forecasts": forecasts
+    }
+    return json.dumps(result, indent=2)
+
+
+def format_table(daily, fields, latitude, longitude):
+    """Columnar output: a header row, then one pipe-separated row per day."""
+    columns = [daily.get(FORECAST_FIELDS[field][0], []) for field in fields]
+    lines = [f"Forecast for {latitude}, {longitude}",
+             "|".join(["date", "day"] + [FORECAST_FIELDS[field][1] for field in fields])]
+    for row, day in enumerate(forecast_dates(daily.get("time", []))):
+        cells = [_cell(field, column[row]) for field, column in zip(fields, columns)]
+        lines.append("|".join([day.isoformat(), DAY_NAMES[day.weekday()][:3]] + cells))
+    return "\n".join(lines)
+
+
+def format_summary(daily, fields, latitude, longitude):
+    """A one or two sentence summary of the whole period."""
+    days = forecast_dates(daily.get("time", []))
+    if not days:
+        return f"No forecast available for {latitude}, {longitude}."
+    parts = []
+    span = f"{DAY_NAMES[days[0].weekday()][:3]} {days[0].isoformat()} to {DAY_NAMES[days[-1].weekday()][:3]} {days[-1].isoformat()}"
+    for field, label in (("high", "highs"), ("low", "lows")):
+        values = [value for value in daily.get(FORECAST_FIELDS[field][0], []) if value is not None] if field in fields else []
+        if values:
+            parts.append(f"{label} {min(values):g}-{max(values):g}°F")
+    if "precipitation" in fields:
+        amounts = daily.get(FORECAST_FIELDS["precipitation"][0], [])
+        total = sum(value for value in amounts if value is not None)
+        wet = [f"{DAY_NAMES[day.weekday()][:3]} {day.day}" for day, value in zip(days, amounts) if value and value >= 0.1]
+        parts.append(f"{total:.2f} in precipitation" + (f" (wet days: {', '.join(wet[:4])})" if wet else ""))
+    if "precipitation_probability" in fields:
+        chances = [value for value in daily.get(FORECAST_FIELDS["precipitation_probability"][0], []) if value is not None]
+        if chances:
+            parts.append(f"rain chance up to {max(chances):g}%")
+    if "conditions" in fields:
+        codes = daily.get(FORECAST_FIELDS["conditions"][0], [])
+        if codes:
+            parts.append(", ".join(f"{WEATHER_CODES.get(code, 'Unknown').lower()} {count}d"
+                                   for code, count in Counter(codes).most_common(3)))
+    return f"Forecast for {latitude}, {longitude}, {span}: " + "; ".join(parts) + "."
+
+
+FORMATTERS = {"compact": format_table, "summary": format_summary, "json": format_json}
+
 
 class WeatherPlugin:
     """Plugin for getting weather information from Open Meteo API."""
 
     @kernel_function(description="Get weather forecast for a location up to 16 days in the future")
-    def get_forecast_weather(self, 
+    @ttl_cache(
+        ttl=FORECAST_CACHE_TTL_SECONDS,
+        key=lambda latitude, longitude, days, fields, format: (*grid_cell(latitude, longitude), days, fields, format),
+        cache_if=lambda result: not result.startswith("Error"),
+    )
+    async def get_forecast_weather(self,
                             latitude: Annotated[float, "Latitude of the location"],
                             longitude: Annotated[float, "Longitude of the location"],
-                            days: Annotated[int, "Number of days to forecast (up to 16)"] = 16):
-        """Get the forecast weather at the specified latitude/longitude location for up to 16 days."""
-        
+                            days: Annotated[int, "Number of days to forecast (up to 16); ask only for the days needed"] = 7,
+                            fields: Annotated[str, "Comma-separated fields to include: high, low, precipitation, precipitation_probability, conditions (default: all)"] = "",
+                            format: Annotated[str, "compact (a table, default), summary (one sentence) or json"] = ""):
+        """Get the forecast weather at the specified latitude/longitude location for up to 16 days.
+
+        Only the requested days and fields are fetched. The compact format is a
+        table with one row per day, the summary a single sentence.
+        """
+
+        # The result is cached per grid cell, so it is fetched for and reports the
+        # cell's coordinates rather than the first caller's exact ones
+        latitude, longitude = grid_cell(latitude, longitude)
+
         # Ensure days is within valid range (API supports up to 16 days)
-        if days > 16:
-            days = 16
-        
-        url = (f"https://api.open-meteo.com/v1/forecast"
-               f"?latitude={latitude}&longitude={longitude}"
-               f"&daily=temperature_2m_max,temperature_2m_min,precipitation_sum,precipitation_probability_max,weather_code"
-               f"&current=temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,weather_code,wind_speed_10m"
-               f"&temperature_unit=fahrenheit&wind_speed_unit=mph&precipitation_unit=inch"
-               f"&forecast_days={days}&timezone=auto")
-        
+        days = max(1, min(int(days), 16))
+        formatter = FORMATTERS.get(format or DEFAULT_FORECAST_FORMAT)
+        if formatter is None:
+            return f"Error fetching forecast weather: unknown format {format!r}. Use compact, summary or json."
+        try:
+            selected = parse_fields(fields)
+        except ValueError as e:
+            return f"Error fetching forecast weather: {e}"
+
+        params = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "daily": ",".join(FORECAST_FIELDS[field][0] for field in selected),
+            "temperature_unit": "fahrenheit",
+            "precipitation_unit": "inch",
+            "forecast_days": days,
+            "timezone": "auto",
+        }
+
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract daily forecast data
-            daily = data.get('daily', {})
-            times = daily.get('time', [])
-            max_temps = daily.get('temperature_2m_max', [])
-            min_temps = daily.get('temperature_2m_min', [])
-            precip_sums = daily.get('precipitation_sum', [])
-            precip_probs = daily.get('precipitation_probability_max', [])
-            weather_codes = daily.get('weather_code', [])
-            
-            # Build a readable forecast for each day
-            forecasts = []
-            for i in range(len(times)):
-                # Convert date string to datetime object for day name
-                date_obj = datetime.strptime(times[i], "%Y-%m-%d")
-                day_name = date_obj.strftime("%A, %B %d")
-                
-                weather_desc = self._get_weather_description(weather_codes[i])
-                
-                forecast = {
-                    "date": times[i],
-                    "day": day_name,
-                    "high_temp": f"{max_temps[i]}°F",
-                    "low_temp": f"{min_temps[i]}°F",
-                    "precipitation": f"{precip_sums[i]} inches",
-                    "precipitation_probability": f"{precip_probs[i]}%",
-                    "conditions": weather_desc
-                }
-                forecasts.append(forecast)
-            
-            result = {
-                "location_coords": f"{latitude}, {longitude}",
-                "forecast_days": len(forecasts),
-                "forecasts": forecasts
-            }
-            
-            # For more concise output in chat
-            return json.dumps(result, indent=2)
+            data = await get_http_client().get_json(FORECAST_URL, params=params)
+            return formatter(data.get('daily', {}), selected, latitude, longitude)
         except Exception as e:
             return f"Error fetching forecast weather: {str(e)}"
-    
+
     def _get_weather_description(self, code):
         """Convert WMO weather code to human-readable description."""
-        weather_codes = {
-            0: "Clear sky",
-            1: "Mainly clear", 2: "Partly cloudy", 3: "Overcast",
-            45: "Fog", 48: "Depositing rime fog",
-            51: "Light drizzle", 53: "Moderate drizzle", 55: "Dense drizzle",
-            56: "Light freezing drizzle", 57: "Dense freezing drizzle",
-            61: "Slight rain", 63: "Moderate rain", 65: "Heavy rain",
-            66: "Light freezing rain", 67: "Heavy freezing rain",
-            71: "Slight snow fall", 73: "Moderate snow fall", 75: "Heavy snow fall",
-            77: "Snow grains",
-            80: "Slight rain showers", 81: "Moderate rain showers", 82: "Violent rain showers",
-            85: "Slight snow showers", 86: "Heavy snow showers",
-            95: "Thunderstorm", 96: "Thunderstorm with slight hail", 99: "Thunderstorm with heavy hail"
-        }
-        return weather_codes.get(code, "Unknown")
\ No newline at end of file
+        return WEATHER_CODES.get(code, "Unknown")
@@ -0,0 +1,150 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.contents.utils.author_role import AuthorRole
+
+logger = logging.getLogger(__name__)
+
+
+class _Session:
+    __slots__ = ("history", "last_access", "dirty")
+
+    def __init__(self, history):
+        self.history = history
+        self.last_access = time.monotonic()
+        self.dirty = False
+
+
+class SessionStore:
+    """Keeps one ChatHistory per session ID with bounded memory.
+
+    At most max_sessions histories are held in memory; the least recently used one
+    is evicted when the limit is reached, and sessions idle for longer than
+    idle_ttl seconds are evicted on the next access to the store. Each history is
+    capped at max_messages (system messages are always kept).
+
+    When persist_path is set, histories are written to a SQLite database after
+    every turn and on eviction, and are loaded back on demand, so sessions survive
+    evictions and process restarts.
+    """
+
+    def __init__(self, max_sessions=500, idle_ttl=3600, max_messages=200, persist_path=None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self._sessions = OrderedDict()
+        self._lock = threading.RLock()
+        self._db = None
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                "session_id TEXT PRIMARY KEY, history TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id):
+        """Return the ChatHistory for a session, loading or creating it as needed."""
+        with self._lock:
+            self._evict_expired()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = _Session(self._load(session_id) or ChatHistory())
+                self._sessions[session_id] = session
+                self._evict_overflow()
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_access = time.monotonic()
+            return session.history
+
+    def save(self, session_id):
+        """Trim the session to its message cap and persist it if spilling is enabled."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            self._trim(session.history)
+            session.dirty = True
+            self._persist(session_id, session)
+
+    def reset(self, session_id):
+        """Forget a session, both in memory and in the persistent store."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+                self._db.commit()
+
+    def close(self):
+        """Persist all in-memory sessions and close the database."""
+        with self._lock:
+            for session_id, session in self._sessions.items():
+                self._persist(session_id, session)
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _trim(self, history):
+        """Drop the oldest turns so the history stays within max_messages.
+
+        Cutting always happens right before a user message, so a function call is
+        never separated from its result.
+        """
+        messages = history.messages
+        if len(messages) <= self.max_messages:
+            return
+        system = [m for m in messages if m.role == AuthorRole.SYSTEM]
+        others = [m for m in messages if m.role != AuthorRole.SYSTEM]
+        budget = max(self.max_messages - len(system), 1)
+        start = len(others) - budget
+        while start < len(others) and others[start].role != AuthorRole.USER:
+            start += 1
+        messages[:] = system + others[start:]
+
+    def _evict_expired(self):
+        if not self.idle_ttl:
+            return
+        cutoff = time.monotonic() - self.idle_ttl
+        # Sessions are kept in access order, so the idle ones are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_access > cutoff:
+                break
+            self._evict(session_id)
+
+    def _evict_overflow(self):
+        while len(self._sessions) > self.max_sessions:
+            self._evict(next(iter(self._sessions)))
+
+    def _evict(self, session_id):
+        session = self._sessions.pop(session_id)
+        self._persist(session_id, session)
+        logger.info(f"Evicted chat session {session_id}")
+
+    def _persist(self, session_id, session):
+        if self._db is None or not session.dirty:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO chat_sessions (session_id, history, updated_at) VALUES (?, ?, ?)",
+            (session_id, session.history.serialize(), time.time()),
+        )
+        self._db.commit()
+        session.dirty = False
+
+    def _load(self, session_id):
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT history FROM chat_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return ChatHistory.restore_chat_history(row[0])
@@ -0,0 +1,128 @@
+import asyncio
+import functools
+import inspect
+import logging
+import statistics
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from semantic_kernel.filters.filter_types import FilterTypes
+from semantic_kernel.functions.function_result import FunctionResult
+from semantic_kernel.functions.kernel_function_from_method import KernelFunctionFromMethod
+
+logger = logging.getLogger(__name__)
+
+
+class ToolExecutor:
+    """Execution layer for the functions the model calls.
+
+    Semantic Kernel already starts all tool calls of one model response
+    together (asyncio.gather), but a sync plugin method runs on the event loop
+    and holds up every other call and the UI. install() therefore:
+
+    - moves sync methods of the kernel's plugins to a thread pool, so they
+      overlap with each other and with async calls;
+    - adds an auto function invocation filter that allows at most limit calls
+      per plugin at a time (the rest wait), gives up on a call after its
+      plugin's timeout and answers the model with an error instead;
+    - records how long each call waited and ran (see timings() and stats()).
+
+    limits and timeouts map plugin names to overrides of default_limit and
+    default_timeout. A timed-out sync call keeps running in its thread; only
+    the chat turn stops waiting for it.
+    """
+
+    def __init__(self, default_limit: int = 4, default_timeout: float = 30.0,
+                 limits: Optional[Dict[str, int]] = None, timeouts: Optional[Dict[str, float]] = None,
+                 threads: int = 8, history: int = 1000):
+        self.default_limit = default_limit
+        self.default_timeout = default_timeout
+        self.limits = limits or {}
+        self.timeouts = timeouts or {}
+        self._pool = ThreadPoolExecutor(threads, thread_name_prefix="tool")
+        self._timings = deque(maxlen=history)
+        # Semaphores belong to the loop they are used on, so there is one set per loop
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = \
+            weakref.WeakKeyDictionary()
+
+    def install(self, kernel):
+        """Offload the kernel's sync plugin functions and add the invocation filter."""
+        offloaded = 0
+        for plugin in kernel.plugins.values():
+            for function in plugin.functions.values():
+                if isinstance(function, KernelFunctionFromMethod) and not (
+                        inspect.iscoroutinefunction(function.method) or inspect.isasyncgenfunction(function.method)
+                        or inspect.isgeneratorfunction(function.method)):
+                    function.method = self._offload(function.method)
+                    offloaded += 1
+        kernel.add_filter(FilterTypes.AUTO_FUNCTION_INVOCATION, self.invoke)
+        logger.info(f"Tool executor installed ({offloaded} sync functions run in threads)")
+        return kernel
+
+    def _offload(self, method):
+        @functools.wraps(method)
+        async def run_in_thread(**kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(method, **kwargs))
+        return run_in_thread
+
+    def _semaphore(self, plugin_name):
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        semaphore = semaphores.get(plugin_name)
+        if semaphore is None:
+            semaphore = semaphores[plugin_name] = asyncio.Semaphore(self.limits.get(plugin_name, self.default_limit))
+        return semaphore
+
+    async def invoke(self, context, next):
+        """Auto function invocation filter: limit, time and bound one tool call."""
+        function = context.function
+        timeout = self.timeouts.get(function.plugin_name, self.default_timeout)
+        queued = time.perf_counter()
+        async with self._semaphore(function.plugin_name):
+            started = time.perf_counter()
+            status = "ok"
+            try:
+                await asyncio.wait_for(next(context), timeout)
+            except asyncio.TimeoutError:
+                status = "timeout"
+                context.function_result = FunctionResult(
+                    function=function.metadata,
+                    value=f"Error: {function.fully_qualified_name} did not finish within {timeout:g} seconds",
+                )
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                finished = time.perf_counter()
+                self._timings.append({
+                    "function": function.fully_qualified_name,
+                    "queued_ms": (started - queued) * 1000,
+                    "run_ms": (finished - started) * 1000,
+                    "status": status,
+                })
+                logger.info(f"Tool {function.fully_qualified_name} {status} in {(finished - started) * 1000:.0f} ms "
+                            f"(waited {(started - queued) * 1000:.0f} ms)")
+
+    def timings(self):
+        """The most recent calls, oldest first."""
+        return list(self._timings)
+
+    def stats(self):
+        """Calls, timeouts and p50/p95 run time per function over the recorded calls."""
+        by_function = {}
+        for timing in self._timings:
+            by_function.setdefault(timing["function"], []).append(timing)
+        stats = {}
+        for name, timings in by_function.items():
+            runs = sorted(timing["run_ms"] for timing in timings)
+            stats[name] = {
+                "calls": len(timings),
+                "timeouts": sum(timing["status"] == "timeout" for timing in timings),
+                "p50_ms": round(statistics.median(runs), 1),
+                "p95_ms": round(runs[max(0, int(round(0.95 * len(runs))) - 1)], 1),
+                "max_queued_ms": round(max(timing["queued_ms"] for timing in timings), 1),
+            }
+        return stats
@@ -1,11 +1,31 @@
-from fastapi import FastAPI, HTTPException
-import pandas as pd
-from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from typing import Optional
+import base64
+import json
 import os
-import csv
 import uvicorn
 
+from schemas import WorkItemBatch, WorkItemBatchResult, WorkItemPage, WorkItemSearchResults, WorkItemsDTO
+from storage import ConflictError, open_backend
+from store import SORTABLE_FIELDS, WorkItemStore
+
+WORKITEM_FIELDS = tuple(WorkItemsDTO.model_fields)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Work items are persisted by the backend selected with WORKITEMS_STORAGE
+# (SQLite by default, seeded from data/workitems.csv on first start)
+store = WorkItemStore(open_backend(DATA_DIR), make_item=lambda row: WorkItemsDTO.model_construct(**row))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    store.close()
+
 
 app = FastAPI(
     title="Work Items API",
@@ -14,42 +34,8 @@ app = FastAPI(
     servers=[
         {"url": "http://localhost:8000", "description": "Local development server"},
     ],
+    lifespan=lifespan,
 )
-class WorkItemsDTO(BaseModel):
-    ID: int
-    WorkItemType: str
-    Title: str
-    AssignedTo: str
-    State: str
-    Tags: str
-
-# Load CSV data into a DataFrame
-data = pd.read_csv("data/workitems.csv")
-
-workitems = []
-workItemTypes = set()
-workItemStates = set()
-
-def load_work_items_from_csv(file_path):
-    if os.path.exists(file_path):
-        with open(file_path, mode='r', encoding='utf-8-sig') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                print(row)
-                work_item = WorkItemsDTO(
-                    ID=int(row['ID']),
-                    WorkItemType=row['WorkItemType'],
-                    Title=row['Title'],
-                    AssignedTo=row['AssignedTo'],
-                    State=row['State'],
-                    Tags=row['Tags']
-                )
-                workitems.append(work_item)
-                workItemTypes.add(work_item.WorkItemType)
-                workItemStates.add(work_item.State)
-
-load_work_items_from_csv('data/workitems.csv')
-
 
 app.add_middleware(
     CORSMiddleware,
@@ -57,61 +43,223 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
-@app.get("/workitems", response_model=list[WorkItemsDTO])
-async def get_all_work_items():
-    return workitems
+@app.middleware("http")
+async def refresh_store(request: Request, call_next):
+    # Pick up changes made by other worker processes sharing the database
+    await store.refresh()
+    return await call_next(request)
+
+def etag(work_item):
+    return f'"{work_item.Version}"'
+
+def parse_if_match(if_match):
+    """Return the version required by an If-Match header, or None for no precondition."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=412, detail="If-Match must be an ETag returned by this API")
+
+def precondition_failed(error):
+    return HTTPException(
+        status_code=412,
+        detail=f"Work item {error.item_id} was changed since version {error.expected_version}; fetch it again and retry",
+    )
+
+def encode_cursor(key):
+    payload = json.dumps(key, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+def build_filters(state, work_item_type, assigned_to, tag):
+    return {
+        field: value
+        for field, value in (("State", state), ("WorkItemType", work_item_type),
+                             ("AssignedTo", assigned_to), ("Tags", tag))
+        if value is not None
+    }
+
+def select_fields(fields):
+    """Return the fields requested by a comma-separated fields parameter (all if not given)."""
+    if not fields:
+        return WORKITEM_FIELDS
+    selected = tuple(field.strip() for field in fields.split(",") if field.strip())
+    unknown = [field for field in selected if field not in WORKITEM_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+def decode_cursor(cursor):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(key) if isinstance(key, list) else key
+
+@app.get("/workitems", response_model=WorkItemPage)
+async def get_all_work_items(
+    state: Optional[str] = Query(None, description="Only return work items in this state"),
+    work_item_type: Optional[str] = Query(None, description="Only return work items of this type, e.g. Bug or Epic"),
+    assigned_to: Optional[str] = Query(None, description="Only return work items assigned to this user"),
+    tag: Optional[str] = Query(None, description="Only return work items with this tag"),
+    sort: str = Query("ID", description="Field to sort by; prefix with - for descending order, e.g. -ID"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. ID,Title,State"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of work items to return"),
+):
+    filters = build_filters(state, work_item_type, assigned_to, tag)
+    descending = sort.startswith("-")
+    sort_field = sort.lstrip("-")
+    if sort_field not in SORTABLE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORTABLE_FIELDS)}")
+    selected = select_fields(fields)
+
+    after = decode_cursor(cursor) if cursor else None
+    try:
+        items, total, next_key = store.repository.query(filters, sort_field, descending, after, limit)
+    except TypeError:
+        # The cursor belongs to a different sort order
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Items are trusted store objects, so the page is built as plain dicts without
+    # re-validating every item against the response model
+    return JSONResponse({
+        "items": [{field: getattr(item, field) for field in selected} for item in items],
+        "total": total,
+        "next_cursor": encode_cursor(next_key) if next_key is not None else None,
+    })
+
+# Declared before /workitems/{id} so "search" isn't taken for an ID
+@app.get("/workitems/search", response_model=WorkItemSearchResults)
+async def search_work_items(
+    q: str = Query(description="Words to look for in work item titles and tags, e.g. login page"),
+    state: Optional[str] = Query(None, description="Only return work items in this state"),
+    work_item_type: Optional[str] = Query(None, description="Only return work items of this type, e.g. Bug or Epic"),
+    assigned_to: Optional[str] = Query(None, description="Only return work items assigned to this user"),
+    tag: Optional[str] = Query(None, description="Only return work items with this tag"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. ID,Title,State"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of work items to return"),
+):
+    selected = select_fields(fields)
+    results, total = store.repository.search(q, build_filters(state, work_item_type, assigned_to, tag), limit)
+    return JSONResponse({
+        "items": [
+            {**{field: getattr(item, field) for field in selected}, "Score": round(score, 4)}
+            for item, score in results
+        ],
+        "total": total,
+    })
 
 @app.get("/workitems/{id}", response_model=WorkItemsDTO)
-async def get_work_item_by_id(id: int):
-    work_item = next((item for item in workitems if item.ID == id), None)
+async def get_work_item_by_id(id: int, response: Response):
+    work_item = store.repository.get(id)
     if not work_item:
         raise HTTPException(status_code=404, detail="Work item not found")
+    response.headers["ETag"] = etag(work_item)
     return work_item
 
 @app.post("/workitems", response_model=WorkItemsDTO, status_code=201)
-async def create_work_item(new_work_item: WorkItemsDTO):
-    workitems.append(new_work_item)
-    workItemTypes.add(new_work_item.WorkItemType)
-    workItemStates.add(new_work_item.State)
-    return new_work_item
+async def create_work_item(new_work_item: WorkItemsDTO, response: Response):
+    try:
+        work_item = await store.create(new_work_item)
+    except KeyError:
+        raise HTTPException(status_code=409, detail="A work item with this ID already exists")
+    response.headers["ETag"] = etag(work_item)
+    return work_item
+
+@app.post("/workitems:batch", response_model=WorkItemBatchResult)
+async def batch_work_items(batch: WorkItemBatch):
+    """Create, update and delete several work items in one call.
+
+    The operations are applied in order and atomically: if any of them fails,
+    none are applied. The response has one result per operation either way.
+    """
+    operations = []
+    for index, operation in enumerate(batch.operations):
+        if operation.op == "create":
+            if operation.item is None:
+                raise HTTPException(status_code=400, detail=f"Operation {index}: create needs an item")
+            operations.append(("create", operation.item))
+        elif operation.id is None:
+            raise HTTPException(status_code=400, detail=f"Operation {index}: {operation.op} needs an id")
+        elif operation.op == "update":
+            if operation.changes is None:
+                raise HTTPException(status_code=400, detail=f"Operation {index}: update needs changes")
+            # As with PUT, only the fields that were given a value are changed
+            changes = {field: value for field, value in operation.changes.model_dump().items() if value}
+            operations.append(("update", operation.id, changes, operation.version))
+        else:
+            operations.append(("delete", operation.id, operation.version))
+
+    applied, outcomes = await store.apply_batch(operations)
+    results = []
+    for operation, outcome in zip(batch.operations, outcomes):
+        item_id = operation.item.ID if operation.op == "create" else operation.id
+        if outcome is None:
+            results.append({"status": 404, "id": item_id, "error": "Work item not found"})
+        elif isinstance(outcome, KeyError):
+            results.append({"status": 409, "id": item_id, "error": "A work item with this ID already exists"})
+        elif isinstance(outcome, ConflictError):
+            results.append({"status": 412, "id": item_id, "error": precondition_failed(outcome).detail})
+        elif not applied:
+            results.append({"status": 424, "id": item_id, "item": outcome,
+                            "error": "Not applied because another operation in the batch failed"})
+        else:
+            results.append({"status": 201 if operation.op == "create" else 200, "id": item_id, "item": outcome})
+    # Failed batches are still a 200 so that clients (and tool callers) get the per-item results
+    return {"applied": applied, "results": results}
 
 @app.put("/workitems/{id}", response_model=WorkItemsDTO)
-async def update_work_item(id: int, updated_work_item: WorkItemsDTO):
-    work_item = next((item for item in workitems if item.ID == id), None)
+async def update_work_item(
+    id: int,
+    updated_work_item: WorkItemsDTO,
+    response: Response,
+    if_match: Optional[str] = Header(None, description="Only update if the work item still has this ETag"),
+):
+    # Only the fields that were given a value are changed
+    changes = {
+        field: getattr(updated_work_item, field)
+        for field in ("WorkItemType", "Title", "AssignedTo", "State", "Tags")
+        if getattr(updated_work_item, field)
+    }
+    try:
+        work_item = await store.update(id, changes, parse_if_match(if_match))
+    except ConflictError as e:
+        raise precondition_failed(e)
     if not work_item:
         raise HTTPException(status_code=404, detail="Work item not found")
-    if updated_work_item.WorkItemType:
-        work_item.WorkItemType = updated_work_item.WorkItemType
-        workItemTypes.add(updated_work_item.WorkItemType)
-    if updated_work_item.Title:
-        work_item.Title = updated_work_item.Title
-    if updated_work_item.AssignedTo:
-        work_item.AssignedTo = updated_work_item.AssignedTo
-    if updated_work_item.State:
-        work_item.State = updated_work_item.State
-        workItemStates.add(updated_work_item.State)
-    if updated_work_item.Tags:
-        work_item.Tags = updated_work_item.Tags
+    response.headers["ETag"] = etag(work_item)
     return work_item
 
 @app.delete("/workitems/{id}", status_code=204)
-async def delete_work_item(id: int):
-    global workitems
-    work_item = next((item for item in workitems if item.ID == id), None)
+async def delete_work_item(
+    id: int,
+    if_match: Optional[str] = Header(None, description="Only delete if the work item still has this ETag"),
+):
+    try:
+        work_item = await store.delete(id, parse_if_match(if_match))
+    except ConflictError as e:
+        raise precondition_failed(e)
     if not work_item:
         raise HTTPException(status_code=404, detail="Work item not found")
-    workitems = [item for item in workitems if item.ID != id]
     return
 
 @app.get("/workitemtypes", response_model=list[str])
 async def get_work_item_types():
-    return list(workItemTypes)
+    return store.repository.facet("WorkItemType")
 
 @app.get("/workitemstates", response_model=list[str])
 async def get_work_item_states():
-    return list(workItemStates)
+    return store.repository.facet("State")
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    # Several workers can share the SQLite backend; each keeps its own in-memory copy
+    # in sync through the backend's change feed
+    workers = int(os.getenv("WORKITEMS_WORKERS", "1"))
+    uvicorn.run("api:app" if workers > 1 else app, host="127.0.0.1", port=8000, workers=workers)
\ No newline at end of file
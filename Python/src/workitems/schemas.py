@@ -0,0 +1,61 @@
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+class WorkItemsDTO(BaseModel):
+    ID: int
+    WorkItemType: str
+    Title: str
+    AssignedTo: str
+    State: str
+    Tags: str
+    Version: int = Field(0, description="Incremented on every change and returned as the ETag; set by the API")
+
+
+class WorkItemPage(BaseModel):
+    items: list[dict[str, Any]] = Field(description="Work items, limited to the requested fields")
+    total: int = Field(description="Number of work items matching the filters")
+    next_cursor: Optional[str] = Field(None, description="Pass as cursor to get the next page; null on the last page")
+
+
+class WorkItemSearchResults(BaseModel):
+    items: list[dict[str, Any]] = Field(
+        description="Best matches first, limited to the requested fields, each with its relevance Score"
+    )
+    total: int = Field(description="Number of work items matching the query")
+
+
+class WorkItemChanges(BaseModel):
+    WorkItemType: Optional[str] = None
+    Title: Optional[str] = None
+    AssignedTo: Optional[str] = None
+    State: Optional[str] = None
+    Tags: Optional[str] = None
+
+
+class WorkItemOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[int] = Field(None, description="ID of the work item to update or delete")
+    item: Optional[WorkItemsDTO] = Field(None, description="The work item to create")
+    changes: Optional[WorkItemChanges] = Field(None, description="Fields to change on update; omitted fields are kept")
+    version: Optional[int] = Field(None, description="Only update or delete if the work item is still at this version")
+
+
+class WorkItemBatch(BaseModel):
+    operations: list[WorkItemOperation] = Field(
+        min_length=1, max_length=1000, description="Operations to apply in order, all or nothing"
+    )
+
+
+class WorkItemOperationResult(BaseModel):
+    status: int = Field(description="HTTP status the operation would have on its own, or 424 if it was valid "
+                                    "but not applied because another operation failed")
+    id: int
+    item: Optional[WorkItemsDTO] = Field(None, description="The created, updated or deleted work item")
+    error: Optional[str] = None
+
+
+class WorkItemBatchResult(BaseModel):
+    applied: bool = Field(description="True if every operation was applied; false if none were")
+    results: list[WorkItemOperationResult]
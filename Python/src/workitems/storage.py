@@ -0,0 +1,436 @@
+import csv
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("ID", "WorkItemType", "Title", "AssignedTo", "State", "Tags", "Version")
+
+# Change feed entries kept for other processes to catch up from
+CHANGE_FEED_RETENTION = 10_000
+
+
+class ConflictError(Exception):
+    """The work item was changed by someone else (its version doesn't match)."""
+
+    def __init__(self, item_id, expected_version):
+        super().__init__(f"Work item {item_id} is no longer at version {expected_version}")
+        self.item_id = item_id
+        self.expected_version = expected_version
+
+
+def load_rows_from_csv(file_path):
+    """Read work item rows from a CSV file exported from Azure DevOps."""
+    if not os.path.exists(file_path):
+        return []
+    with open(file_path, mode='r', encoding='utf-8-sig', newline='') as file:
+        return [
+            {**{column: row[column] for column in COLUMNS[:-1]}, "ID": int(row["ID"]), "Version": 1}
+            for row in csv.DictReader(file)
+        ]
+
+
+class GroupCommitter:
+    """Background writer that makes queued writes durable in batches.
+
+    Writers enqueue an operation and get a Future back. The writer thread takes
+    everything that queued up while the previous batch was being committed (up to
+    max_batch operations) and hands it to commit_batch in one go, so concurrent
+    requests share a single transaction / fsync instead of paying for one each.
+    commit_batch returns one entry per operation: the result on success, or the
+    exception (e.g. a ConflictError) that operation's writer should get.
+    """
+
+    def __init__(self, commit_batch, max_batch=512, name="workitems-writer"):
+        self._commit_batch = commit_batch
+        self._max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, operation):
+        future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                return
+            batch = [entry]
+            while len(batch) < self._max_batch:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._commit(batch)
+                    return
+                batch.append(entry)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        try:
+            results = self._commit_batch([operation for operation, _ in batch])
+        except Exception as e:
+            logger.error(f"Failed to commit {len(batch)} work item writes: {e}")
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class StorageBackend:
+    """Durable storage for work items.
+
+    Operations are ("insert", row), ("update", row, expected_version) and
+    ("delete", id, expected_version). Updates and deletes only apply if the
+    stored row is still at expected_version. ("batch", [operations]) applies a
+    list of those operations in order, all or nothing. write() returns a Future
+    that completes once the operation is durable, or fails with KeyError (insert
+    of an existing ID) or ConflictError (version mismatch). Backends with a change
+    feed complete it with the feed position the write was recorded at, others
+    with None.
+    """
+
+    # Change feed position as of the last load()
+    position = 0
+
+    def load(self):
+        """Return all stored rows as dicts."""
+        raise NotImplementedError
+
+    def write(self, operation):
+        raise NotImplementedError
+
+    def changes_since(self, position):
+        """Return (new_position, rows) for changes made by other processes.
+
+        rows maps each changed ID to its current row, or None if it was deleted.
+        Returns (new_position, None) if position is too old and everything must
+        be reloaded. Backends that aren't shared between processes have no changes.
+        """
+        return position, {}
+
+    def close(self):
+        pass
+
+
+class MemoryBackend(StorageBackend):
+    """Keeps nothing; rows are seeded from a CSV file on every start."""
+
+    def __init__(self, seed_csv=None):
+        self._seed_csv = seed_csv
+
+    def load(self):
+        return load_rows_from_csv(self._seed_csv) if self._seed_csv else []
+
+    def write(self, operation):
+        # The store already checked IDs and versions, and there's nothing to persist
+        future = Future()
+        future.set_result(None)
+        return future
+
+
+class SQLiteBackend(StorageBackend):
+    """Stores work items in a SQLite database in WAL mode.
+
+    The database is seeded from seed_csv the first time it is created. Writes go
+    through a GroupCommitter, so each batch is one transaction; version checks
+    happen inside that transaction, so they hold across processes too.
+
+    Several API worker processes can share one database: every write also records
+    the changed ID in a change feed table, which changes_since() reads so each
+    process can bring its in-memory copy up to date.
+    """
+
+    def __init__(self, path, seed_csv=None):
+        self._path = path
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode NORMAL is still durable across application crashes
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS workitems ("
+            "ID INTEGER PRIMARY KEY, WorkItemType TEXT NOT NULL, Title TEXT NOT NULL, "
+            "AssignedTo TEXT NOT NULL, State TEXT NOT NULL, Tags TEXT NOT NULL, "
+            "Version INTEGER NOT NULL DEFAULT 1)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(workitems)")}
+        if "Version" not in columns:
+            self._conn.execute("ALTER TABLE workitems ADD COLUMN Version INTEGER NOT NULL DEFAULT 1")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, ID INTEGER NOT NULL)")
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM workitems").fetchone()
+        if count == 0 and seed_csv:
+            rows = load_rows_from_csv(seed_csv)
+            self._conn.executemany(self._insert_sql(), [self._values(row) for row in rows])
+            logger.info(f"Seeded {len(rows)} work items from {seed_csv}")
+        self._conn.commit()
+        # Reads of the change feed use their own connection, so they never wait
+        # behind the writer thread's transaction
+        self._reader = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._committer = GroupCommitter(self._commit_batch)
+
+    @staticmethod
+    def _insert_sql():
+        return f"INSERT OR IGNORE INTO workitems ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+    @staticmethod
+    def _values(row):
+        return tuple(row[column] for column in COLUMNS)
+
+    def load(self):
+        self.position = self._current_position(self._reader)
+        cursor = self._reader.execute(f"SELECT {', '.join(COLUMNS)} FROM workitems ORDER BY ID")
+        return [dict(zip(COLUMNS, values)) for values in cursor]
+
+    @staticmethod
+    def _current_position(conn):
+        (position,) = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()
+        return position
+
+    def write(self, operation):
+        return self._committer.submit(operation)
+
+    def _commit_batch(self, operations):
+        results = []
+        with self._conn:
+            # Start the transaction up front so batch savepoints nest inside it
+            self._conn.execute("BEGIN")
+            for operation in operations:
+                error = self._execute(operation)
+                # A successful write reports where it was recorded in the change feed
+                results.append(error if error is not None else
+                               self._conn.execute("SELECT last_insert_rowid()").fetchone()[0])
+            # Keep the change feed bounded
+            self._conn.execute(
+                "DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?",
+                (CHANGE_FEED_RETENTION,),
+            )
+        return results
+
+    def _execute(self, operation):
+        kind, payload = operation[0], operation[1]
+        if kind == "batch":
+            self._conn.execute("SAVEPOINT batch")
+            for part in payload:
+                error = self._execute(part)
+                if error is not None:
+                    self._conn.execute("ROLLBACK TO batch")
+                    self._conn.execute("RELEASE batch")
+                    return error
+            self._conn.execute("RELEASE batch")
+            return None
+        if kind == "insert":
+            cursor = self._conn.execute(self._insert_sql(), self._values(payload))
+            item_id = payload["ID"]
+            if cursor.rowcount == 0:
+                return KeyError(item_id)
+        elif kind == "update":
+            expected_version = operation[2]
+            item_id = payload["ID"]
+            assignments = ", ".join(f"{column} = ?" for column in COLUMNS[1:])
+            cursor = self._conn.execute(
+                f"UPDATE workitems SET {assignments} WHERE ID = ? AND Version = ?",
+                self._values(payload)[1:] + (item_id, expected_version),
+            )
+            if cursor.rowcount == 0:
+                return ConflictError(item_id, expected_version)
+        else:
+            item_id, expected_version = payload, operation[2]
+            cursor = self._conn.execute(
+                "DELETE FROM workitems WHERE ID = ? AND Version = ?", (item_id, expected_version)
+            )
+            if cursor.rowcount == 0:
+                return ConflictError(item_id, expected_version)
+        self._conn.execute("INSERT INTO changes (ID) VALUES (?)", (item_id,))
+        return None
+
+    def changes_since(self, position):
+        with self._reader:
+            (oldest,) = self._reader.execute("SELECT COALESCE(MIN(seq), 0) FROM changes").fetchone()
+            if oldest > position + 1:
+                return self._current_position(self._reader), None
+            changed = self._reader.execute(
+                "SELECT seq, ID FROM changes WHERE seq > ? ORDER BY seq", (position,)
+            ).fetchall()
+            if not changed:
+                return position, {}
+            ids = {item_id for _, item_id in changed}
+            rows = dict.fromkeys(ids)
+            placeholders = ", ".join("?" * len(ids))
+            for values in self._reader.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM workitems WHERE ID IN ({placeholders})", tuple(ids)
+            ):
+                rows[values[0]] = dict(zip(COLUMNS, values))
+        return changed[-1][0], rows
+
+    def close(self):
+        self._committer.close()
+        self._reader.close()
+        self._conn.close()
+
+
+class CSVBackend(StorageBackend):
+    """Keeps the CSV file as the seed and logs every change to an append-only file.
+
+    Each write batch is appended to the write-ahead log as JSON lines and fsynced
+    once. After compact_after logged operations the full state is written to a
+    snapshot file (atomically, via rename) and the log is truncated, so startup
+    reads one snapshot and a short log instead of replaying every change. The
+    files must only be used by a single process.
+    """
+
+    def __init__(self, seed_csv, wal_path, snapshot_path, compact_after=10_000):
+        self._seed_csv = seed_csv
+        self._wal_path = wal_path
+        self._snapshot_path = snapshot_path
+        self._compact_after = compact_after
+        self._rows = {}
+        self._logged = 0
+        self._wal = None
+        self._committer = None
+
+    def load(self):
+        if os.path.exists(self._snapshot_path):
+            with open(self._snapshot_path, encoding="utf-8") as file:
+                # Snapshots written before versioning have no Version column
+                rows = [{"Version": 1, **dict(zip(COLUMNS, values))} for values in json.load(file)]
+        else:
+            rows = load_rows_from_csv(self._seed_csv)
+        self._rows = {row["ID"]: row for row in rows}
+
+        if os.path.exists(self._wal_path):
+            with open(self._wal_path, "rb+") as file:
+                valid_length = 0
+                for line in file:
+                    try:
+                        kind, payload = json.loads(line)
+                    except ValueError:
+                        # A torn final record from a crash mid-write was never acknowledged;
+                        # cut it off so new records aren't appended after it
+                        logger.warning("Dropping incomplete record at the end of the work item log")
+                        file.truncate(valid_length)
+                        break
+                    if kind == "put":
+                        payload.setdefault("Version", 1)
+                    self._apply(kind, payload)
+                    self._logged += 1
+                    valid_length += len(line)
+
+        self._wal = open(self._wal_path, "a", encoding="utf-8")
+        self._committer = GroupCommitter(self._commit_batch)
+        return list(self._rows.values())
+
+    def write(self, operation):
+        return self._committer.submit(operation)
+
+    def _apply(self, kind, payload):
+        if kind == "put":
+            self._rows[payload["ID"]] = payload
+        elif kind == "batch":
+            for record in payload:
+                self._apply(*record)
+        else:
+            self._rows.pop(payload, None)
+
+    def _check(self, operation):
+        kind, payload = operation[0], operation[1]
+        if kind == "insert":
+            return KeyError(payload["ID"]) if payload["ID"] in self._rows else None
+        item_id = payload["ID"] if kind == "update" else payload
+        row = self._rows.get(item_id)
+        if row is None or row["Version"] != operation[2]:
+            return ConflictError(item_id, operation[2])
+        return None
+
+    def _stage(self, operation):
+        """Check an operation and apply it to the rows; return (error, log record)."""
+        if operation[0] == "batch":
+            applied, records = [], []
+            for part in operation[1]:
+                item_id = part[1] if part[0] == "delete" else part[1]["ID"]
+                previous = self._rows.get(item_id)
+                error, record = self._stage(part)
+                if error is not None:
+                    # Undo the parts applied so far so the batch has no effect
+                    for item_id, row in reversed(applied):
+                        if row is None:
+                            self._apply("delete", item_id)
+                        else:
+                            self._apply("put", row)
+                    return error, None
+                applied.append((item_id, previous))
+                records.append(record)
+            # A batch is logged as a single line, so a torn write drops all of it
+            return None, ("batch", records)
+        error = self._check(operation)
+        if error is not None:
+            return error, None
+        # The log only records the outcome: the new row, or the deleted ID
+        record = ("delete", operation[1]) if operation[0] == "delete" else ("put", operation[1])
+        self._apply(*record)
+        return None, record
+
+    def _commit_batch(self, operations):
+        results, records = [], []
+        for operation in operations:
+            error, record = self._stage(operation)
+            results.append(error)
+            if record is not None:
+                records.append(record)
+        if records:
+            self._wal.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records))
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+            self._logged += len(records)
+            if self._logged >= self._compact_after:
+                self.compact()
+        return results
+
+    def compact(self):
+        """Write the current state to the snapshot file and truncate the log."""
+        temp_path = self._snapshot_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump([[row[column] for column in COLUMNS] for row in self._rows.values()], file,
+                      separators=(",", ":"))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self._snapshot_path)
+        self._wal.truncate(0)
+        self._logged = 0
+        logger.info(f"Wrote work item snapshot with {len(self._rows)} rows")
+
+    def close(self):
+        if self._committer is not None:
+            self._committer.close()
+            self._wal.close()
+
+
+def open_backend(data_dir="data"):
+    """Create the storage backend selected by WORKITEMS_STORAGE (sqlite, csv or memory)."""
+    seed_csv = os.path.join(data_dir, "workitems.csv")
+    kind = os.getenv("WORKITEMS_STORAGE", "sqlite").lower()
+    if kind == "sqlite":
+        return SQLiteBackend(os.getenv("WORKITEMS_DB", os.path.join(data_dir, "workitems.db")), seed_csv)
+    if kind == "csv":
+        return CSVBackend(
+            seed_csv,
+            wal_path=os.path.join(data_dir, "workitems.wal"),
+            snapshot_path=os.path.join(data_dir, "workitems.snapshot.json"),
+        )
+    if kind == "memory":
+        return MemoryBackend(seed_csv)
+    raise ValueError(f"Unknown WORKITEMS_STORAGE: {kind}")
@@ -0,0 +1,527 @@
+import asyncio
+import heapq
+import math
+import re
+from contextlib import AsyncExitStack
+
+from sortedcontainers import SortedList
+
+from storage import ConflictError
+
+# Fields with a secondary index: field name -> {value: set of IDs}
+INDEXED_FIELDS = ("State", "WorkItemType", "AssignedTo", "Tags")
+
+SORTABLE_FIELDS = ("ID", "WorkItemType", "Title", "AssignedTo", "State")
+
+# Filtered pages walk the sort index, skipping items that don't match. When the
+# filters match less than this share of the items, sorting just the matches is
+# cheaper than walking past all the others.
+SORT_MATCHES_BELOW = 0.125
+
+# A write without a version precondition that the backend rejects because another
+# process changed the work item first is retried this many times on the refreshed item
+STALE_WRITE_RETRIES = 3
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Search ranking: BM25 parameters for title matches, and how much a query term
+# matching one of the item's tags counts relative to a title match
+BM25_K1 = 1.2
+BM25_B = 0.75
+TAG_MATCH_WEIGHT = 2.0
+
+
+def parse_tags(tags):
+    """Split a Tags string ("ui; login, bug") into a set of lower-case tags."""
+    return {tag.strip().lower() for tag in tags.replace(",", ";").split(";") if tag.strip()}
+
+
+def tokenize(text):
+    """Split text into lower-case alphanumeric search terms."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _idf(matches, total):
+    return math.log(1 + (total - matches + 0.5) / (matches + 0.5))
+
+
+def _tag_terms(item):
+    return {term for tag in parse_tags(item.Tags) for term in tokenize(tag)}
+
+
+def _sort_key(field, item):
+    return item.ID if field == "ID" else (getattr(item, field), item.ID)
+
+
+def _index_values(field, item):
+    if field == "Tags":
+        return parse_tags(item.Tags)
+    return (getattr(item, field),)
+
+
+class WorkItemRepository:
+    """In-memory work item store with a hash index on ID.
+
+    Secondary indexes map each State, WorkItemType, AssignedTo value and each tag
+    to the IDs that have it, so lookups, updates and deletes are O(1) and filters
+    don't scan the whole collection. Pages are read from a sort index per
+    sortable field (the IDs, or (value, ID) keys for the other fields) instead
+    of sorting the matching items on every request. Each is a SortedList, so
+    writes keep it in order in O(log n), and it's only built by the first page
+    sorted by that field. The size of
+    each index entry doubles as the reference count of that value, so a type or
+    state disappears from the facets once no work item uses it any more.
+
+    For search(), an inverted index maps each title term to the IDs (and term
+    counts) of the titles containing it, and each term of a tag to the IDs with
+    that tag. Both are kept up to date on every add, update and delete.
+    """
+
+    def __init__(self, items=()):
+        self._items = {}
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
+        self._title_terms = {}  # term -> {ID: occurrences in the title}
+        self._title_lengths = {}  # ID -> number of terms in the title
+        self._title_length_total = 0
+        self._tag_terms = {}  # term -> IDs with a tag containing it
+        # field -> SortedList of keys, or None until a page sorted by it is read
+        self._sort_keys = dict.fromkeys(SORTABLE_FIELDS)
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item_id):
+        return item_id in self._items
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def get(self, item_id):
+        """Return the work item with this ID, or None."""
+        return self._items.get(item_id)
+
+    def add(self, item):
+        """Add a new work item. Raises KeyError if the ID is already taken."""
+        if item.ID in self._items:
+            raise KeyError(item.ID)
+        self._items[item.ID] = item
+        self._index(item)
+        self._sort_index(item, SORTABLE_FIELDS)
+        return item
+
+    def update(self, item_id, changes):
+        """Apply a {field: value} dict to a work item and return it, or None if it doesn't exist."""
+        item = self._items.get(item_id)
+        if item is None:
+            return None
+        resorted = [field for field in SORTABLE_FIELDS if field in changes and changes[field] != getattr(item, field)]
+        self._unindex(item)
+        self._sort_unindex(item, resorted)
+        for field, value in changes.items():
+            setattr(item, field, value)
+        self._index(item)
+        self._sort_index(item, resorted)
+        return item
+
+    def delete(self, item_id):
+        """Remove a work item and return it, or None if it doesn't exist."""
+        item = self._items.pop(item_id, None)
+        if item is not None:
+            self._unindex(item)
+            self._sort_unindex(item, SORTABLE_FIELDS)
+        return item
+
+    def ids_where(self, field, value):
+        """Return the IDs whose indexed field equals value (do not modify the set)."""
+        return self._indexes[field].get(value, set())
+
+    def query(self, filters=None, sort="ID", descending=False, after=None, limit=50):
+        """Return one page of work items matching all filters, in sort order.
+
+        filters maps indexed fields to the value they must have (tags match
+        case-insensitively). Pages are keyed by the sort key of their last item:
+        the ID when sorting by ID, otherwise a (value, ID) tuple. after is the key
+        returned for the previous page. Returns (items, total, next_key), where
+        next_key is None on the last page.
+
+        Pages are read from the field's sort index; only when the filters match
+        few items (less than SORT_MATCHES_BELOW of them) are those items sorted
+        instead.
+        """
+        candidates = self._candidates(filters)
+        if candidates is not None and not candidates:
+            return [], 0, None
+        total = len(self._items) if candidates is None else len(candidates)
+
+        if candidates is not None and len(candidates) < len(self._items) * SORT_MATCHES_BELOW:
+            keys = SortedList(candidates if sort == "ID" else (
+                (getattr(self._items[item_id], sort), item_id) for item_id in candidates))
+            candidates = None
+        else:
+            keys = self._sorted_keys(sort)
+
+        if candidates is None:
+            if descending:
+                end = len(keys) if after is None else keys.bisect_left(after)
+                start = max(end - limit, 0)
+                page_keys = keys[start:end][::-1]
+                has_more = start > 0
+            else:
+                start = 0 if after is None else keys.bisect_right(after)
+                page_keys = keys[start:start + limit]
+                has_more = start + limit < len(keys)
+        else:
+            # Walk the index from the cursor, keeping the keys of matching items
+            if descending:
+                end = len(keys) if after is None else keys.bisect_left(after)
+                walk = keys.islice(0, end, reverse=True)
+            else:
+                walk = keys.islice(0 if after is None else keys.bisect_right(after))
+            page_keys, has_more = [], False
+            for key in walk:
+                if (key if sort == "ID" else key[1]) in candidates:
+                    if len(page_keys) == limit:
+                        has_more = True
+                        break
+                    page_keys.append(key)
+
+        items = [self._items[key if sort == "ID" else key[1]] for key in page_keys]
+        next_key = page_keys[-1] if has_more and page_keys else None
+        return items, total, next_key
+
+    def search(self, text, filters=None, limit=20):
+        """Return the work items that best match a free-text query, best first.
+
+        Titles are ranked with BM25, and every query term that appears in one of
+        an item's tags adds TAG_MATCH_WEIGHT times the term's IDF. Items match if
+        any query term does, so items matching more terms rank higher. filters
+        work as in query(). Returns (results, total), where results is a list of
+        up to limit (item, score) pairs and total counts all matching items.
+        """
+        candidates = self._candidates(filters)
+        terms = set(tokenize(text))
+        if not terms or not self._items or (candidates is not None and not candidates):
+            return [], 0
+
+        count = len(self._items)
+        average_length = self._title_length_total / count
+        lengths = self._title_lengths
+        scores = {}
+        for term in terms:
+            postings = self._title_terms.get(term)
+            if postings:
+                idf = _idf(len(postings), count)
+                if candidates is None:
+                    matches = postings.items()
+                elif len(candidates) < len(postings):
+                    matches = [(item_id, postings[item_id]) for item_id in candidates if item_id in postings]
+                else:
+                    matches = [(item_id, occurrences) for item_id, occurrences in postings.items()
+                               if item_id in candidates]
+                for item_id, occurrences in matches:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[item_id] / average_length)
+                    score = idf * occurrences * (BM25_K1 + 1) / (occurrences + norm)
+                    scores[item_id] = scores.get(item_id, 0.0) + score
+            tagged = self._tag_terms.get(term)
+            if tagged:
+                weight = TAG_MATCH_WEIGHT * _idf(len(tagged), count)
+                for item_id in tagged:
+                    if candidates is None or item_id in candidates:
+                        scores[item_id] = scores.get(item_id, 0.0) + weight
+
+        # Equal scores rank lower IDs first
+        best = heapq.nlargest(limit, scores.items(), key=lambda entry: (entry[1], -entry[0]))
+        return [(self._items[item_id], score) for item_id, score in best], len(scores)
+
+    def _candidates(self, filters):
+        """Return the IDs matching all filters (read-only), or None if there are no filters."""
+        candidates = None
+        filters = filters or {}
+        # Intersect starting from the most selective index
+        for field in sorted(filters, key=lambda field: len(self._filter_ids(field, filters[field]))):
+            ids = self._filter_ids(field, filters[field])
+            # A single filter returns the index's own set, so don't modify the result
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return candidates
+        return candidates
+
+    def _filter_ids(self, field, value):
+        if field == "Tags":
+            value = value.strip().lower()
+        return self.ids_where(field, value)
+
+    def facet(self, field):
+        """Return the distinct values currently in use for an indexed field."""
+        return list(self._indexes[field])
+
+    def _index(self, item):
+        for field in INDEXED_FIELDS:
+            index = self._indexes[field]
+            for value in _index_values(field, item):
+                index.setdefault(value, set()).add(item.ID)
+        terms = tokenize(item.Title)
+        for term in terms:
+            postings = self._title_terms.setdefault(term, {})
+            postings[item.ID] = postings.get(item.ID, 0) + 1
+        self._title_lengths[item.ID] = len(terms)
+        self._title_length_total += len(terms)
+        for term in _tag_terms(item):
+            self._tag_terms.setdefault(term, set()).add(item.ID)
+
+    def _sorted_keys(self, field):
+        """Return the sort index of a field, building it on first use."""
+        keys = self._sort_keys[field]
+        if keys is None:
+            keys = self._sort_keys[field] = SortedList(_sort_key(field, item) for item in self._items.values())
+        return keys
+
+    def _sort_index(self, item, fields):
+        for field in fields:
+            if self._sort_keys[field] is not None:
+                self._sort_keys[field].add(_sort_key(field, item))
+
+    def _sort_unindex(self, item, fields):
+        for field in fields:
+            if self._sort_keys[field] is not None:
+                self._sort_keys[field].remove(_sort_key(field, item))
+
+    def _unindex(self, item):
+        for field in INDEXED_FIELDS:
+            index = self._indexes[field]
+            for value in _index_values(field, item):
+                ids = index[value]
+                ids.discard(item.ID)
+                if not ids:
+                    del index[value]
+        for term in set(tokenize(item.Title)):
+            postings = self._title_terms[term]
+            del postings[item.ID]
+            if not postings:
+                del self._title_terms[term]
+        self._title_length_total -= self._title_lengths.pop(item.ID)
+        for term in _tag_terms(item):
+            ids = self._tag_terms[term]
+            ids.discard(item.ID)
+            if not ids:
+                del self._tag_terms[term]
+
+
+class WorkItemStore:
+    """Work item repository backed by a durable storage backend.
+
+    Every change bumps the work item's Version. Writes to the same item are
+    serialized by a striped set of locks (items on different stripes proceed
+    concurrently and share group commits): under the item's lock the version is
+    checked, the change is made durable by the backend, which re-checks the
+    version against the stored row, and only then applied in memory.
+
+    When the backend is shared by several processes, refresh() pulls in the
+    changes the other processes made. The change feed also returns this
+    process's own writes, and a refresh can apply one before the writer gets
+    to, so applying a write skips it if the repository is already past it.
+    """
+
+    def __init__(self, backend, make_item, lock_stripes=64):
+        self.backend = backend
+        self._make_item = make_item
+        self.repository = WorkItemRepository(make_item(row) for row in backend.load())
+        self._position = backend.position
+        self._locks = [asyncio.Lock() for _ in range(lock_stripes)]
+        # Refreshes run one at a time, and a call is served by any refresh that
+        # started after it was made
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_calls = 0
+        self._refreshed_calls = 0
+        # ID -> change feed position of the last write this process applied to it
+        self._written = {}
+
+    def _stripe(self, item_id):
+        return hash(item_id) % len(self._locks)
+
+    def _lock(self, item_id):
+        return self._locks[self._stripe(item_id)]
+
+    async def refresh(self):
+        """Apply changes made by other processes sharing the backend.
+
+        The change feed is read on a worker thread, so the event loop keeps
+        serving requests meanwhile; concurrent calls share one read.
+        """
+        self._refresh_calls += 1
+        call = self._refresh_calls
+        async with self._refresh_lock:
+            if self._refreshed_calls >= call:
+                return
+            started = self._refresh_calls
+            position, rows = await asyncio.to_thread(self.backend.changes_since, self._position)
+            if rows is None:
+                loaded = await asyncio.to_thread(self.backend.load)
+                self.repository = WorkItemRepository(self._make_item(row) for row in loaded)
+            else:
+                for item_id, row in rows.items():
+                    if self._written.get(item_id, 0) > position:
+                        # This process wrote the item after the rows were read
+                        continue
+                    current = self.repository.get(item_id)
+                    if row is None:
+                        self.repository.delete(item_id)
+                    elif current is None:
+                        self.repository.add(self._make_item(row))
+                    elif current.Version != row["Version"]:
+                        self.repository.update(item_id, {field: row[field] for field in row if field != "ID"})
+            self._position = position
+            self._written = {item_id: written for item_id, written in self._written.items() if written > position}
+            self._refreshed_calls = started
+
+    async def create(self, item):
+        """Add a new work item at version 1. Raises KeyError if the ID is already taken."""
+        async with self._lock(item.ID):
+            if item.ID in self.repository:
+                raise KeyError(item.ID)
+            write = ("insert", {**self._row(item), "Version": 1})
+            return self._apply(write, await self._persist(write)) or self._make_item(write[1])
+
+    async def update(self, item_id, changes, expected_version=None):
+        """Apply changes to a work item and return it, or None if it doesn't exist.
+
+        Raises ConflictError if expected_version is given and doesn't match.
+        """
+        async def change(item):
+            write = ("update", {**self._row(item), **changes, "Version": item.Version + 1}, item.Version)
+            return self._apply(write, await self._persist(write)) or self._make_item(write[1])
+
+        return await self._change(item_id, expected_version, change)
+
+    async def delete(self, item_id, expected_version=None):
+        """Remove a work item and return it, or None if it doesn't exist.
+
+        Raises ConflictError if expected_version is given and doesn't match.
+        """
+        async def change(item):
+            write = ("delete", item_id, item.Version)
+            self._apply(write, await self._persist(write))
+            return item
+
+        return await self._change(item_id, expected_version, change)
+
+    async def _change(self, item_id, expected_version, change):
+        """Run change(item) on the current work item under its lock; None if it doesn't exist.
+
+        The backend rejects the write if another process changed the item since
+        this one last refreshed. That is a conflict only if the caller asked for
+        expected_version; otherwise the change is pulled in and the write retried.
+        """
+        for attempt in range(STALE_WRITE_RETRIES + 1):
+            async with self._lock(item_id):
+                item = self.repository.get(item_id)
+                if item is None:
+                    return None
+                if expected_version is not None and expected_version != item.Version:
+                    raise ConflictError(item_id, expected_version)
+                try:
+                    return await change(item)
+                except ConflictError:
+                    if expected_version is not None or attempt == STALE_WRITE_RETRIES:
+                        raise
+                    await self.refresh()
+
+    async def apply_batch(self, operations):
+        """Apply a list of operations in order, all or nothing.
+
+        Operations are ("create", item), ("update", id, changes, expected_version)
+        and ("delete", id, expected_version); later operations see the effect of
+        earlier ones, so a batch may create an item and then update it. Returns
+        (applied, results) with one result per operation: the created or updated
+        work item, the deleted work item, None if the work item doesn't exist, or
+        the KeyError / ConflictError that operation failed with. If any operation
+        fails nothing is applied, and the results of the others are what they
+        would have returned.
+        """
+        ids = [operation[1].ID if operation[0] == "create" else operation[1] for operation in operations]
+        async with AsyncExitStack() as stack:
+            # Take every stripe involved, always in the same order, so concurrent
+            # batches can't deadlock
+            for stripe in sorted({self._stripe(item_id) for item_id in ids}):
+                await stack.enter_async_context(self._locks[stripe])
+
+            staged = {}  # ID -> row as left by the operations so far (None = deleted)
+            results, writes = [], []
+            for operation, item_id in zip(operations, ids):
+                if item_id in staged:
+                    row = staged[item_id]
+                else:
+                    item = self.repository.get(item_id)
+                    row = self._row(item) if item is not None else None
+                kind = operation[0]
+                if kind == "create":
+                    if row is not None:
+                        results.append(KeyError(item_id))
+                        continue
+                    new_row = {**self._row(operation[1]), "Version": 1}
+                    writes.append(("insert", new_row))
+                else:
+                    expected_version = operation[-1]
+                    if row is None:
+                        results.append(None)
+                        continue
+                    if expected_version is not None and expected_version != row["Version"]:
+                        results.append(ConflictError(item_id, expected_version))
+                        continue
+                    if kind == "update":
+                        new_row = {**row, **operation[2], "Version": row["Version"] + 1}
+                        writes.append(("update", new_row, row["Version"]))
+                    else:
+                        new_row = None
+                        writes.append(("delete", item_id, row["Version"]))
+                staged[item_id] = new_row
+                results.append(self._make_item(new_row if new_row is not None else row))
+
+            if len(writes) < len(operations):
+                return False, results
+            try:
+                position = await self._persist(("batch", writes))
+            except (KeyError, ConflictError) as e:
+                # Another process changed one of the items since we last refreshed
+                failed_id = e.item_id if isinstance(e, ConflictError) else e.args[0]
+                return False, [e if item_id == failed_id else result for item_id, result in zip(ids, results)]
+
+            for write in writes:
+                self._apply(write, position)
+            return True, results
+
+    async def _persist(self, operation):
+        """Make an operation durable; returns its change feed position, if the backend has one."""
+        return await asyncio.wrap_future(self.backend.write(operation))
+
+    def _apply(self, write, position):
+        """Apply a durable write to the repository and return the item, or None if it was skipped.
+
+        A refresh() that ran while the write was being committed may already
+        have applied it, or a later change, from the change feed, so the
+        repository is only changed if it is still behind the write.
+        """
+        kind, payload = write[0], write[1]
+        item_id = payload if kind == "delete" else payload["ID"]
+        current = self.repository.get(item_id)
+        result = None
+        if kind == "insert":
+            if current is None:
+                result = self.repository.add(self._make_item(payload))
+        elif kind == "update":
+            if current is not None and current.Version < payload["Version"]:
+                result = self.repository.update(item_id, {field: value for field, value in payload.items() if field != "ID"})
+        elif current is not None and current.Version == write[2]:
+            result = self.repository.delete(item_id)
+        if position is not None:
+            self._written[item_id] = position
+        return result
+
+    @staticmethod
+    def _row(item):
+        return item.model_dump()
+
+    def close(self):
+        self.backend.close()